@@ -0,0 +1,304 @@
+"""
+Embedded analytical database for pipeline outputs.
+
+One SQLite file holds a table per output (trials, graph nodes/edges,
+provenance, training scores, risk scores, dashboard predictions, triage queue)
+with indexes on the columns consumers filter by. Writers bulk-load a whole
+frame into a staging table and swap it in one transaction, so readers never
+see a half-loaded table. Readers push `trial_id` / `edge_type` / `risk_tier`
+(or any other column) filters into SQL instead of parsing a CSV in full.
+
+The CSV files are still written by every script; `--export` writes any table
+or view, optionally filtered, back out as CSV.
+
+Outputs:
+    - cadence_analytics.sqlite
+
+Usage:
+    python analytics_db.py --load-csvs                 # import existing CSV outputs
+    python analytics_db.py --tables
+    python analytics_db.py --export edges --edge-type dropout_event --trial-id NCT03242252
+    python analytics_db.py --export scores --risk-tier high --output high_risk.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from tracing import span
+
+pd = lazy_import("pandas")
+
+
+DB_PATH = Path("cadence_analytics.sqlite")
+LOAD_CHUNKSIZE = 50_000
+
+# Table -> indexed filter columns (indexed when the loaded frame has them).
+TABLE_INDEXES = {
+    "trials": ["nct_id", "search_condition"],
+    "nodes": ["trial_id", "node_type"],
+    "edges": ["trial_id", "edge_type"],
+    "provenance": ["trial_id"],
+    "scored_events": ["trial_id"],
+    "scores": ["trial_id", "risk_tier", "edge_type"],
+    "graph_predictions": ["trial_id", "risk_level"],
+    "patient_predictions": ["trial_id", "risk_level"],
+    "triage": ["trial_id", "risk_tier", "status"],
+}
+
+# Default CSV behind each table, used by --load-csvs.
+CSV_SOURCES = {
+    "trials": Path("ctgov_cardiometabolic_trials.csv"),
+    "nodes": Path("ctgov_graph_nodes.csv"),
+    "edges": Path("ctgov_graph_edges.csv"),
+    "provenance": Path("ctgov_graph_provenance.csv"),
+    "scored_events": Path("model_artifacts/scored_dropout_events.csv"),
+    "scores": Path("model_artifacts/dropout_risk_predictions.csv"),
+    "graph_predictions": Path("model_artifacts/graph_predictions.csv"),
+    "patient_predictions": Path("predictions.csv"),
+    "triage": Path("model_artifacts/crc_triage_queue.csv"),
+}
+
+# Same columns and order as the scraper's ctgov_dropout_analysis.csv.
+DROPOUT_ANALYSIS_COLUMNS = [
+    "nct_id", "brief_title", "search_condition", "conditions",
+    "sponsor", "sponsor_class",
+    "enrollment_count", "num_arms", "total_sites", "num_countries",
+    "start_date", "completion_date",
+    "has_participant_flow", "total_started", "total_completed",
+    "total_discontinued", "dropout_rate",
+    "discontinuation_reasons", "top_dropout_reason", "top_dropout_reason_count",
+    "num_periods",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load, list or export tables in the analytics database.")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Path to the analytics SQLite database.")
+    parser.add_argument(
+        "--load-csvs",
+        nargs="*",
+        default=None,
+        choices=list(CSV_SOURCES),
+        help="Bulk-load these tables (default: all) from their CSV outputs when present.",
+    )
+    parser.add_argument("--tables", action="store_true", help="List tables and views with row counts.")
+    parser.add_argument("--export", type=str, default=None, help="Table or view to export as CSV.")
+    parser.add_argument("--output", type=Path, default=None, help="Export path (default: <table>.csv).")
+    parser.add_argument("--columns", nargs="+", default=None, help="Columns to export.")
+    parser.add_argument("--trial-id", nargs="+", default=None, help="Filter by trial_id (nct_id for trials).")
+    parser.add_argument("--edge-type", nargs="+", default=None, help="Filter by edge_type.")
+    parser.add_argument("--risk-tier", nargs="+", default=None, help="Filter by risk_tier.")
+    return parser.parse_args()
+
+
+def add_db_argument(parser, help_text: str):
+    parser.add_argument("--db", type=Path, default=None, help=help_text)
+
+
+def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Parallel pipeline stages load different tables into the same file.
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+
+def _create_dropout_analysis_view(conn: sqlite3.Connection):
+    columns = set(_columns(conn, "trials"))
+    cols = [c for c in DROPOUT_ANALYSIS_COLUMNS if c in columns]
+    if not cols:
+        return
+    order = " ORDER BY dropout_rate DESC" if "dropout_rate" in columns else ""
+    conn.execute(
+        f"CREATE VIEW dropout_analysis AS SELECT {', '.join(_quote(c) for c in cols)} FROM trials{order}"
+    )
+
+
+def load_table(df: pd.DataFrame, table: str, db_path: Path = DB_PATH) -> int:
+    """Replace `table` with `df` atomically and index its filter columns. Returns rows loaded."""
+    if table not in TABLE_INDEXES:
+        raise ValueError(f"Unknown table '{table}'. Known: {list(TABLE_INDEXES)}")
+    staging = f"{table}__staging"
+    with span("db.load", table=table) as s:
+        conn = connect(db_path)
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+            conn.commit()
+            if len(df.columns) == 0:
+                # Nothing was exported (e.g. no dropout events); don't leave stale rows behind.
+                with conn:
+                    if table == "trials":
+                        conn.execute("DROP VIEW IF EXISTS dropout_analysis")
+                    conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+                return 0
+            df.to_sql(staging, conn, index=False, chunksize=LOAD_CHUNKSIZE)
+            with conn:
+                if table == "trials":
+                    conn.execute("DROP VIEW IF EXISTS dropout_analysis")
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+                conn.execute(f"ALTER TABLE {_quote(staging)} RENAME TO {_quote(table)}")
+                for col in TABLE_INDEXES[table]:
+                    if col in df.columns:
+                        conn.execute(
+                            f"CREATE INDEX {_quote(f'idx_{table}_{col}')} ON {_quote(table)} ({_quote(col)})"
+                        )
+                if table == "trials":
+                    _create_dropout_analysis_view(conn)
+            conn.execute(f"ANALYZE {_quote(table)}")
+            conn.commit()
+        finally:
+            conn.close()
+        s.add(rows=len(df))
+    return len(df)
+
+
+def _select(
+    conn: sqlite3.Connection, table: str, columns: list[str] | None, filters: dict
+) -> tuple[str, list]:
+    available = _columns(conn, table)
+    if not available:
+        raise ValueError(f"Table '{table}' is not in the database. Load it with --db or analytics_db.py --load-csvs.")
+    # Trials are keyed by nct_id; accept trial_id there too.
+    if table in ("trials", "dropout_analysis") and "trial_id" in filters and "trial_id" not in available:
+        filters = {("nct_id" if k == "trial_id" else k): v for k, v in filters.items()}
+    unknown = [c for c in [*(columns or []), *filters] if c not in available]
+    if unknown:
+        raise ValueError(f"Columns not in '{table}': {unknown}")
+
+    select = ", ".join(_quote(c) for c in columns) if columns else "*"
+    clauses, params = [], []
+    for col, values in filters.items():
+        values = [values] if isinstance(values, str) or not hasattr(values, "__iter__") else list(values)
+        clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"SELECT {select} FROM {_quote(table)}{where}", params
+
+
+def table_columns(table: str, db_path: Path = DB_PATH) -> list[str]:
+    """Column names of a loaded table or view (empty if it is not loaded)."""
+    if not db_path.exists():
+        raise FileNotFoundError(f"Analytics database not found: {db_path}")
+    conn = connect(db_path)
+    try:
+        return _columns(conn, table)
+    finally:
+        conn.close()
+
+
+def read_table(
+    table: str,
+    db_path: Path = DB_PATH,
+    columns: list[str] | None = None,
+    chunksize: int | None = None,
+    **filters,
+):
+    """Rows of `table` matching column=value(s) filters; a DataFrame, or an iterator of chunks."""
+    if not db_path.exists():
+        raise FileNotFoundError(f"Analytics database not found: {db_path}")
+    filters = {k: v for k, v in filters.items() if v is not None}
+    conn = connect(db_path)
+    try:
+        query, params = _select(conn, table, columns, filters)
+    except ValueError:
+        conn.close()
+        raise
+    if chunksize is None:
+        with span("db.read", table=table) as s:
+            try:
+                df = pd.read_sql_query(query, conn, params=params)
+            finally:
+                conn.close()
+            s.add(rows=len(df))
+        return df
+    return _read_chunks(conn, table, query, params, chunksize)
+
+
+def _read_chunks(conn: sqlite3.Connection, table: str, query: str, params: list, chunksize: int):
+    try:
+        for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize):
+            with span("db.read", table=table) as s:
+                s.add(rows=len(chunk))
+            yield chunk
+    finally:
+        conn.close()
+
+
+def export_csv(table: str, output: Path, db_path: Path = DB_PATH, columns: list[str] | None = None, **filters) -> int:
+    """Stream a table or view (optionally filtered) to CSV. Returns rows written."""
+    rows = 0
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        for chunk in read_table(table, db_path, columns=columns, chunksize=LOAD_CHUNKSIZE, **filters):
+            chunk.to_csv(f, index=False, header=rows == 0)
+            rows += len(chunk)
+    if rows == 0:
+        # Header only, so an empty filter result is still a valid CSV.
+        conn = connect(db_path)
+        try:
+            query, params = _select(conn, table, columns, {k: v for k, v in filters.items() if v is not None})
+            header = [d[0] for d in conn.execute(query + " LIMIT 0", params).description]
+        finally:
+            conn.close()
+        pd.DataFrame(columns=header).to_csv(output, index=False)
+    return rows
+
+
+def list_tables(db_path: Path = DB_PATH) -> list[tuple[str, str, int]]:
+    if not db_path.exists():
+        raise FileNotFoundError(f"Analytics database not found: {db_path}")
+    conn = connect(db_path)
+    try:
+        objects = conn.execute(
+            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') "
+            "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '%__staging' ORDER BY type, name"
+        ).fetchall()
+        return [(name, kind, conn.execute(f"SELECT COUNT(*) FROM {_quote(name)}").fetchone()[0]) for name, kind in objects]
+    finally:
+        conn.close()
+
+
+def main():
+    args = parse_args()
+    if args.load_csvs is not None:
+        for table in args.load_csvs or list(CSV_SOURCES):
+            path = CSV_SOURCES[table]
+            if not path.exists():
+                print(f"  {table:<20} skipped ({path} not found)")
+                continue
+            rows = load_table(pd.read_csv(path, low_memory=False), table, args.db)
+            print(f"  {table:<20} {rows:>10} rows from {path}")
+    if args.tables:
+        for name, kind, rows in list_tables(args.db):
+            print(f"  {name:<20} {kind:<6} {rows:>10} rows")
+    if args.export:
+        output = args.output or Path(f"{args.export}.csv")
+        rows = export_csv(
+            args.export,
+            output,
+            args.db,
+            columns=args.columns,
+            trial_id=args.trial_id,
+            edge_type=args.edge_type,
+            risk_tier=args.risk_tier,
+        )
+        print(f"Exported {rows} rows from {args.export} to {output}")
+    if args.load_csvs is None and not args.tables and not args.export:
+        print("Nothing to do: pass --load-csvs, --tables or --export.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Backfill patient dropout scores over a range of historical dates and measure
+how early the model flags dropouts.
+
+The visit event log (visit_log.py) is replayed onto a patient x date grid in
+one vectorized pass: events are binned to the first grid date on or after
+them, and cumulative sums (visits, misses, schedule changes) and a running
+maximum (last contact) give every patient's counts as of every date. The
+engineered features are computed on those P x D arrays, then all active
+(enrolled, not yet withdrawn) cells are scored with one predict_proba call
+per patient batch.
+
+Lead time is measured for patients with a `withdraw` event: the days between
+the first grid date their risk exceeded --threshold and their withdrawal.
+Lead times are at --step-days resolution.
+
+Inputs / outputs:
+    - visit_events.csv, synthetic_patients.csv (static fields), dropout_model.pkl
+    - backfill_scores.csv (patient_id, trial_id, date, dropout_risk per active cell)
+    - lead_times.csv      (per withdrawn patient: withdraw date, first flag, lead days)
+
+Usage:
+    python backfill_scores.py
+    python backfill_scores.py --start 2026-05-01 --end 2026-10-18 --step-days 1 --threshold 0.6
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from schemas import PATIENTS, read_artifact
+from tracing import add_profile_arguments, profiled, span, to_csv
+from train_model import BOOLEAN_COLS, load_bundle
+from visit_log import LOG_PATH, from_days, read_events, to_days
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+DYNAMIC_FEATURES = [
+    "scheduled_visits",
+    "completed_visits",
+    "missed_visits",
+    "days_since_last_contact",
+    "visit_completion_rate",
+    "missed_visit_rate",
+    "visits_remaining",
+    "days_since_enrollment",
+]
+NO_DAY = -(2**63)  # int64 minimum; a literal so numpy is not imported at module load
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score patients at every historical date and report flag lead times.")
+    parser.add_argument("--log", type=Path, default=LOG_PATH, help="Visit event log CSV.")
+    parser.add_argument("--roster", type=Path, default=Path("synthetic_patients.csv"), help="Roster with static patient fields.")
+    parser.add_argument("--model", type=Path, default=Path("dropout_model.pkl"), help="train_model.py bundle.")
+    parser.add_argument("--start", type=str, default=None, help="First date (default: earliest enrollment).")
+    parser.add_argument("--end", type=str, default=None, help="Last date (default: latest event).")
+    parser.add_argument("--step-days", type=int, default=7, help="Days between backfill dates.")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Risk above which a patient is flagged (High tier).")
+    parser.add_argument("--min-lead-days", type=int, default=14, help="Lead time counted as actionable in the summary.")
+    parser.add_argument("--batch-patients", type=int, default=20_000, help="Patients per predict_proba call.")
+    parser.add_argument("--scores-out", type=Path, default=Path("backfill_scores.csv"), help="Long table of backfilled scores.")
+    parser.add_argument("--lead-times-out", type=Path, default=Path("lead_times.csv"), help="Per-dropout lead times.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def _iso(days: np.ndarray) -> np.ndarray:
+    return from_days(pd.Series(days)).dt.strftime("%Y-%m-%d").to_numpy()
+
+
+def event_grid(events: pd.DataFrame, patients: pd.Index, grid: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-patient state as of each grid date, as P x D arrays (days for dates, NO_DAY when unset)."""
+    n_patients, n_dates = len(patients), len(grid)
+    row = patients.get_indexer(events["patient_id"])
+    col = np.searchsorted(grid, events["day"].to_numpy(), side="left")
+    keep = row >= 0
+    kind = events["event_type"].to_numpy()
+    day = events["day"].to_numpy(dtype=np.int64)
+    value = events["value"].to_numpy(dtype=float)
+
+    def cumulative(mask: np.ndarray, weights=1.0) -> np.ndarray:
+        # Events after the last grid date land in an overflow column that is dropped.
+        out = np.zeros((n_patients, n_dates + 1))
+        mask = mask & keep
+        np.add.at(out, (row[mask], col[mask]), weights if np.isscalar(weights) else weights[mask])
+        return out.cumsum(axis=1)[:, :n_dates]
+
+    def last_day(mask: np.ndarray) -> np.ndarray:
+        out = np.full((n_patients, n_dates + 1), NO_DAY, dtype=np.int64)
+        mask = mask & keep
+        np.maximum.at(out, (row[mask], col[mask]), day[mask])
+        return np.maximum.accumulate(out, axis=1)[:, :n_dates]
+
+    def per_patient(mask: np.ndarray, values: np.ndarray, fill) -> np.ndarray:
+        out = np.full(n_patients, fill, dtype=values.dtype)
+        mask = mask & keep
+        out[row[mask]] = values[mask]  # last event wins, as in PatientState
+        return out
+
+    is_enroll = kind == "enroll"
+    enrolled = per_patient(is_enroll, day, NO_DAY)
+    baseline = np.where(enrolled[:, None] <= grid[None, :], per_patient(is_enroll, value, 0.0)[:, None], 0.0)
+    return {
+        "enrolled": enrolled,
+        "withdrawn": per_patient(kind == "withdraw", day, NO_DAY),
+        "scheduled": np.maximum(baseline + cumulative(kind == "schedule", value), 0.0),
+        "completed": cumulative(kind == "visit"),
+        "missed": cumulative(kind == "miss"),
+        "last_contact": last_day((kind == "visit") | (kind == "contact")),
+    }
+
+
+def grid_features(state: dict[str, np.ndarray], grid: np.ndarray) -> tuple[dict[str, np.ndarray], np.ndarray]:
+    """engineer_features on P x D arrays; returns the features and the active-cell mask."""
+    enrolled = state["enrolled"][:, None]
+    withdrawn = state["withdrawn"][:, None]
+    dates = grid[None, :]
+    active = (enrolled != NO_DAY) & (enrolled <= dates) & ((withdrawn == NO_DAY) | (dates <= withdrawn))
+
+    scheduled, completed, missed = state["scheduled"], state["completed"], state["missed"]
+    last_contact = np.where(state["last_contact"] == NO_DAY, enrolled, state["last_contact"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        completion = np.where(scheduled > 0, np.clip(completed / scheduled, 0, 1), 0.0)
+        missed_rate = np.where(scheduled > 0, np.clip(missed / scheduled, 0, 1), 0.0)
+    features = {
+        "scheduled_visits": scheduled,
+        "completed_visits": completed,
+        "missed_visits": missed,
+        "days_since_last_contact": np.maximum(dates - last_contact, 0).astype(float),
+        "visit_completion_rate": completion,
+        "missed_visit_rate": missed_rate,
+        "visits_remaining": np.maximum(scheduled - completed, 0),
+        "days_since_enrollment": np.maximum(dates - enrolled, 0).astype(float),
+    }
+    return features, active
+
+
+def score_grid(model, feature_cols: list[str], static: pd.DataFrame, features: dict, active: np.ndarray) -> np.ndarray:
+    """Risk for every active cell (NaN elsewhere) with one predict_proba over the flattened cells."""
+    rows, cols = np.nonzero(active)
+    x = pd.DataFrame({col: features[col][rows, cols] for col in feature_cols if col in features})
+    for col in feature_cols:
+        if col not in x:
+            x[col] = static[col].to_numpy()[rows]
+    risk = np.full(active.shape, np.nan)
+    if len(rows):
+        risk[rows, cols] = model.predict_proba(x[feature_cols])[:, 1]
+    return risk
+
+
+def lead_times(
+    risk: np.ndarray, grid: np.ndarray, withdrawn: np.ndarray, patients: pd.Index, trials: np.ndarray, threshold: float
+) -> pd.DataFrame:
+    flagged = np.nan_to_num(risk, nan=0.0) > threshold
+    ever = flagged.any(axis=1)
+    first = np.where(ever, flagged.argmax(axis=1), -1)
+    first_day = np.where(ever, grid[np.maximum(first, 0)], NO_DAY)
+    dropped = withdrawn != NO_DAY
+    out = pd.DataFrame(
+        {
+            "patient_id": patients[dropped],
+            "trial_id": trials[dropped],
+            "withdraw_date": _iso(withdrawn[dropped]),
+            "first_flag_date": np.where(
+                ever[dropped], _iso(np.maximum(first_day[dropped], 0)), ""
+            ),
+            "lead_days": np.where(ever[dropped], withdrawn[dropped] - first_day[dropped], np.nan),
+            "peak_risk": pd.DataFrame(risk[dropped]).max(axis=1).to_numpy(),
+        }
+    )
+    return out.sort_values(["lead_days", "patient_id"], ascending=[False, True], na_position="last")
+
+
+def main():
+    args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="backfill"):
+        _backfill(args)
+
+
+def _backfill(args):
+    if args.step_days < 1:
+        raise ValueError("--step-days must be at least 1.")
+    if not args.roster.exists():
+        raise FileNotFoundError(f"Roster not found: {args.roster}. Generate it first (generate_synthetic_patients.py).")
+    bundle = load_bundle(args.model)
+    model = bundle["model"]
+    feature_cols = bundle["metadata"]["feature_columns"]
+
+    events = read_events(args.log)
+    roster = read_artifact(args.roster, PATIENTS)
+    roster = roster.assign(patient_id=roster["patient_id"].astype(str)).drop_duplicates("patient_id").set_index("patient_id")
+    patients = pd.Index(pd.unique(events["patient_id"].astype(str)))
+    unknown = patients.difference(roster.index)
+    if len(unknown):
+        print(f"Skipping {len(unknown)} logged patients missing from {args.roster}")
+        patients = patients.difference(unknown, sort=False)
+    static = roster.loc[patients].copy()
+    for col in BOOLEAN_COLS:
+        static[col] = static[col].astype(bool).astype(int)
+    missing = sorted(set(feature_cols) - set(DYNAMIC_FEATURES) - set(static.columns))
+    if missing:
+        raise ValueError(f"Roster is missing model features: {missing}")
+
+    start = to_days(pd.Series([args.start]))[0] if args.start else int(events.loc[events["event_type"] == "enroll", "day"].min())
+    end = to_days(pd.Series([args.end]))[0] if args.end else int(events["day"].max())
+    grid = np.arange(start, end + 1, args.step_days, dtype=np.int64)
+    if not len(grid):
+        raise ValueError(f"Empty date range: {args.start} .. {args.end}")
+
+    risk = np.full((len(patients), len(grid)), np.nan)
+    withdrawn = np.full(len(patients), NO_DAY, dtype=np.int64)
+    with span("backfill.score", patients=len(patients), dates=len(grid)) as s:
+        for lo in range(0, len(patients), args.batch_patients):
+            batch = patients[lo : lo + args.batch_patients]
+            state = event_grid(events, batch, grid)
+            features, active = grid_features(state, grid)
+            risk[lo : lo + len(batch)] = score_grid(model, feature_cols, static.loc[batch], features, active)
+            withdrawn[lo : lo + len(batch)] = state["withdrawn"]
+            s.add(rows=int(active.sum()))
+
+    trials = static["trial_id"].astype(str).to_numpy()
+    leads = lead_times(risk, grid, withdrawn, patients, trials, args.threshold)
+    to_csv(leads, args.lead_times_out)
+
+    rows, cols = np.nonzero(~np.isnan(risk))
+    scores = pd.DataFrame(
+        {
+            "patient_id": patients.to_numpy()[rows],
+            "trial_id": trials[rows],
+            "date": _iso(grid[cols]),
+            "dropout_risk": risk[rows, cols],
+        }
+    )
+    to_csv(scores, args.scores_out)
+
+    flagged = leads["lead_days"].notna()
+    ever_flagged = (np.nan_to_num(risk, nan=0.0) > args.threshold).any(axis=1)
+    retained = withdrawn == NO_DAY
+    print(f"Backfilled {len(scores)} scores: {len(patients)} patients x {len(grid)} dates (every {args.step_days} days)")
+    print(f"Dropouts: {len(leads)}, flagged before withdrawal: {int(flagged.sum())}")
+    if flagged.any():
+        lead = leads.loc[flagged, "lead_days"]
+        print(
+            f"Lead time (days): median {lead.median():.0f}, p25 {lead.quantile(0.25):.0f}, p75 {lead.quantile(0.75):.0f}; "
+            f">= {args.min_lead_days} days: {int((lead >= args.min_lead_days).sum())}/{len(leads)}"
+        )
+    if retained.any():
+        print(f"Retained patients ever flagged: {int(ever_flagged[retained].sum())}/{int(retained.sum())}")
+    print(f"Saved lead times: {args.lead_times_out}")
+    print(f"Saved backfilled scores: {args.scores_out}")
+
+
+if __name__ == "__main__":
+    main()
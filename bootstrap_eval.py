@@ -0,0 +1,144 @@
+"""
+Grouped bootstrap confidence intervals for test-set metrics.
+
+Rows of one trial are correlated, so resampling rows independently
+understates the uncertainty. Each resample instead draws the test split's
+groups (trial_id) with replacement. Under that draw a row appears once per
+time its group was drawn, so a resample is a row-weight vector: a block of
+resamples is a (resamples x groups) multinomial count matrix gathered to
+(resamples x rows). Every metric is then a weighted sum over the cached test
+predictions, computed for the whole block with matrix products. No
+resampled frame is built and nothing is refit or re-scored.
+
+Blocks of resamples run across a process pool. Block sizes depend only on
+the number of test rows, and each block seeds its own generator, so results
+do not depend on --jobs.
+
+Used by train_dropout_model.py (regression: mae, rmse, r2) and train_model.py
+(classification: accuracy, precision, recall, auc_roc); the intervals are
+recorded under "metrics_ci" in metrics.json.
+"""
+
+from __future__ import annotations
+
+from lazy_imports import lazy_import
+from process_pool import WORKER, pool_size, run_pool
+from tracing import span
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+MAX_WEIGHT_CELLS = 4_000_000
+REGRESSION = "regression"
+CLASSIFICATION = "classification"
+
+
+def regression_metrics(y: np.ndarray, pred: np.ndarray, weights: np.ndarray) -> dict:
+    """Weighted MAE / RMSE / R2 for every row of `weights` (resamples x rows)."""
+    total = weights.sum(axis=1)
+    err = pred - y
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mse = weights @ (err**2) / total
+        mean_y = weights @ y / total
+        sst = weights @ (y**2) - total * mean_y**2
+        r2 = np.where(sst > 0, 1.0 - mse * total / np.where(sst > 0, sst, 1.0), np.nan)
+        return {"mae": weights @ np.abs(err) / total, "rmse": np.sqrt(mse), "r2": r2}
+
+
+def classification_metrics(y: np.ndarray, score: np.ndarray, weights: np.ndarray, threshold: float = 0.5) -> dict:
+    """Weighted accuracy / precision / recall / ROC AUC for every row of `weights`."""
+    positive = y == 1
+    predicted = score >= threshold
+    total = weights.sum(axis=1)
+    tp = weights @ (positive & predicted)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        accuracy = weights @ (positive == predicted) / total
+        flagged = weights @ predicted
+        actual = weights @ positive
+        # sklearn's zero_division=0 convention.
+        precision = np.where(flagged > 0, tp / np.where(flagged > 0, flagged, 1.0), 0.0)
+        recall = np.where(actual > 0, tp / np.where(actual > 0, actual, 1.0), 0.0)
+
+        # AUC = P(score of a positive > score of a negative), ties counted half. Rows are
+        # sorted by score once; per tied-score block, positives pair with the negative
+        # weight below the block plus half the negative weight inside it.
+        order = np.argsort(score, kind="stable")
+        ranked = score[order]
+        starts = np.flatnonzero(np.r_[True, ranked[1:] != ranked[:-1]])
+        w = weights[:, order]
+        pos_block = np.add.reduceat(w * positive[order], starts, axis=1)
+        neg_block = np.add.reduceat(w * ~positive[order], starts, axis=1)
+        neg_below = np.cumsum(neg_block, axis=1) - neg_block
+        pairs = pos_block.sum(axis=1) * neg_block.sum(axis=1)
+        auc = np.where(pairs > 0, (pos_block * (neg_below + 0.5 * neg_block)).sum(axis=1) / np.where(pairs > 0, pairs, 1.0), np.nan)
+    return {"accuracy": accuracy, "precision": precision, "recall": recall, "auc_roc": auc}
+
+
+def _metrics(kind: str, y, score, weights, threshold: float) -> dict:
+    if kind == REGRESSION:
+        return regression_metrics(y, score, weights)
+    return classification_metrics(y, score, weights, threshold)
+
+
+def _bootstrap_block(task: tuple) -> dict:
+    size, seed = task
+    codes, n_groups = WORKER["codes"], WORKER["n_groups"]
+    rng = np.random.default_rng(seed)
+    counts = rng.multinomial(n_groups, np.full(n_groups, 1.0 / n_groups), size=size).astype(float)
+    return _metrics(WORKER["kind"], WORKER["y"], WORKER["score"], counts[:, codes], WORKER["threshold"])
+
+
+def bootstrap_metrics(
+    y_true,
+    y_score,
+    groups,
+    kind: str = REGRESSION,
+    resamples: int = 2000,
+    level: float = 0.95,
+    jobs: int | None = None,
+    seed: int = 42,
+    threshold: float = 0.5,
+) -> dict:
+    """Point estimate, bootstrap std and percentile interval of each metric, resampling whole groups."""
+    if kind not in (REGRESSION, CLASSIFICATION):
+        raise ValueError(f"Unknown metric kind {kind!r}; expected {REGRESSION!r} or {CLASSIFICATION!r}.")
+    if not 0 < level < 1:
+        raise ValueError("Bootstrap level must be between 0 and 1.")
+    y = np.asarray(y_true, dtype=float)
+    score = np.asarray(y_score, dtype=float)
+    codes, uniques = pd.factorize(pd.Series(groups).astype(str), sort=True)
+    if len(y) == 0 or len(uniques) == 0:
+        raise ValueError("Cannot bootstrap metrics on an empty test split.")
+    state = {"kind": kind, "y": y, "score": score, "codes": codes, "n_groups": len(uniques), "threshold": threshold}
+    point = {name: float(v[0]) for name, v in _metrics(kind, y, score, np.ones((1, len(y))), threshold).items()}
+
+    block = max(1, min(resamples, MAX_WEIGHT_CELLS // len(y)))
+    sizes = [min(block, resamples - lo) for lo in range(0, resamples, block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(sizes, seeds))
+    jobs = pool_size(jobs, len(tasks))
+    with span("bootstrap", resamples=resamples, groups=len(uniques), jobs=jobs) as s:
+        results = run_pool(_bootstrap_block, tasks, jobs, state)
+        s.add(rows=resamples * len(y))
+
+    tail = (1.0 - level) / 2.0 * 100.0
+    out = {}
+    for name, estimate in point.items():
+        draws = np.concatenate([r[name] for r in results])
+        low, high = np.nanpercentile(draws, [tail, 100.0 - tail])
+        out[name] = {
+            "estimate": estimate,
+            "std": float(np.nanstd(draws, ddof=1)),
+            "ci_low": float(low),
+            "ci_high": float(high),
+        }
+    return {"resamples": int(resamples), "level": level, "groups": int(len(uniques)), "metrics": out}
+
+
+def format_intervals(result: dict) -> str:
+    """One "name estimate [low, high]" per metric, for terminal summaries."""
+    pct = f"{result['level'] * 100:g}%"
+    return ", ".join(
+        f"{name} {m['estimate']:.4f} [{m['ci_low']:.4f}, {m['ci_high']:.4f}]" for name, m in result["metrics"].items()
+    ) + f" ({pct} CI, {result['resamples']} resamples of {result['groups']} trials)"
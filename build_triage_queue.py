@@ -0,0 +1,271 @@
+"""
+Build or refresh the CRC triage queue from scored dropout events as a stream.
+
+Scored rows are read in chunks and folded into bounded top-K heaps per site
+and per owner, so memory stays constant no matter how many rows are scored.
+The result is merged with the existing queue: rows already assigned or in
+progress keep their owner, status, notes and dates, and in-progress rows are
+never dropped. The queue file is rewritten only when something changed, and
+the changed rows are written to a side file for review.
+
+Inputs:
+    - model_artifacts/dropout_risk_predictions.csv  (from predict_dropout_risk.py;
+      with --db, the scores table, filtered to --tiers in the database)
+    - model_artifacts/crc_triage_queue.csv          (existing queue, optional)
+
+Outputs:
+    - model_artifacts/crc_triage_queue.csv
+    - model_artifacts/crc_triage_queue.changes.csv  (added / updated / removed rows)
+    - triage table of the analytics database         (with --db)
+
+Usage:
+    python build_triage_queue.py
+    python build_triage_queue.py --per-site 25 --per-owner 100 --max-rows 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+from datetime import date, timedelta
+from pathlib import Path
+
+from analytics_db import add_db_argument, load_table, read_table, table_columns
+from lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+
+KEY_COLUMNS = ["trial_id", "reason", "period_title", "arm_id"]
+SCORE_COLUMN = "predicted_graph_weight"
+SCORED_COLUMNS = [SCORE_COLUMN, "risk_percentile", "risk_tier", "action_hint"]
+WORKFLOW_COLUMNS = ["queue_date", "due_date", "owner", "status", "outreach_channel", "followup_outcome", "notes"]
+QUEUE_COLUMNS = ["priority_rank", *KEY_COLUMNS, *SCORED_COLUMNS, "intervention_plan", *WORKFLOW_COLUMNS]
+# priority_rank follows from position, so one new top row would shift every rank below it.
+DIFF_COLUMNS = [c for c in QUEUE_COLUMNS if c != "priority_rank"]
+NEW_STATUS = "new"
+CLOSED_STATUSES = {"closed", "done", "resolved"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream scored events into the CRC triage queue.")
+    parser.add_argument(
+        "--scored",
+        type=Path,
+        default=Path("model_artifacts/dropout_risk_predictions.csv"),
+        help="Scored dropout events CSV.",
+    )
+    parser.add_argument(
+        "--queue",
+        type=Path,
+        default=Path("model_artifacts/crc_triage_queue.csv"),
+        help="Triage queue CSV to merge with and update.",
+    )
+    parser.add_argument(
+        "--tiers",
+        nargs="+",
+        default=["high"],
+        help="Risk tiers eligible for the queue.",
+    )
+    parser.add_argument("--site-col", type=str, default="trial_id", help="Column identifying a site.")
+    parser.add_argument("--per-site", type=int, default=50, help="Top rows kept per site.")
+    parser.add_argument("--per-owner", type=int, default=200, help="Top assigned rows kept per owner.")
+    parser.add_argument("--max-rows", type=int, default=5000, help="Overall queue size cap.")
+    parser.add_argument("--sla-days", type=int, default=7, help="Days from queue_date to due_date.")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Scored rows read per chunk.")
+    add_db_argument(parser, "Read scores from this analytics database instead of --scored and load the queue into it.")
+    return parser.parse_args()
+
+
+def _key(row: dict) -> tuple:
+    return tuple("" if pd.isna(row.get(c)) else str(row.get(c)) for c in KEY_COLUMNS)
+
+
+class TopK:
+    """Bounded min-heap keeping the k highest-scoring rows."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []
+
+    def push(self, score: float, seq: int, row: dict):
+        if self.k <= 0:
+            return
+        item = (score, seq, row)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+
+    def rows(self) -> list[tuple]:
+        return list(self.heap)
+
+
+def load_queue(queue_path: Path) -> dict:
+    """Existing queue rows keyed by (trial_id, reason, period_title, arm_id)."""
+    if not queue_path.exists():
+        return {}
+    existing = pd.read_csv(queue_path, dtype={c: str for c in KEY_COLUMNS + WORKFLOW_COLUMNS})
+    return {_key(row): row for row in existing.to_dict("records")}
+
+
+def stream_top_rows(
+    scored_path: Path,
+    existing: dict,
+    tiers: list[str],
+    site_col: str,
+    per_site: int,
+    per_owner: int,
+    chunksize: int,
+    db_path: Path | None = None,
+) -> dict:
+    """Fold scored chunks into per-site and per-owner heaps. Returns key -> scored row."""
+    wanted = set(KEY_COLUMNS + SCORED_COLUMNS + [site_col])
+    if db_path is not None:
+        columns = [c for c in table_columns("scores", db_path) if c in wanted]
+        tier_filter = tiers if tiers and "risk_tier" in columns else None
+        chunks = read_table("scores", db_path, columns=columns, chunksize=chunksize, risk_tier=tier_filter)
+    else:
+        if not scored_path.exists():
+            raise FileNotFoundError(f"Scored events file not found: {scored_path}")
+        chunks = pd.read_csv(scored_path, usecols=lambda c: c in wanted, chunksize=chunksize)
+
+    site_heaps: dict = {}
+    owner_heaps: dict = {}
+    seq = itertools.count()
+    for chunk in chunks:
+        if "risk_tier" in chunk.columns and tiers:
+            chunk = chunk[chunk["risk_tier"].isin(tiers)]
+        chunk = chunk.dropna(subset=[SCORE_COLUMN])
+        if chunk.empty:
+            continue
+        # Only a site's chunk-local top-K can reach its heap, so trim before the Python loop.
+        chunk = chunk.sort_values(SCORE_COLUMN, ascending=False)
+        owners = [existing.get(_key(r), {}).get("owner") for r in chunk[KEY_COLUMNS].to_dict("records")]
+        chunk = chunk.assign(_owner=owners)
+        assigned = chunk["_owner"].notna()
+        keep = chunk.groupby(site_col, sort=False).cumcount() < per_site
+        if assigned.any():
+            keep |= assigned & (chunk.groupby("_owner", sort=False).cumcount() < per_owner)
+        for row in chunk[keep].to_dict("records"):
+            score, n = float(row[SCORE_COLUMN]), next(seq)
+            owner = row.pop("_owner")
+            site_heaps.setdefault(row.get(site_col), TopK(per_site)).push(score, n, row)
+            if isinstance(owner, str) and owner:
+                owner_heaps.setdefault(owner, TopK(per_owner)).push(score, n, row)
+
+    selected = {}
+    for heap in itertools.chain(site_heaps.values(), owner_heaps.values()):
+        for score, n, row in heap.rows():
+            selected[_key(row)] = (score, n, row)
+    return selected
+
+
+def merge_queue(selected: dict, existing: dict, max_rows: int, sla_days: int) -> pd.DataFrame:
+    """Cap the selection, carry over workflow fields and pin in-progress rows."""
+    today = date.today()
+    top = TopK(max_rows)
+    for score, n, row in selected.values():
+        top.push(score, n, row)
+    chosen = {_key(row): row for _, _, row in top.rows()}
+
+    for key, old in existing.items():
+        status = str(old.get("status") or NEW_STATUS).lower()
+        if key not in chosen and status != NEW_STATUS and status not in CLOSED_STATUSES:
+            refreshed = selected.get(key)
+            chosen[key] = refreshed[2] if refreshed else {c: old.get(c) for c in KEY_COLUMNS + SCORED_COLUMNS}
+
+    rows = []
+    for key, row in chosen.items():
+        old = existing.get(key)
+        merged = {c: row.get(c) for c in KEY_COLUMNS + SCORED_COLUMNS}
+        merged["intervention_plan"] = merged.get("action_hint")
+        if old is not None:
+            for col in WORKFLOW_COLUMNS:
+                merged[col] = old.get(col)
+        else:
+            merged.update(
+                {
+                    "queue_date": today.isoformat(),
+                    "due_date": (today + timedelta(days=sla_days)).isoformat(),
+                    "owner": None,
+                    "status": NEW_STATUS,
+                    "outreach_channel": None,
+                    "followup_outcome": None,
+                    "notes": None,
+                }
+            )
+        rows.append(merged)
+
+    queue = pd.DataFrame(rows, columns=[c for c in QUEUE_COLUMNS if c != "priority_rank"])
+    queue = queue.sort_values([SCORE_COLUMN] + KEY_COLUMNS, ascending=[False] + [True] * len(KEY_COLUMNS))
+    queue.insert(0, "priority_rank", range(1, len(queue) + 1))
+    return queue.reset_index(drop=True)
+
+
+def diff_queue(queue: pd.DataFrame, existing: dict) -> pd.DataFrame:
+    """Rows added, updated (a score, tier, plan or workflow field differs) or removed relative to the existing queue."""
+    changes = []
+    seen = set()
+    for row in queue.to_dict("records"):
+        key = _key(row)
+        seen.add(key)
+        old = existing.get(key)
+        if old is None:
+            changes.append({"change_type": "added", **row})
+            continue
+        for col in DIFF_COLUMNS:
+            new_val, old_val = row.get(col), old.get(col)
+            if pd.isna(new_val) and pd.isna(old_val):
+                continue
+            if col in (SCORE_COLUMN, "risk_percentile"):
+                same = not pd.isna(new_val) and not pd.isna(old_val) and abs(float(new_val) - float(old_val)) < 1e-12
+            else:
+                same = str(new_val) == str(old_val)
+            if not same:
+                changes.append({"change_type": "updated", **row})
+                break
+    for key, old in existing.items():
+        if key not in seen:
+            changes.append({"change_type": "removed", **{c: old.get(c) for c in QUEUE_COLUMNS}})
+    return pd.DataFrame(changes, columns=["change_type", *QUEUE_COLUMNS])
+
+
+def main():
+    args = parse_args()
+    existing = load_queue(args.queue)
+    selected = stream_top_rows(
+        args.scored,
+        existing,
+        args.tiers,
+        args.site_col,
+        args.per_site,
+        args.per_owner,
+        args.chunksize,
+        args.db,
+    )
+    queue = merge_queue(selected, existing, args.max_rows, args.sla_days)
+    changes = diff_queue(queue, existing)
+
+    changes_path = args.queue.with_name(args.queue.stem + ".changes.csv")
+    if changes.empty:
+        print("Triage queue unchanged")
+    else:
+        args.queue.parent.mkdir(parents=True, exist_ok=True)
+        queue.to_csv(args.queue, index=False)
+        changes.to_csv(changes_path, index=False)
+        print("Triage queue updated")
+        print(f"Queue:   {args.queue} ({len(queue)} rows)")
+        print(f"Changes: {changes_path}")
+    if args.db is not None:
+        load_table(queue, "triage", args.db)
+    counts = changes["change_type"].value_counts().to_dict()
+    print(
+        f"Added: {counts.get('added', 0)}, Updated: {counts.get('updated', 0)}, "
+        f"Removed: {counts.get('removed', 0)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Single entry point for the dropout pipeline and dashboard tools.
+
+Subcommands map onto the existing scripts and take the same arguments. Only
+the chosen subcommand's module is imported, and those modules load pandas /
+numpy / sklearn / joblib / requests lazily (lazy_imports.py), so `--help`,
+template generation and other cheap paths start without paying for them.
+
+Usage:
+    cadence <command> [args...]
+    cadence predict --help
+    cadence bench-startup --repeat 5 --budget-ms 100
+
+    (or `python cadence.py <command> ...` without installing)
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+COMMANDS = {
+    "scrape": ("ctgov_scraper", "Scrape ClinicalTrials.gov and export the context graph."),
+    "reweight": ("reweight_graph_edges", "Recompute graph_weight with new decay/quality settings."),
+    "graph-index": ("ctgov_graph_index", "Build or query the CSR graph index."),
+    "cube": ("dropout_cube", "Build or query the dropout aggregate cube."),
+    "train": ("train_dropout_model", "Train the dropout weight model."),
+    "predict": ("predict_dropout_risk", "Score dropout risk for CRC actioning."),
+    "distill": ("distill_model", "Distill the dropout weight model into a fast surrogate."),
+    "triage": ("build_triage_queue", "Refresh the CRC triage queue."),
+    "forecast": ("retention_forecast", "Forecast completers per trial and site."),
+    "synth-patients": ("generate_synthetic_patients", "Generate the synthetic patient roster."),
+    "train-patients": ("train_model", "Train the patient dropout classifier."),
+    "export-predictions": ("generate_predictions_csv", "Export dashboard predictions.csv."),
+    "visits": ("visit_log", "Append visit events and refresh live patient features."),
+    "backfill": ("backfill_scores", "Backfill historical patient scores and flag lead times."),
+    "what-if": ("what_if", "Score intervention scenarios for every patient."),
+    "db": ("analytics_db", "Load, list or export analytics database tables."),
+    "layout": ("graph_layout_export", "Precompute graph layout and LOD views."),
+    "serve": ("dashboard_api", "Serve the dashboard data API."),
+    "pipeline": ("pipeline", "Run the pipeline stages that are out of date."),
+}
+BENCH_COMMAND = "bench-startup"
+
+
+def _usage() -> str:
+    width = max(len(name) for name in [*COMMANDS, BENCH_COMMAND])
+    lines = ["usage: cadence <command> [args...]", "", "commands:"]
+    for name, (_, help_text) in COMMANDS.items():
+        lines.append(f"  {name:<{width}}  {help_text}")
+    lines.append(f"  {BENCH_COMMAND:<{width}}  Measure cold-start time of each command's --help.")
+    return "\n".join(lines)
+
+
+def _time_process(argv: list[str], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def bench_startup(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog=f"cadence {BENCH_COMMAND}",
+        description="Time `cadence <command> --help` in fresh interpreters.",
+    )
+    parser.add_argument("commands", nargs="*", default=list(COMMANDS), help="Commands to time (default: all).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command.")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=100.0,
+        help="Fail when a command's median startup exceeds the bare interpreter by more than this.",
+    )
+    args = parser.parse_args(argv)
+    unknown = [c for c in args.commands if c not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown commands: {unknown}")
+
+    script = str(Path(__file__).resolve())
+    baseline = statistics.median(_time_process([sys.executable, "-c", "pass"], args.repeat))
+    print(f"{'command':<20} {'median ms':>10} {'min ms':>8} {'over python':>12}")
+    print(f"{'(python -c pass)':<20} {baseline:>10.1f} {'':>8} {'':>12}")
+    over_budget = []
+    for name in args.commands:
+        timings = _time_process([sys.executable, script, name, "--help"], args.repeat)
+        median = statistics.median(timings)
+        overhead = median - baseline
+        flag = "  OVER BUDGET" if overhead > args.budget_ms else ""
+        print(f"{name:<20} {median:>10.1f} {min(timings):>8.1f} {overhead:>12.1f}{flag}")
+        if flag:
+            over_budget.append(name)
+    if over_budget:
+        print(f"\n{len(over_budget)} command(s) exceed {args.budget_ms:.0f} ms of import overhead: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(_usage())
+        return 0
+
+    command, rest = argv[0], argv[1:]
+    if command == BENCH_COMMAND:
+        return bench_startup(rest)
+    if command not in COMMANDS:
+        print(f"cadence: unknown command '{command}'\n\n{_usage()}", file=sys.stderr)
+        return 2
+
+    # Subcommand modules parse sys.argv themselves; present them their own argv.
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    module = importlib.import_module(COMMANDS[command][0])
+    sys.argv = [f"cadence {command}", *rest]
+    module.main()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Per-condition model shards for the dropout weight model, with a routing scorer.
+
+train_dropout_model.py --shards trains one model per `search_condition` (or
+per condition cluster from a --shard-groups JSON of condition -> cluster)
+next to the usual all-conditions model, which stays the shared fallback.
+Conditions with fewer than --shard-min-rows training rows, and conditions
+seen only at scoring time, route to the fallback.
+
+Shards train in parallel worker processes. Each shard records a fingerprint
+of its training rows and model settings in shards/manifest.json, and a
+retrain reuses any shard file whose fingerprint is unchanged. Adding a
+condition therefore trains only that condition's shard (plus the fallback).
+
+ShardRouter scores a frame by mapping each row's condition to its shard and
+calling each shard model once on its rows, with the fallback taking the rest.
+route_with_shards sets it up for the scoring CLIs (predict_dropout_risk.py,
+generate_predictions_csv.py --shards).
+
+Layout (beside the fallback bundle):
+    - shards/manifest.json   (routing table, fingerprints, per-shard rows and metrics)
+    - shards/<shard>.joblib  (one {"model", "metadata"} bundle per shard)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from prediction_cache import model_fingerprint
+from process_pool import pool_size, run_pool
+from tracing import span
+
+joblib = lazy_import("joblib")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+CONDITION_COL = "search_condition"
+SHARD_DIR = "shards"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def shard_name(label: str) -> str:
+    """File-safe shard name for a condition or cluster label."""
+    return re.sub(r"[^a-z0-9]+", "_", str(label).lower()).strip("_") or "unnamed"
+
+
+def load_shard_groups(path: Path | None) -> dict:
+    if path is None:
+        return {}
+    if not path.exists():
+        raise FileNotFoundError(f"Shard groups file not found: {path}")
+    with open(path, encoding="utf-8") as f:
+        groups = json.load(f)
+    if not isinstance(groups, dict):
+        raise ValueError(f"{path} must hold a JSON object of condition -> cluster name.")
+    return groups
+
+
+def data_fingerprint(x: pd.DataFrame, y, settings: str) -> str:
+    """Hash of a shard's training rows, target and model settings."""
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(x, index=False).to_numpy().tobytes())
+    digest.update(np.asarray(y, dtype=float).tobytes())
+    digest.update("\x1f".join(map(str, x.columns)).encode("utf-8"))
+    digest.update(settings.encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def load_manifest(shard_dir: Path) -> dict | None:
+    path = shard_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fit_shard(task: tuple) -> tuple[str, int]:
+    name, x, y, numeric_cols, categorical_cols, fit, path, metadata = task
+    pipeline = fit(x, y, numeric_cols, categorical_cols, n_jobs=1)
+    joblib.dump({"model": pipeline, "metadata": metadata}, path)
+    return name, path.stat().st_size
+
+
+def train_shards(
+    x_train: pd.DataFrame,
+    y_train,
+    numeric_cols: list[str],
+    categorical_cols: list[str],
+    fit,
+    shard_dir: Path,
+    groups: dict | None = None,
+    min_rows: int = 200,
+    jobs: int | None = None,
+    settings: str = "",
+) -> dict:
+    """Train (or reuse) one shard per condition cluster; returns the manifest, also written to shard_dir.
+
+    `fit(x, y, numeric_cols, categorical_cols, n_jobs=...)` builds and fits one shard pipeline.
+    """
+    groups = groups or {}
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    previous = load_manifest(shard_dir) or {}
+    previous_shards = previous.get("shards", {}) if previous.get("version") == MANIFEST_VERSION else {}
+
+    conditions = x_train[CONDITION_COL].astype(object)
+    labels = conditions.map(lambda c: groups.get(c, c) if pd.notna(c) else None)
+    counts = labels.value_counts()
+    routes, shards, tasks = {}, {}, []
+    for label, rows in counts.items():
+        if rows < min_rows:
+            continue
+        name = shard_name(label)
+        mask = (labels == label).to_numpy()
+        x_shard, y_shard = x_train[mask], np.asarray(y_train)[mask]
+        fingerprint = data_fingerprint(x_shard, y_shard, settings)
+        path = shard_dir / f"{name}.joblib"
+        shards[name] = {"label": str(label), "rows": int(rows), "fingerprint": fingerprint, "file": path.name}
+        for condition in conditions[mask].unique():
+            routes[str(condition)] = name
+        if previous_shards.get(name, {}).get("fingerprint") == fingerprint and path.exists():
+            shards[name].update(reused=True, bytes=path.stat().st_size)
+            continue
+        metadata = {"shard": name, "label": str(label), "rows": int(rows), "fingerprint": fingerprint}
+        tasks.append((name, x_shard, y_shard, numeric_cols, categorical_cols, fit, path, metadata))
+
+    jobs = pool_size(jobs, len(tasks))
+    with span("shards.fit", shards=len(tasks), jobs=jobs) as s:
+        results = run_pool(_fit_shard, tasks, jobs)
+        s.add(rows=sum(len(task[1]) for task in tasks))
+    for name, size in results:
+        shards[name].update(reused=False, bytes=size)
+
+    # Files of shards that no longer exist are removed so the directory mirrors the manifest.
+    for name, entry in previous_shards.items():
+        stale = shard_dir / entry.get("file", "")
+        if name not in shards and stale.is_file():
+            stale.unlink()
+
+    manifest = {"version": MANIFEST_VERSION, "condition_column": CONDITION_COL, "routes": routes, "shards": shards}
+    with open(shard_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class ShardRouter:
+    """Routes rows to their condition's shard model, falling back to the all-conditions model."""
+
+    def __init__(self, fallback, shard_dir: Path, manifest: dict | None = None):
+        self.fallback = fallback
+        self.shard_dir = shard_dir
+        self.manifest = manifest or load_manifest(shard_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(
+                f"Shard manifest not found in {shard_dir}. Train shards first (python train_dropout_model.py --shards)."
+            )
+        self.routes = self.manifest["routes"]
+        self._models = {}
+
+    def model(self, name: str):
+        """Shard model by name, loaded on first use."""
+        if name not in self._models:
+            path = self.shard_dir / self.manifest["shards"][name]["file"]
+            if not path.exists():
+                raise FileNotFoundError(f"Shard model not found: {path}. Retrain with --shards.")
+            self._models[name] = joblib.load(path)["model"]
+        return self._models[name]
+
+    def route(self, x: pd.DataFrame) -> pd.Series:
+        """Shard name per row ("" for the fallback)."""
+        if len(x) and (CONDITION_COL not in x.columns or x[CONDITION_COL].isna().all()):
+            # Without conditions every row would silently score with the fallback.
+            raise ValueError(
+                f"No {CONDITION_COL} values to route on. It comes from the trial nodes: score from the "
+                f"graph with its nodes export (--nodes) or include {CONDITION_COL} in the input."
+            )
+        conditions = x[CONDITION_COL].astype(object)
+        return conditions.astype(str).map(self.routes).where(conditions.notna(), "").fillna("")
+
+    def predict(self, x: pd.DataFrame) -> np.ndarray:
+        routes = self.route(x).to_numpy()
+        out = np.empty(len(x))
+        for name in pd.unique(routes):
+            mask = routes == name
+            model = self.model(name) if name else self.fallback
+            out[mask] = model.predict(x[mask])
+        return out
+
+
+def route_with_shards(model, model_path: Path, model_key: str, columns: list[str]) -> tuple[ShardRouter, str]:
+    """`model` wrapped in a ShardRouter over the shards beside `model_path`, and its cache key.
+
+    The shard manifest is chained into `model_key`, so retraining any shard
+    invalidates cached scores.
+    """
+    shard_dir = model_path.parent / SHARD_DIR
+    router = ShardRouter(model, shard_dir)
+    return router, model_fingerprint(shard_dir / MANIFEST_NAME, model_key, columns)
@@ -0,0 +1,425 @@
+"""
+Compact CSR index over the context graph exports with a query API.
+
+Loads ctgov_graph_nodes.csv / ctgov_graph_edges.csv once into integer-ID CSR
+adjacency arrays (forward and reverse) with typed edge attributes, and persists
+them as a directory of .npy files that reopen memory-mapped, so queries do not
+rescan the CSVs.
+
+Inputs:
+    - ctgov_graph_nodes.csv
+    - ctgov_graph_edges.csv
+
+Outputs:
+    - ctgov_graph_index/  (manifest.json + memory-mappable .npy arrays)
+
+Usage:
+    python ctgov_graph_index.py --build
+    python ctgov_graph_index.py --trial NCT03242252
+    python ctgov_graph_index.py --country "United States"
+    python ctgov_graph_index.py --neighborhood NCT03242252 --hops 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+INDEX_VERSION = 1
+GROUPED_NODE_TYPES = ("country", "outcome")
+
+_ARRAY_NAMES = [
+    "node_ids",
+    "node_type",
+    "node_trial",
+    "node_group",
+    "label_offsets",
+    "label_blob",
+    "edge_src",
+    "edge_dst",
+    "edge_type",
+    "edge_weight",
+    "edge_discontinued",
+    "edge_reason",
+    "edge_period",
+    "out_indptr",
+    "out_nbr",
+    "out_eid",
+    "in_indptr",
+    "in_nbr",
+    "in_eid",
+    "trial_event_indptr",
+    "trial_event_eid",
+    "group_indptr",
+    "group_trials",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build or query the context graph CSR index.")
+    parser.add_argument(
+        "--nodes",
+        type=Path,
+        default=Path("ctgov_graph_nodes.csv"),
+        help="Path to graph nodes CSV.",
+    )
+    parser.add_argument(
+        "--edges",
+        type=Path,
+        default=Path("ctgov_graph_edges.csv"),
+        help="Path to graph edges CSV.",
+    )
+    parser.add_argument(
+        "--index-dir",
+        type=Path,
+        default=Path("ctgov_graph_index"),
+        help="Directory holding the persisted index.",
+    )
+    parser.add_argument(
+        "--build",
+        action="store_true",
+        help="(Re)build the index from the CSVs before querying.",
+    )
+    parser.add_argument("--trial", type=str, default=None, help="Show arms, periods and dropout events.")
+    parser.add_argument("--country", type=str, default=None, help="List trials run in a country.")
+    parser.add_argument("--outcome", type=str, default=None, help="List trials with a primary outcome title.")
+    parser.add_argument("--neighborhood", type=str, default=None, help="Node ID to expand.")
+    parser.add_argument("--hops", type=int, default=2, help="Hops for --neighborhood.")
+    return parser.parse_args()
+
+
+def _codes(values: pd.Series) -> tuple[np.ndarray, list]:
+    """Factorize to int32 codes (-1 for missing) and a vocabulary list."""
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def _lookup(node_ids: np.ndarray, ids) -> tuple[np.ndarray, np.ndarray]:
+    """Positions of `ids` in the sorted `node_ids`, and a mask of the ids that are present."""
+    ids = np.asarray(ids).astype(str)
+    if len(node_ids) == 0:
+        return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+    pos = np.minimum(np.searchsorted(node_ids, ids), len(node_ids) - 1)
+    return pos, node_ids[pos] == ids
+
+
+def _numeric(frame: pd.DataFrame, col: str) -> np.ndarray:
+    """float32 values of `col`, or NaN throughout when the export lacks it."""
+    if col not in frame.columns:
+        return np.full(len(frame), np.nan, dtype=np.float32)
+    return pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=np.float32)
+
+
+def _csr(keys: np.ndarray, values: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Group `values` by integer `keys` into (indptr, values, original positions)."""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr, values[order].astype(np.int32), order.astype(np.int32)
+
+
+def _csr_gather(indptr: np.ndarray, data: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Concatenate CSR rows without a Python loop. Returns (values, row of each value)."""
+    starts = np.asarray(indptr[rows], dtype=np.int64)
+    lengths = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.asarray(data[starts[owner] + offsets]), rows[owner]
+
+
+class GraphIndex:
+    """Integer-ID CSR view of the context graph."""
+
+    def __init__(self, arrays: dict, manifest: dict):
+        self.arrays = arrays
+        self.manifest = manifest
+        self.node_types = manifest["node_types"]
+        self.edge_types = manifest["edge_types"]
+        self.reasons = manifest["reasons"]
+        self.periods = manifest["periods"]
+        self._group_lookup = {tuple(k.split("\x1f", 1)): i for i, k in enumerate(manifest["groups"])}
+        for name in _ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def from_frames(cls, nodes: pd.DataFrame, edges: pd.DataFrame) -> "GraphIndex":
+        nodes = nodes.drop_duplicates(subset=["node_id"]).copy()
+        nodes["node_id"] = nodes["node_id"].astype(str)
+        edges = edges.copy()
+        edges["source_id"] = edges["source_id"].astype(str)
+        edges["target_id"] = edges["target_id"].astype(str)
+
+        node_ids = np.unique(
+            np.concatenate([nodes["node_id"].to_numpy(), edges["source_id"].to_numpy(), edges["target_id"].to_numpy()])
+        ).astype(str)
+        n = len(node_ids)
+        node_pos = np.searchsorted(node_ids, nodes["node_id"].to_numpy())
+
+        node_types = sorted(nodes["node_type"].dropna().astype(str).unique())
+        node_type = np.full(n, -1, dtype=np.int8)
+        node_type[node_pos] = pd.Categorical(nodes["node_type"], categories=node_types).codes
+
+        node_trial = np.full(n, -1, dtype=np.int32)
+        trial_pos, known = _lookup(node_ids, nodes["trial_id"])
+        node_trial[node_pos[known]] = trial_pos[known]
+
+        labels = np.full(n, "", dtype=object)
+        labels[node_pos] = nodes["label"].fillna("").astype(str).to_numpy()
+        encoded = [s.encode("utf-8") for s in labels]
+        label_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=label_offsets[1:])
+        label_blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        # Country/outcome nodes are per-trial; group them by (type, label) so
+        # "trials sharing X" is a single CSR slice.
+        node_group = np.full(n, -1, dtype=np.int32)
+        grouped = nodes[nodes["node_type"].isin(GROUPED_NODE_TYPES)]
+        group_keys = grouped["node_type"].astype(str) + "\x1f" + grouped["label"].fillna("").astype(str)
+        group_codes, groups = _codes(group_keys)
+        node_group[np.searchsorted(node_ids, grouped["node_id"].to_numpy())] = group_codes
+        grouped_trials, known = _lookup(node_ids, grouped["trial_id"])
+        pairs = np.empty((0, 2), dtype=np.int64)
+        if known.any():
+            pairs = np.unique(np.stack([group_codes[known], grouped_trials[known]], axis=1), axis=0)
+        group_indptr, group_trials, _ = _csr(pairs[:, 0], pairs[:, 1], len(groups))
+
+        src = np.searchsorted(node_ids, edges["source_id"].to_numpy()).astype(np.int32)
+        dst = np.searchsorted(node_ids, edges["target_id"].to_numpy()).astype(np.int32)
+        edge_types = sorted(edges["edge_type"].dropna().astype(str).unique())
+        edge_type = pd.Categorical(edges["edge_type"], categories=edge_types).codes.astype(np.int8)
+        edge_weight = _numeric(edges, "graph_weight")
+        edge_discontinued = _numeric(edges, "discontinued_n")
+        edge_reason, reasons = _codes(edges["reason"]) if "reason" in edges else (np.full(len(edges), -1, np.int32), [])
+        edge_period, periods = (
+            _codes(edges["period_title"]) if "period_title" in edges else (np.full(len(edges), -1, np.int32), [])
+        )
+
+        out_indptr, out_nbr, out_eid = _csr(src, dst, n)
+        in_indptr, in_nbr, in_eid = _csr(dst, src, n)
+
+        is_event = np.flatnonzero(
+            (edge_type == edge_types.index("dropout_event")) if "dropout_event" in edge_types else np.zeros(len(edges), bool)
+        )
+        event_trial, known = _lookup(node_ids, edges["trial_id"].to_numpy()[is_event])
+        is_event, event_trial = is_event[known], event_trial[known]
+        trial_event_indptr, trial_event_eid, _ = _csr(event_trial, is_event, n)
+
+        arrays = {
+            "node_ids": node_ids,
+            "node_type": node_type,
+            "node_trial": node_trial,
+            "node_group": node_group,
+            "label_offsets": label_offsets,
+            "label_blob": label_blob,
+            "edge_src": src,
+            "edge_dst": dst,
+            "edge_type": edge_type,
+            "edge_weight": edge_weight,
+            "edge_discontinued": edge_discontinued,
+            "edge_reason": edge_reason,
+            "edge_period": edge_period,
+            "out_indptr": out_indptr,
+            "out_nbr": out_nbr,
+            "out_eid": out_eid,
+            "in_indptr": in_indptr,
+            "in_nbr": in_nbr,
+            "in_eid": in_eid,
+            "trial_event_indptr": trial_event_indptr,
+            "trial_event_eid": trial_event_eid,
+            "group_indptr": group_indptr,
+            "group_trials": group_trials,
+        }
+        manifest = {
+            "version": INDEX_VERSION,
+            "node_count": int(n),
+            "edge_count": int(len(edges)),
+            "node_types": node_types,
+            "edge_types": edge_types,
+            "reasons": reasons,
+            "periods": periods,
+            "groups": groups,
+        }
+        return cls(arrays, manifest)
+
+    @classmethod
+    def from_csv(cls, nodes_path: Path, edges_path: Path) -> "GraphIndex":
+        if not nodes_path.exists():
+            raise FileNotFoundError(f"Nodes file not found: {nodes_path}")
+        if not edges_path.exists():
+            raise FileNotFoundError(f"Edges file not found: {edges_path}")
+        return cls.from_frames(pd.read_csv(nodes_path), pd.read_csv(edges_path))
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, index_dir: Path):
+        index_dir.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAY_NAMES:
+            np.save(index_dir / f"{name}.npy", np.asarray(self.arrays[name]))
+        with open(index_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> "GraphIndex":
+        manifest_path = index_dir / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"Graph index not found: {index_dir}. Build it with --build.")
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != INDEX_VERSION:
+            raise ValueError(f"Graph index version mismatch in {index_dir}. Rebuild it with --build.")
+        mode = "r" if mmap else None
+        arrays = {name: np.load(index_dir / f"{name}.npy", mmap_mode=mode) for name in _ARRAY_NAMES}
+        return cls(arrays, manifest)
+
+    # -- lookups ------------------------------------------------------------
+
+    def node_index(self, node_id: str) -> int:
+        pos = int(np.searchsorted(self.node_ids, node_id))
+        if pos >= len(self.node_ids) or self.node_ids[pos] != node_id:
+            raise KeyError(f"Unknown node: {node_id}")
+        return pos
+
+    def label(self, idx: int) -> str:
+        start, end = int(self.label_offsets[idx]), int(self.label_offsets[idx + 1])
+        return bytes(self.label_blob[start:end]).decode("utf-8")
+
+    def _nodes_frame(self, idx: np.ndarray) -> pd.DataFrame:
+        idx = np.asarray(idx, dtype=np.int64)
+        types = np.asarray(self.node_types + ["unknown"], dtype=object)
+        return pd.DataFrame(
+            {
+                "node_id": np.asarray(self.node_ids[idx]).astype(str),
+                "node_type": types[np.asarray(self.node_type[idx])],
+                "label": [self.label(int(i)) for i in idx],
+            }
+        )
+
+    def _children(self, trial_idx: int, edge_type: str) -> np.ndarray:
+        start, end = int(self.out_indptr[trial_idx]), int(self.out_indptr[trial_idx + 1])
+        eids = self.out_eid[start:end]
+        code = self.edge_types.index(edge_type) if edge_type in self.edge_types else -2
+        return np.asarray(self.out_nbr[start:end])[np.asarray(self.edge_type[eids]) == code]
+
+    # -- queries ------------------------------------------------------------
+
+    def trial_arms(self, trial_id: str) -> pd.DataFrame:
+        return self._nodes_frame(self._children(self.node_index(trial_id), "trial_has_arm"))
+
+    def trial_periods(self, trial_id: str) -> pd.DataFrame:
+        return self._nodes_frame(self._children(self.node_index(trial_id), "trial_has_period"))
+
+    def trial_dropout_events(self, trial_id: str) -> pd.DataFrame:
+        idx = self.node_index(trial_id)
+        start, end = int(self.trial_event_indptr[idx]), int(self.trial_event_indptr[idx + 1])
+        eids = np.asarray(self.trial_event_eid[start:end])
+        reasons = np.asarray(self.reasons + [None], dtype=object)
+        periods = np.asarray(self.periods + [None], dtype=object)
+        return pd.DataFrame(
+            {
+                "source_id": np.asarray(self.node_ids[np.asarray(self.edge_src[eids])]).astype(str),
+                "target_id": np.asarray(self.node_ids[np.asarray(self.edge_dst[eids])]).astype(str),
+                "reason": reasons[np.asarray(self.edge_reason[eids])],
+                "period_title": periods[np.asarray(self.edge_period[eids])],
+                "discontinued_n": np.asarray(self.edge_discontinued[eids]),
+                "graph_weight": np.asarray(self.edge_weight[eids]),
+            }
+        )
+
+    def trials_with(self, node_type: str, label: str) -> list[str]:
+        """All trials linked to a country/outcome with this exact label."""
+        group = self._group_lookup.get((node_type, label))
+        if group is None:
+            return []
+        start, end = int(self.group_indptr[group]), int(self.group_indptr[group + 1])
+        return np.asarray(self.node_ids[np.asarray(self.group_trials[start:end])]).astype(str).tolist()
+
+    def trials_sharing(self, trial_id: str, node_type: str = "country") -> list[str]:
+        """Other trials sharing at least one country/outcome label with this trial."""
+        idx = self.node_index(trial_id)
+        edge_type = f"trial_has_{node_type}"
+        groups = np.asarray(self.node_group[self._children(idx, edge_type)])
+        groups = groups[groups >= 0]
+        trials, _ = _csr_gather(self.group_indptr, self.group_trials, groups)
+        trials = np.unique(trials)
+        trials = trials[trials != idx]
+        return np.asarray(self.node_ids[trials]).astype(str).tolist()
+
+    def neighborhood(self, node_id: str, hops: int = 2) -> pd.DataFrame:
+        """Undirected k-hop neighborhood with graph_weight aggregated per node.
+
+        `weight_sum` totals graph_weight over edges of the induced subgraph
+        incident to each node; `hops` is the BFS distance from `node_id`.
+        """
+        start = self.node_index(node_id)
+        dist = np.full(len(self.node_ids), -1, dtype=np.int32)
+        dist[start] = 0
+        frontier = np.array([start], dtype=np.int64)
+        for hop in range(1, hops + 1):
+            out_nbrs, _ = _csr_gather(self.out_indptr, self.out_nbr, frontier)
+            in_nbrs, _ = _csr_gather(self.in_indptr, self.in_nbr, frontier)
+            nbrs = np.unique(np.concatenate([out_nbrs, in_nbrs]))
+            nbrs = nbrs[dist[nbrs] < 0]
+            if len(nbrs) == 0:
+                break
+            dist[nbrs] = hop
+            frontier = nbrs.astype(np.int64)
+
+        reached = np.flatnonzero(dist >= 0)
+        eids, _ = _csr_gather(self.out_indptr, self.out_eid, reached)
+        dst = np.asarray(self.edge_dst[eids])
+        eids = eids[dist[dst] >= 0]
+        weights = np.nan_to_num(np.asarray(self.edge_weight[eids], dtype=np.float64))
+        weight_sum = np.zeros(len(self.node_ids), dtype=np.float64)
+        np.add.at(weight_sum, np.asarray(self.edge_src[eids]), weights)
+        np.add.at(weight_sum, np.asarray(self.edge_dst[eids]), weights)
+
+        frame = self._nodes_frame(reached)
+        frame["hops"] = dist[reached]
+        frame["weight_sum"] = weight_sum[reached]
+        return frame.sort_values(["hops", "weight_sum"], ascending=[True, False]).reset_index(drop=True)
+
+
+def main():
+    args = parse_args()
+    if args.build or not (args.index_dir / "manifest.json").exists():
+        index = GraphIndex.from_csv(args.nodes, args.edges)
+        index.save(args.index_dir)
+        print(f"Graph index built: {args.index_dir}")
+        print(f"Nodes: {index.manifest['node_count']}, Edges: {index.manifest['edge_count']}")
+    index = GraphIndex.load(args.index_dir)
+
+    if args.trial:
+        print(f"\nArms of {args.trial}:")
+        print(index.trial_arms(args.trial).to_string(index=False))
+        print(f"\nPeriods of {args.trial}:")
+        print(index.trial_periods(args.trial).to_string(index=False))
+        print(f"\nDropout events of {args.trial}:")
+        print(index.trial_dropout_events(args.trial).to_string(index=False))
+    if args.country:
+        trials = index.trials_with("country", args.country)
+        print(f"\nTrials in {args.country}: {len(trials)}")
+        print("\n".join(trials))
+    if args.outcome:
+        trials = index.trials_with("outcome", args.outcome)
+        print(f"\nTrials with outcome '{args.outcome}': {len(trials)}")
+        print("\n".join(trials))
+    if args.neighborhood:
+        frame = index.neighborhood(args.neighborhood, hops=args.hops)
+        print(f"\n{args.hops}-hop neighborhood of {args.neighborhood}: {len(frame)} nodes")
+        print(frame.head(50).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
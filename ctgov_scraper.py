@@ -7,24 +7,36 @@ site distribution, and dropout patterns.
 
 Usage:
     python ctgov_scraper.py
+    python ctgov_scraper.py --resume     (continue an interrupted run)
 
 Outputs:
     - ctgov_cardiometabolic_trials.json  (full structured data)
     - ctgov_cardiometabolic_trials.csv   (flattened for analysis)
     - ctgov_dropout_analysis.csv         (dropout-specific analysis view)
+    - ctgov_scrape_journal.sqlite        (durable work journal for --resume)
+    - ctgov_dropout_cube.sqlite          (precomputed dropout roll-ups)
+    - cadence_analytics.sqlite           (with --db: trials/nodes/edges/provenance tables)
 
 Requirements:
     pip install requests pandas
 """
 
-import requests
-import pandas as pd
+import argparse
 import json
+import sqlite3
 import time
 import math
 from datetime import datetime
 from pathlib import Path
 
+from analytics_db import add_db_argument, load_table
+from dropout_cube import update_cube
+from lazy_imports import lazy_import
+from tracing import add_profile_arguments, profiled, span, to_csv
+
+requests = lazy_import("requests")
+pd = lazy_import("pandas")
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -51,6 +63,16 @@ CONDITION_QUERIES = [
 # Minimum enrollment to filter out tiny pilot studies
 MIN_ENROLLMENT = 200
 
+# Dropout-event weighting parameters (see reweight_graph_edges.py to re-derive
+# weights under different values without rescraping)
+RECENCY_HALF_LIFE_DAYS = 365 * 8
+NO_FLOW_EVIDENCE_QUALITY = 0.0
+MISSING_START_EVIDENCE_QUALITY = 0.6
+UNKNOWN_REASON_EVIDENCE_QUALITY = 0.7
+
+# Durable work journal (search progress, fetch status, processed records)
+JOURNAL_PATH = OUTPUT_DIR / "ctgov_scrape_journal.sqlite"
+
 # ============================================================================
 # API INTERACTION
 # ============================================================================
@@ -70,9 +92,13 @@ def search_trials(condition: str, page_token: str = None) -> dict:
         params["pageToken"] = page_token
 
     try:
-        resp = requests.get(BASE_URL, params=params, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
+        with span("search.page", condition=condition) as s:
+            resp = requests.get(BASE_URL, params=params, timeout=30)
+            s.add(bytes=len(resp.content))
+            resp.raise_for_status()
+            data = resp.json()
+            s.add(rows=len(data.get("studies", [])))
+        return data
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 429:
             print("  Rate limited. Waiting 60s...")
@@ -88,9 +114,11 @@ def fetch_full_study(nct_id: str) -> dict:
     """Fetch complete study record including results section."""
     url = f"{BASE_URL}/{nct_id}"
     try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
+        with span("fetch", nct_id=nct_id) as s:
+            resp = requests.get(url, timeout=30)
+            s.add(bytes=len(resp.content))
+            resp.raise_for_status()
+            return resp.json()
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 429:
             print(f"  Rate limited on {nct_id}. Waiting 60s...")
@@ -103,6 +131,11 @@ def fetch_full_study(nct_id: str) -> dict:
         return None
 
 
+def _throttle():
+    with span("rate_limit"):
+        time.sleep(RATE_LIMIT_DELAY)
+
+
 # ============================================================================
 # DATA EXTRACTION
 # ============================================================================
@@ -403,7 +436,7 @@ def _to_int(value):
             return None
 
 
-def _compute_recency_decay(completion_date, reference_ts, half_life_days=365 * 8):
+def _compute_recency_decay(completion_date, reference_ts, half_life_days=RECENCY_HALF_LIFE_DAYS):
     """Exponential decay factor using completion date recency."""
     dt = pd.to_datetime(completion_date, errors="coerce")
     ref_dt = pd.to_datetime(reference_ts, errors="coerce")
@@ -542,11 +575,11 @@ def _build_graph_exports(records: list, scraped_at: str):
 
             evidence_quality = 1.0
             if not has_flow:
-                evidence_quality = 0.0
+                evidence_quality = NO_FLOW_EVIDENCE_QUALITY
             elif total_started in (None, 0):
-                evidence_quality = 0.6
+                evidence_quality = MISSING_START_EVIDENCE_QUALITY
             elif not reason or reason == "Unknown":
-                evidence_quality = 0.7
+                evidence_quality = UNKNOWN_REASON_EVIDENCE_QUALITY
 
             base_rate = trial_rate or 0.0
             size_factor = math.log1p(total_started) if total_started and total_started > 0 else 0.0
@@ -635,12 +668,141 @@ def _build_graph_exports(records: list, scraped_at: str):
     )
 
 
+# ============================================================================
+# WORK JOURNAL
+# ============================================================================
+
+
+def _open_journal(journal_path: Path, resume: bool) -> sqlite3.Connection:
+    """Open the SQLite work journal, clearing prior state unless resuming."""
+    conn = sqlite3.connect(journal_path)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS search_progress (
+            condition TEXT PRIMARY KEY,
+            next_page_token TEXT,
+            done INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS search_results (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            nct_id TEXT UNIQUE NOT NULL,
+            search_condition TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS fetch_status (
+            nct_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            error TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS records (
+            nct_id TEXT PRIMARY KEY,
+            record_json TEXT NOT NULL
+        );
+        """
+    )
+    if not resume:
+        conn.executescript(
+            """
+            DELETE FROM search_progress;
+            DELETE FROM search_results;
+            DELETE FROM fetch_status;
+            DELETE FROM records;
+            """
+        )
+    conn.commit()
+    return conn
+
+
+def _journal_search_state(conn: sqlite3.Connection, condition: str):
+    """Return (next_page_token, done) for a condition, or (None, False) if unseen."""
+    row = conn.execute(
+        "SELECT next_page_token, done FROM search_progress WHERE condition = ?",
+        (condition,),
+    ).fetchone()
+    if row is None:
+        return None, False
+    return row[0], bool(row[1])
+
+
+def _journal_search_page(
+    conn: sqlite3.Connection, condition: str, nct_ids: list, next_page_token: str, done: bool
+) -> int:
+    """Record one search page atomically. Returns the count of newly seen NCT IDs."""
+    with conn:
+        new_count = 0
+        for nct_id in nct_ids:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO search_results (nct_id, search_condition) VALUES (?, ?)",
+                (nct_id, condition),
+            )
+            new_count += cur.rowcount
+        conn.execute(
+            "INSERT OR REPLACE INTO search_progress (condition, next_page_token, done) "
+            "VALUES (?, ?, ?)",
+            (condition, next_page_token, int(done)),
+        )
+    return new_count
+
+
+def _journal_search_results(conn: sqlite3.Connection) -> dict:
+    """Return nct_id -> search_condition in discovery order."""
+    rows = conn.execute(
+        "SELECT nct_id, search_condition FROM search_results ORDER BY seq"
+    ).fetchall()
+    return dict(rows)
+
+
+def _journal_fetch_done(conn: sqlite3.Connection) -> set:
+    """NCT IDs whose record has already been fetched and processed."""
+    rows = conn.execute("SELECT nct_id FROM fetch_status WHERE status = 'done'").fetchall()
+    return {r[0] for r in rows}
+
+
+def _journal_fetch_result(
+    conn: sqlite3.Connection, nct_id: str, status: str, record: dict = None, error: str = None
+):
+    """Persist the outcome of fetching/processing a single study."""
+    with conn:
+        if record is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO records (nct_id, record_json) VALUES (?, ?)",
+                (nct_id, json.dumps(record, default=str)),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO fetch_status (nct_id, status, error, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (nct_id, status, error, datetime.now().isoformat()),
+        )
+
+
+def _journal_outputs(conn: sqlite3.Connection) -> tuple:
+    """Return (records, errors) from the journal in discovery order."""
+    records = [
+        json.loads(r[0])
+        for r in conn.execute(
+            "SELECT r.record_json FROM records r "
+            "JOIN search_results s ON s.nct_id = r.nct_id "
+            "JOIN fetch_status f ON f.nct_id = r.nct_id "
+            "WHERE f.status = 'done' ORDER BY s.seq"
+        ).fetchall()
+    ]
+    errors = [
+        {"nct_id": r[0], "error": r[1]}
+        for r in conn.execute(
+            "SELECT f.nct_id, f.error FROM fetch_status f "
+            "JOIN search_results s ON s.nct_id = f.nct_id "
+            "WHERE f.status != 'done' ORDER BY s.seq"
+        ).fetchall()
+    ]
+    return records, errors
+
+
 # ============================================================================
 # MAIN PIPELINE
 # ============================================================================
 
 
-def run_scraper():
+def run_scraper(resume: bool = False, journal_path: Path = JOURNAL_PATH, db_path: Path = None):
     """Main scraper pipeline."""
     print("=" * 70)
     print("ClinicalTrials.gov Cardiometabolic Trial Dropout Scraper")
@@ -648,68 +810,86 @@ def run_scraper():
     print(f"Start time: {datetime.now().isoformat()}")
     print(f"Searching {len(CONDITION_QUERIES)} condition queries")
     print(f"Filters: Phase 3, Completed, Has Results, Enrollment >= {MIN_ENROLLMENT}")
+    print(f"Journal: {journal_path}" + (" (resuming)" if resume else ""))
     print()
 
+    conn = _open_journal(journal_path, resume)
+
     # Step 1: Collect all unique NCT IDs matching our criteria
-    all_nct_ids = {}  # nct_id -> search_condition that found it
-    
     for i, condition in enumerate(CONDITION_QUERIES):
+        page_token, done = _journal_search_state(conn, condition)
+        if done:
+            print(f"[{i+1}/{len(CONDITION_QUERIES)}] Searching: {condition} (journaled, skipped)")
+            continue
         print(f"[{i+1}/{len(CONDITION_QUERIES)}] Searching: {condition}")
         
-        page_token = None
         condition_count = 0
+        total = "?"
         
         while True:
             data = search_trials(condition, page_token)
             studies = data.get("studies", [])
-            total = data.get("totalCount", "?")
+            total = data.get("totalCount", total)
             
             if not studies:
+                _journal_search_page(conn, condition, [], None, True)
                 break
-                
+
+            page_ids = []
             for study in studies:
                 protocol = study.get("protocolSection", {})
                 nct_id = protocol.get("identificationModule", {}).get("nctId")
                 enrollment = protocol.get("designModule", {}).get("enrollmentInfo", {}).get("count", 0)
 
                 if nct_id and enrollment and enrollment >= MIN_ENROLLMENT:
-                    if nct_id not in all_nct_ids:
-                        all_nct_ids[nct_id] = condition
-                        condition_count += 1
+                    page_ids.append(nct_id)
             
             # Check for next page
             page_token = data.get("nextPageToken")
+            condition_count += _journal_search_page(
+                conn, condition, page_ids, page_token, not page_token
+            )
             if not page_token:
                 break
-            time.sleep(RATE_LIMIT_DELAY)
+            _throttle()
         
+        all_nct_ids = _journal_search_results(conn)
         print(f"  Found {condition_count} new trials (total unique: {len(all_nct_ids)}) [API reports {total} total matches]")
-        time.sleep(RATE_LIMIT_DELAY)
+        _throttle()
+
+    all_nct_ids = _journal_search_results(conn)
+    already_done = _journal_fetch_done(conn)
+    pending = [(n, c) for n, c in all_nct_ids.items() if n not in already_done]
 
     print(f"\nTotal unique trials to fetch: {len(all_nct_ids)}")
-    print(f"Estimated time: ~{len(all_nct_ids) * RATE_LIMIT_DELAY / 60:.1f} minutes")
+    if already_done:
+        print(f"Already fetched (journal): {len(already_done)}; remaining: {len(pending)}")
+    print(f"Estimated time: ~{len(pending) * RATE_LIMIT_DELAY / 60:.1f} minutes")
     print()
 
     # Step 2: Fetch full records for each trial
-    records = []
-    errors = []
-    
-    for i, (nct_id, search_cond) in enumerate(all_nct_ids.items()):
+    for i, (nct_id, search_cond) in enumerate(pending):
         if (i + 1) % 25 == 0 or i == 0:
-            print(f"  Fetching {i+1}/{len(all_nct_ids)}: {nct_id}")
+            print(f"  Fetching {i+1}/{len(pending)}: {nct_id}")
         
         study_data = fetch_full_study(nct_id)
         if study_data:
             try:
-                record = process_study(study_data, search_cond)
-                records.append(record)
+                with span("process_study", nct_id=nct_id):
+                    record = process_study(study_data, search_cond)
+                _journal_fetch_result(conn, nct_id, "done", record=record)
             except Exception as e:
-                errors.append({"nct_id": nct_id, "error": str(e)})
+                _journal_fetch_result(conn, nct_id, "parse_error", error=str(e))
                 print(f"  Parse error for {nct_id}: {e}")
         else:
-            errors.append({"nct_id": nct_id, "error": "fetch_failed"})
+            _journal_fetch_result(conn, nct_id, "fetch_failed", error="fetch_failed")
         
-        time.sleep(RATE_LIMIT_DELAY)
+        _throttle()
+
+    with span("journal.load") as s:
+        records, errors = _journal_outputs(conn)
+        s.add(rows=len(records))
+    conn.close()
 
     print(f"\nSuccessfully processed: {len(records)} trials")
     print(f"Errors: {len(errors)}")
@@ -721,7 +901,7 @@ def run_scraper():
 
     # Full JSON
     json_path = OUTPUT_DIR / "ctgov_cardiometabolic_trials.json"
-    with open(json_path, "w") as f:
+    with span("write.json", path=str(json_path)) as s, open(json_path, "w") as f:
         json.dump({
             "metadata": {
                 "scraped_at": scraped_at,
@@ -738,12 +918,13 @@ def run_scraper():
             "trials": records,
             "errors": errors,
         }, f, indent=2, default=str)
+        s.add(rows=len(records), bytes=f.tell())
     print(f"  JSON: {json_path}")
 
     # Main CSV
     df = pd.DataFrame(records)
     csv_path = OUTPUT_DIR / "ctgov_cardiometabolic_trials.csv"
-    df.to_csv(csv_path, index=False)
+    to_csv(df, csv_path)
     print(f"  CSV:  {csv_path} ({len(df)} rows, {len(df.columns)} columns)")
 
     # Dropout analysis view
@@ -767,7 +948,7 @@ def run_scraper():
             df_dropout = df_dropout.sort_values("dropout_rate", ascending=False)
         
         dropout_path = OUTPUT_DIR / "ctgov_dropout_analysis.csv"
-        df_dropout.to_csv(dropout_path, index=False)
+        to_csv(df_dropout, dropout_path)
         print(f"  Dropout analysis: {dropout_path}")
 
         # Print summary stats
@@ -813,23 +994,62 @@ def run_scraper():
     # Graph-ready exports
     if records:
         print("\nBuilding graph-ready outputs...")
-        graph_nodes_df, graph_edges_df, graph_prov_df = _build_graph_exports(records, scraped_at)
+        with span("graph.export") as s:
+            graph_nodes_df, graph_edges_df, graph_prov_df = _build_graph_exports(records, scraped_at)
+            s.add(rows=len(graph_edges_df))
 
         nodes_path = OUTPUT_DIR / "ctgov_graph_nodes.csv"
         edges_path = OUTPUT_DIR / "ctgov_graph_edges.csv"
         prov_path = OUTPUT_DIR / "ctgov_graph_provenance.csv"
 
-        graph_nodes_df.to_csv(nodes_path, index=False)
-        graph_edges_df.to_csv(edges_path, index=False)
-        graph_prov_df.to_csv(prov_path, index=False)
+        to_csv(graph_nodes_df, nodes_path)
+        to_csv(graph_edges_df, edges_path)
+        to_csv(graph_prov_df, prov_path)
 
         print(f"  Graph nodes:       {nodes_path} ({len(graph_nodes_df)} rows)")
         print(f"  Graph edges:       {edges_path} ({len(graph_edges_df)} rows)")
         print(f"  Graph provenance:  {prov_path} ({len(graph_prov_df)} rows)")
 
+        cube_path = OUTPUT_DIR / "ctgov_dropout_cube.sqlite"
+        with span("cube.update"):
+            cube_stats = update_cube(cube_path, graph_nodes_df, graph_edges_df)
+        print(f"  Dropout cube:      {cube_path} ({cube_stats['total_cells']} cells)")
+
+    if db_path is not None:
+        load_table(df, "trials", db_path)
+        if records:
+            load_table(graph_nodes_df, "nodes", db_path)
+            load_table(graph_edges_df, "edges", db_path)
+            load_table(graph_prov_df, "provenance", db_path)
+        print(f"  Analytics DB:      {db_path}")
+
     print(f"\nCompleted at: {datetime.now().isoformat()}")
     print("=" * 70)
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape ClinicalTrials.gov dropout data.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume from the work journal, fetching only unfinished NCT IDs.",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=JOURNAL_PATH,
+        help="Path to the SQLite work journal.",
+    )
+    add_db_argument(parser, "Also bulk-load trials, graph nodes/edges and provenance into this analytics database.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="scrape"):
+        run_scraper(resume=args.resume, journal_path=args.journal, db_path=args.db)
+
+
 if __name__ == "__main__":
-    run_scraper()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -7,15 +7,14 @@ import PitchOverview from './PitchOverview';
 import CommandCenter from './components/CommandCenter';
 import GuidedTour from './components/GuidedTour';
 import CRCDemoMode from './components/CRCDemoMode';
-import { loadAllData } from './utils/dataLoader';
+import { loadPatient } from './utils/dataLoader';
 import { patientIdToNodeId } from './utils/patientMapping';
 
 const KnowledgeGraph = lazy(() => import('./KnowledgeGraph'));
 
 export default function App() {
-  const [patients, setPatients] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [selectedPatientId, setSelectedPatientId] = useState(null);
+  const [selectedPatient, setSelectedPatient] = useState(null);
   const [activeTab, setActiveTab] = useState('overview');
   const [now, setNow] = useState(new Date());
   const [targetNodeId, setTargetNodeId] = useState(null);
@@ -23,12 +22,18 @@ export default function App() {
   const [crcDemoActive, setCrcDemoActive] = useState(false);
   const [kgDemoKnowledgeLoss, setKgDemoKnowledgeLoss] = useState(null);
 
+  // Only the selected patient's row is fetched; the table pages through the API itself.
   useEffect(() => {
-    loadAllData()
-      .then(setPatients)
-      .catch((err) => console.error('Failed to load data:', err))
-      .finally(() => setLoading(false));
-  }, []);
+    if (!selectedPatientId) return undefined;
+    let cancelled = false;
+    loadPatient(selectedPatientId)
+      .then((patient) => { if (!cancelled) setSelectedPatient(patient); })
+      .catch((err) => {
+        console.error('Failed to load patient:', err);
+        if (!cancelled) setSelectedPatientId(null);
+      });
+    return () => { cancelled = true; };
+  }, [selectedPatientId]);
 
   useEffect(() => {
     const timer = setInterval(() => setNow(new Date()), 60000);
@@ -85,10 +90,6 @@ export default function App() {
     window.scrollTo({ top: 0, behavior: 'smooth' });
   }, []);
 
-  const selectedPatient = selectedPatientId
-    ? patients.find((p) => p.patient_id === selectedPatientId) || null
-    : null;
-
   const dateStr = now.toLocaleDateString('en-US', {
     weekday: 'long', year: 'numeric', month: 'long', day: 'numeric',
   });
@@ -96,17 +97,6 @@ export default function App() {
     hour: 'numeric', minute: '2-digit',
   });
 
-  if (loading) {
-    return (
-      <div className="min-h-screen flex flex-col items-center justify-center gap-4 bg-[#F9FAFB]">
-        <div className="flex items-center gap-2">
-          <Loader2 size={20} className="agent-spin text-[var(--color-agent-blue)]" />
-          <span className="text-sm text-gray-500">Loading patient data...</span>
-        </div>
-      </div>
-    );
-  }
-
   return (
     <div className="min-h-screen bg-[#F9FAFB]">
       {/* Header */}
@@ -238,11 +228,17 @@ export default function App() {
       ) : (
         <>
           <main className="max-w-[1440px] mx-auto px-4 sm:px-6 lg:px-8 py-6">
-            {selectedPatient ? (
-              <PatientDetail patient={selectedPatient} onBack={handleBack} />
+            {selectedPatientId ? (
+              selectedPatient && selectedPatient.patient_id === selectedPatientId ? (
+                <PatientDetail patient={selectedPatient} onBack={handleBack} />
+              ) : (
+                <div className="flex items-center justify-center h-[40vh] gap-2">
+                  <Loader2 size={16} className="agent-spin text-[var(--color-agent-blue)]" />
+                  <span className="text-xs text-gray-500">Loading patient...</span>
+                </div>
+              )
             ) : (
               <Dashboard
-                patients={patients}
                 onSelectPatient={handleSelectPatient}
                 onNavigateToKG={handleNavigateToKG}
               />
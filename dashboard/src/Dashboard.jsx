@@ -1,9 +1,10 @@
-import { useMemo } from 'react';
+import { useEffect, useState } from 'react';
 import { TrendingDown, Clock, Brain, DollarSign, TrendingUp, Zap, Users, Target, Info } from 'lucide-react';
 import SummaryCard from './components/SummaryCard';
 import PatientTable from './components/PatientTable';
 import AgentActivityPanel from './components/AgentActivityPanel';
 import { knowledgeBaseInterventions } from './utils/mockData';
+import { loadSummary } from './utils/dataLoader';
 
 function ImpactMetrics() {
   return (
@@ -129,14 +130,22 @@ function ImpactMetrics() {
   );
 }
 
-export default function Dashboard({ patients, onSelectPatient, onNavigateToKG }) {
-  const stats = useMemo(() => {
-    const total = patients.length;
-    const high = patients.filter((p) => p.risk_level === 'High').length;
-    const activeInterventions = patients.filter((p) => p.dropout_risk > 0.5).length;
-    const kbSize = knowledgeBaseInterventions.length;
-    return { total, high, activeInterventions, kbSize };
-  }, [patients]);
+export default function Dashboard({ onSelectPatient, onNavigateToKG }) {
+  const [summary, setSummary] = useState(null);
+
+  // Counts come precomputed from /api/summary instead of the full roster.
+  useEffect(() => {
+    loadSummary()
+      .then(setSummary)
+      .catch((err) => console.error('Failed to load summary:', err));
+  }, []);
+
+  const stats = {
+    total: summary ? summary.total : '—',
+    high: summary ? summary.by_risk_level?.High ?? 0 : '—',
+    activeInterventions: summary ? summary.elevated_risk ?? 0 : '—',
+    kbSize: knowledgeBaseInterventions.length,
+  };
 
   return (
     <div className="space-y-6">
@@ -209,7 +218,7 @@ export default function Dashboard({ patients, onSelectPatient, onNavigateToKG })
       <div className="grid grid-cols-1 xl:grid-cols-[1fr_320px] gap-5">
         {/* Patient Table */}
         <div className="animate-fade-in stagger-2" data-tour-target="patient-table">
-          <PatientTable patients={patients} onSelectPatient={onSelectPatient} onNavigateToKG={onNavigateToKG} />
+          <PatientTable onSelectPatient={onSelectPatient} onNavigateToKG={onNavigateToKG} />
         </div>
 
         {/* Sidebar: Agent Activity */}
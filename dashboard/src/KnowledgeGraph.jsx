@@ -1,5 +1,5 @@
 import { useState, useMemo, useCallback, useEffect, Component } from 'react';
-import { ArrowUpDown, Copy, Check, Info } from 'lucide-react';
+import { ArrowUpDown, Copy, Check, Info, Network } from 'lucide-react';
 
 import GraphCanvas from './components/knowledge-graph/GraphCanvas';
 import TemporalSlider from './components/knowledge-graph/TemporalSlider';
@@ -7,6 +7,7 @@ import KnowledgeLossToggle from './components/knowledge-graph/KnowledgeLossToggl
 import GraphMetricsPanel from './components/knowledge-graph/GraphMetricsPanel';
 import GraphLegend from './components/knowledge-graph/GraphLegend';
 import NodeDetailPanel from './components/knowledge-graph/NodeDetailPanel';
+import TrialNetworkCanvas from './components/knowledge-graph/TrialNetworkCanvas';
 
 import { allNodes, allEdges, nodeCountByMonth } from './utils/knowledgeGraphData';
 import {
@@ -65,6 +66,9 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
   const [layoutDirection, setLayoutDirection] = useState('TB');
   const [highlightedPath, setHighlightedPath] = useState(null);
   const [copied, setCopied] = useState(false);
+  // 'knowledge' is the bundled CRC demo graph; 'trials' is the ClinicalTrials.gov
+  // network, rendered from server-precomputed positions and tiles.
+  const [view, setView] = useState('knowledge');
 
   // Step 1: Filter by month
   const { visibleNodes, visibleEdges } = useMemo(
@@ -97,10 +101,11 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
     };
   }, [visibleNodes, visibleEdges, knowledgeLossActive, isPruning]);
 
-  // Step 4: Layout
+  // Step 4: Layout. dagre only ever sees the small bundled demo graph; the trial
+  // network comes laid out from graph_layout_export.py.
   const layoutNodes = useMemo(
-    () => computeLayout(displayNodes, displayEdges, layoutDirection),
-    [displayNodes, displayEdges, layoutDirection]
+    () => (view === 'knowledge' ? computeLayout(displayNodes, displayEdges, layoutDirection) : []),
+    [view, displayNodes, displayEdges, layoutDirection]
   );
 
   // Step 5: Display metrics
@@ -172,6 +177,7 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
   // Demo mode: external control of knowledge loss toggle
   useEffect(() => {
     if (demoKnowledgeLoss === true) {
+      setView('knowledge');
       setKnowledgeLossActive(true);
       setIsPruning(false);
     } else if (demoKnowledgeLoss === false) {
@@ -183,7 +189,10 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
   // Navigate to a specific node when arriving from another tab
   useEffect(() => {
     if (initialNodeId) {
-      const raf = requestAnimationFrame(() => setSelectedNodeId(initialNodeId));
+      const raf = requestAnimationFrame(() => {
+        setView('knowledge');
+        setSelectedNodeId(initialNodeId);
+      });
       return () => cancelAnimationFrame(raf);
     }
   }, [initialNodeId]);
@@ -203,15 +212,29 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
           </p>
         </div>
         <div className="flex items-center gap-2">
-          {/* Layout toggle */}
+          {/* View toggle */}
           <button
-            onClick={() => setLayoutDirection((d) => (d === 'TB' ? 'LR' : 'TB'))}
+            onClick={() => {
+              setView((v) => (v === 'knowledge' ? 'trials' : 'knowledge'));
+              setSelectedNodeId(null);
+            }}
             className="flex items-center gap-1.5 px-2.5 py-1.5 rounded-lg text-[10px] font-medium text-gray-500 bg-gray-100 border border-gray-200 hover:border-gray-400 hover:text-gray-700 transition-colors cursor-pointer"
-            title="Toggle layout direction"
+            title="Switch between the CRC knowledge graph and the trial network"
           >
-            <ArrowUpDown size={11} />
-            {layoutDirection === 'TB' ? 'Top → Down' : 'Left → Right'}
+            <Network size={11} />
+            {view === 'knowledge' ? 'Trial Network' : 'CRC Knowledge'}
           </button>
+          {/* Layout toggle */}
+          {view === 'knowledge' && (
+            <button
+              onClick={() => setLayoutDirection((d) => (d === 'TB' ? 'LR' : 'TB'))}
+              className="flex items-center gap-1.5 px-2.5 py-1.5 rounded-lg text-[10px] font-medium text-gray-500 bg-gray-100 border border-gray-200 hover:border-gray-400 hover:text-gray-700 transition-colors cursor-pointer"
+              title="Toggle layout direction"
+            >
+              <ArrowUpDown size={11} />
+              {layoutDirection === 'TB' ? 'Top → Down' : 'Left → Right'}
+            </button>
+          )}
           {/* Share button */}
           <button
             onClick={handleShare}
@@ -227,43 +250,56 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
       <div className="flex items-center gap-3 px-4 py-2.5 rounded-lg bg-purple-50 border border-purple-100 mb-5">
         <Info className="w-4 h-4 text-purple-500 shrink-0" />
         <p className="text-xs text-gray-600">
-          <span className="font-semibold text-gray-800">Knowledge Graph:</span> Maps
-          <span className="text-blue-600 font-medium"> patients</span> &rarr;
-          <span className="text-amber-600 font-medium"> interventions</span> &rarr;
-          <span className="text-emerald-600 font-medium"> outcomes</span> &rarr;
-          <span className="text-purple-600 font-medium"> learnings</span>.
-          Toggle &ldquo;Knowledge Loss&rdquo; to see what disappears when experienced CRCs leave.
+          {view === 'trials' ? (
+            <>
+              <span className="font-semibold text-gray-800">Trial Network:</span> Precomputed
+              layout from graph_layout_export.py. Zoomed out, trials are grouped by condition,
+              sponsor and country; zoom in to load trial tiles and click a trial for its strongest
+              dropout edges.
+            </>
+          ) : (
+            <>
+              <span className="font-semibold text-gray-800">Knowledge Graph:</span> Maps
+              <span className="text-blue-600 font-medium"> patients</span> &rarr;
+              <span className="text-amber-600 font-medium"> interventions</span> &rarr;
+              <span className="text-emerald-600 font-medium"> outcomes</span> &rarr;
+              <span className="text-purple-600 font-medium"> learnings</span>.
+              Toggle &ldquo;Knowledge Loss&rdquo; to see what disappears when experienced CRCs leave.
+            </>
+          )}
         </p>
       </div>
 
       {/* Controls row */}
-      <div className="grid grid-cols-12 gap-4 mb-4">
-        <div className="col-span-6" data-tour-target="temporal-slider">
-          <TemporalSlider
-            value={currentMonth}
-            onChange={(m) => {
-              setCurrentMonth(m);
-              setKnowledgeLossActive(false);
-              setIsPruning(false);
-              setSelectedNodeId(null);
-            }}
-            nodeCountByMonth={nodeCountByMonth}
-          />
-        </div>
-        <div className="col-span-3">
-          <KnowledgeLossToggle
-            active={knowledgeLossActive}
-            onToggle={handleToggleKnowledgeLoss}
-            prunedCount={knowledgeLossActive ? prunedCount : 0}
-            lostInsightLabels={knowledgeLossActive ? lostInsightLabels : []}
-            crcNodeCount={crcNodeCount}
-            disabled={isPruning}
-          />
-        </div>
-        <div className="col-span-3 flex items-end">
-          <GraphLegend />
+      {view === 'knowledge' && (
+        <div className="grid grid-cols-12 gap-4 mb-4">
+          <div className="col-span-6" data-tour-target="temporal-slider">
+            <TemporalSlider
+              value={currentMonth}
+              onChange={(m) => {
+                setCurrentMonth(m);
+                setKnowledgeLossActive(false);
+                setIsPruning(false);
+                setSelectedNodeId(null);
+              }}
+              nodeCountByMonth={nodeCountByMonth}
+            />
+          </div>
+          <div className="col-span-3">
+            <KnowledgeLossToggle
+              active={knowledgeLossActive}
+              onToggle={handleToggleKnowledgeLoss}
+              prunedCount={knowledgeLossActive ? prunedCount : 0}
+              lostInsightLabels={knowledgeLossActive ? lostInsightLabels : []}
+              crcNodeCount={crcNodeCount}
+              disabled={isPruning}
+            />
+          </div>
+          <div className="col-span-3 flex items-end">
+            <GraphLegend />
+          </div>
         </div>
-      </div>
+      )}
 
       {/* Graph + Detail Panel */}
       <div className="grid grid-cols-12 gap-4">
@@ -273,7 +309,9 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
             style={{ padding: 0, height: '56vh', minHeight: 400 }}
           >
             <GraphErrorBoundary>
-              {!hasEdges && displayNodes.length <= 18 && currentMonth <= 1 ? (
+              {view === 'trials' ? (
+                <TrialNetworkCanvas />
+              ) : !hasEdges && displayNodes.length <= 18 && currentMonth <= 1 ? (
                 <EmptyState month={currentMonth} />
               ) : (
                 <GraphCanvas
@@ -303,13 +341,15 @@ export default function KnowledgeGraph({ initialNodeId, onNavigateToDashboard, d
       </div>
 
       {/* Metrics */}
-      <div className="mt-4">
-        <GraphMetricsPanel
-          metrics={metrics}
-          baselineMetrics={baselineMetrics}
-          knowledgeLossActive={knowledgeLossActive}
-        />
-      </div>
+      {view === 'knowledge' && (
+        <div className="mt-4">
+          <GraphMetricsPanel
+            metrics={metrics}
+            baselineMetrics={baselineMetrics}
+            knowledgeLossActive={knowledgeLossActive}
+          />
+        </div>
+      )}
     </div>
   );
 }
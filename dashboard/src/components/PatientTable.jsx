@@ -1,58 +1,65 @@
-import { useState, useMemo } from 'react';
+import { useState, useEffect } from 'react';
 import { Search, ArrowUpDown, Eye, Zap, ChevronLeft, ChevronRight, Network } from 'lucide-react';
 import { hasKGNode } from '../utils/patientMapping';
+import { loadPatientPage } from '../utils/dataLoader';
 import RiskBadge from './RiskBadge';
 import { formatRiskScore, getAgentRecommendation, getAgentStatus, getStatusLabel, getStatusColor } from '../utils/formatters';
 
 const PAGE_SIZE = 12;
+// Only the columns the table and the agent recommendation read are requested.
+const FIELDS = [
+  'patient_id',
+  'trial_id',
+  'risk_level',
+  'dropout_risk',
+  'days_since_last_contact',
+  'missed_visits',
+  'has_transportation_issues',
+];
+const RISK_LEVELS = { high: 'High', medium: 'Medium', low: 'Low' };
 
-export default function PatientTable({ patients, onSelectPatient, onNavigateToKG }) {
-  const [search, setSearch] = useState('');
-  const [sortKey, setSortKey] = useState('dropout_risk');
+export default function PatientTable({ onSelectPatient, onNavigateToKG }) {
+  const [trialFilter, setTrialFilter] = useState('');
   const [sortDir, setSortDir] = useState('desc');
   const [riskFilter, setRiskFilter] = useState('all');
+  // cursors[i] fetches page i; page 0 has no cursor.
+  const [cursors, setCursors] = useState([null]);
   const [page, setPage] = useState(0);
+  const [result, setResult] = useState({ data: [], total: 0, next_cursor: null });
 
-  const filtered = useMemo(() => {
-    let data = [...patients];
+  useEffect(() => {
+    let cancelled = false;
+    loadPatientPage({
+      riskLevel: riskFilter === 'all' ? undefined : RISK_LEVELS[riskFilter],
+      trialId: trialFilter.trim() || undefined,
+      sort: sortDir,
+      limit: PAGE_SIZE,
+      cursor: cursors[page] || undefined,
+      fields: FIELDS,
+    })
+      .then((next) => { if (!cancelled) setResult(next); })
+      .catch((err) => console.error('Failed to load patients:', err));
+    return () => { cancelled = true; };
+  }, [riskFilter, trialFilter, sortDir, cursors, page]);
 
-    if (riskFilter !== 'all') {
-      data = data.filter((p) => p.risk_level?.toLowerCase() === riskFilter);
-    }
+  const paginated = result.data;
+  const totalPages = Math.ceil(result.total / PAGE_SIZE);
 
-    if (search) {
-      const q = search.toLowerCase();
-      data = data.filter(
-        (p) =>
-          p.patient_id?.toLowerCase().includes(q) ||
-          p.trial_id?.toLowerCase().includes(q)
-      );
-    }
-
-    data.sort((a, b) => {
-      let aVal = a[sortKey];
-      let bVal = b[sortKey];
-      if (typeof aVal === 'string') aVal = aVal.toLowerCase();
-      if (typeof bVal === 'string') bVal = bVal.toLowerCase();
-      if (aVal < bVal) return sortDir === 'asc' ? -1 : 1;
-      if (aVal > bVal) return sortDir === 'asc' ? 1 : -1;
-      return 0;
-    });
-
-    return data;
-  }, [patients, search, sortKey, sortDir, riskFilter]);
+  function resetPages() {
+    setCursors([null]);
+    setPage(0);
+  }
 
-  const totalPages = Math.ceil(filtered.length / PAGE_SIZE);
-  const paginated = filtered.slice(page * PAGE_SIZE, (page + 1) * PAGE_SIZE);
+  function nextPage() {
+    if (!result.next_cursor) return;
+    setCursors((c) => [...c.slice(0, page + 1), result.next_cursor]);
+    setPage(page + 1);
+  }
 
-  function toggleSort(key) {
-    if (sortKey === key) {
-      setSortDir((d) => (d === 'asc' ? 'desc' : 'asc'));
-    } else {
-      setSortKey(key);
-      setSortDir('desc');
-    }
-    setPage(0);
+  // The server sorts by dropout_risk only.
+  function toggleSort() {
+    setSortDir((d) => (d === 'asc' ? 'desc' : 'asc'));
+    resetPages();
   }
 
   const columns = [
@@ -74,9 +81,9 @@ export default function PatientTable({ patients, onSelectPatient, onNavigateToKG
           <Search size={14} className="absolute left-3 top-1/2 -translate-y-1/2 text-gray-400" />
           <input
             type="text"
-            placeholder="Search patients or trials..."
-            value={search}
-            onChange={(e) => { setSearch(e.target.value); setPage(0); }}
+            placeholder="Filter by trial ID..."
+            value={trialFilter}
+            onChange={(e) => { setTrialFilter(e.target.value); resetPages(); }}
             className="w-full pl-9 pr-3 py-2 bg-gray-50 border border-gray-200 rounded-lg text-sm text-gray-900 placeholder:text-gray-400 focus:outline-none focus:border-[var(--color-agent-blue)] transition-colors"
           />
         </div>
@@ -84,7 +91,7 @@ export default function PatientTable({ patients, onSelectPatient, onNavigateToKG
           {['all', 'high', 'medium', 'low'].map((f) => (
             <button
               key={f}
-              onClick={() => { setRiskFilter(f); setPage(0); }}
+              onClick={() => { setRiskFilter(f); resetPages(); }}
               className={`px-3 py-1.5 rounded-lg text-xs font-medium transition-colors cursor-pointer ${
                 riskFilter === f
                   ? 'bg-[var(--color-agent-blue)] text-white'
@@ -96,7 +103,7 @@ export default function PatientTable({ patients, onSelectPatient, onNavigateToKG
           ))}
         </div>
         <span className="ml-auto text-xs text-gray-400 font-[family-name:var(--font-mono)]">
-          {filtered.length} patients
+          {result.total} patients
         </span>
       </div>
 
@@ -109,19 +116,15 @@ export default function PatientTable({ patients, onSelectPatient, onNavigateToKG
                 <th
                   key={col.key}
                   className={`text-left text-xs font-medium text-gray-500 uppercase tracking-wider px-4 py-3 ${col.w} ${
-                    col.key !== 'actions' && col.key !== 'recommendation' && col.key !== 'status'
-                      ? 'cursor-pointer hover:text-gray-700 select-none'
-                      : ''
+                    col.key === 'dropout_risk' ? 'cursor-pointer hover:text-gray-700 select-none' : ''
                   }`}
                   onClick={() => {
-                    if (col.key !== 'actions' && col.key !== 'recommendation' && col.key !== 'status') {
-                      toggleSort(col.key);
-                    }
+                    if (col.key === 'dropout_risk') toggleSort();
                   }}
                 >
                   <span className="flex items-center gap-1">
                     {col.label}
-                    {sortKey === col.key && (
+                    {col.key === 'dropout_risk' && (
                       <ArrowUpDown size={11} className="text-[var(--color-agent-blue)]" />
                     )}
                   </span>
@@ -211,7 +214,7 @@ export default function PatientTable({ patients, onSelectPatient, onNavigateToKG
       {totalPages > 1 && (
         <div className="flex items-center justify-between px-4 py-3 border-t border-gray-200">
           <p className="text-xs text-gray-400">
-            Showing {page * PAGE_SIZE + 1}–{Math.min((page + 1) * PAGE_SIZE, filtered.length)} of {filtered.length}
+            Showing {page * PAGE_SIZE + 1}–{Math.min((page + 1) * PAGE_SIZE, result.total)} of {result.total}
           </p>
           <div className="flex items-center gap-1">
             <button
@@ -221,22 +224,12 @@ export default function PatientTable({ patients, onSelectPatient, onNavigateToKG
             >
               <ChevronLeft size={14} />
             </button>
-            {Array.from({ length: totalPages }, (_, i) => (
-              <button
-                key={i}
-                onClick={() => setPage(i)}
-                className={`w-7 h-7 rounded-md text-xs font-medium transition-colors cursor-pointer ${
-                  page === i
-                    ? 'bg-[var(--color-agent-blue)] text-white'
-                    : 'text-gray-500 hover:bg-gray-100'
-                }`}
-              >
-                {i + 1}
-              </button>
-            ))}
+            <span className="px-2 text-xs font-medium text-gray-500 font-[family-name:var(--font-mono)]">
+              {page + 1} / {totalPages}
+            </span>
             <button
-              onClick={() => setPage(Math.min(totalPages - 1, page + 1))}
-              disabled={page === totalPages - 1}
+              onClick={nextPage}
+              disabled={!result.next_cursor}
               className="p-1.5 rounded-md hover:bg-gray-100 disabled:opacity-30 text-gray-500 cursor-pointer disabled:cursor-default transition-colors"
             >
               <ChevronRight size={14} />
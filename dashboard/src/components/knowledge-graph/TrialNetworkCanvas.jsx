@@ -0,0 +1,214 @@
+import { useState, useEffect, useMemo, useCallback, useRef } from 'react';
+import {
+  ReactFlow,
+  Background,
+  Controls,
+  useReactFlow,
+  useOnViewportChange,
+  ReactFlowProvider,
+} from '@xyflow/react';
+import '@xyflow/react/dist/style.css';
+
+import WeightedEdge from './edges/WeightedEdge';
+import { loadGraphManifest, loadGraphLevel, loadGraphTile, loadTrialSubgraph } from '../../utils/dataLoader';
+
+// Positions come precomputed from graph_layout_export.py; nothing is laid out here.
+// Zoomed out, cluster bubbles from the LOD files stand in for trials; zoomed in,
+// only the trial tiles intersecting the viewport are fetched.
+const LOD_BY_ZOOM = [
+  { maxZoom: 0.04, level: 'condition' },
+  { maxZoom: 0.1, level: 'sponsor' },
+  { maxZoom: 0.25, level: 'country' },
+];
+const TOP_K = 20;
+
+const TYPE_COLORS = {
+  cluster: '#8b5cf6',
+  trial: '#3b82f6',
+  arm: '#f59e0b',
+  period: '#10b981',
+};
+
+const edgeTypes = {
+  weighted: WeightedEdge,
+};
+
+function levelForZoom(zoom) {
+  const match = LOD_BY_ZOOM.find((l) => zoom < l.maxZoom);
+  return match ? match.level : 'trial';
+}
+
+function toFlowNode(node, highlighted) {
+  const color = TYPE_COLORS[node.type] || '#506690';
+  const isCluster = node.type === 'cluster';
+  // Bubbles grow with the number of trials they stand for.
+  const size = isCluster ? Math.min(2400, 240 + Math.sqrt(node.data.trial_count || 1) * 160) : null;
+  return {
+    id: node.id,
+    position: node.position,
+    data: { label: node.data.label },
+    draggable: false,
+    connectable: false,
+    style: {
+      background: `${color}${highlighted ? '30' : '14'}`,
+      border: `1px solid ${color}${highlighted ? 'cc' : '60'}`,
+      borderRadius: isCluster ? '50%' : 8,
+      color: '#111827',
+      fontSize: isCluster ? Math.max(12, size / 12) : 10,
+      width: size || 160,
+      height: size || undefined,
+      display: isCluster ? 'flex' : undefined,
+      alignItems: 'center',
+      justifyContent: 'center',
+      textAlign: 'center',
+    },
+  };
+}
+
+function visibleTiles(manifest, viewport, width, height) {
+  const { x, y, zoom } = viewport;
+  const minX = -x / zoom;
+  const minY = -y / zoom;
+  const maxX = (width - x) / zoom;
+  const maxY = (height - y) / zoom;
+  const size = manifest.tile_size;
+  return manifest.tiles.filter(([tx, ty]) => (
+    (tx + 1) * size >= minX && tx * size <= maxX && (ty + 1) * size >= minY && ty * size <= maxY
+  ));
+}
+
+function TrialNetworkInner({ containerRef }) {
+  const { fitBounds, getViewport } = useReactFlow();
+  const [manifest, setManifest] = useState(null);
+  const [error, setError] = useState(null);
+  const [level, setLevel] = useState('condition');
+  const [levelNodes, setLevelNodes] = useState({});
+  const [tileKeys, setTileKeys] = useState([]);
+  const [tileNodes, setTileNodes] = useState({});
+  const [subgraph, setSubgraph] = useState(null);
+  const requested = useRef(new Set());
+
+  useEffect(() => {
+    loadGraphManifest()
+      .then(setManifest)
+      .catch((err) => setError(err.message));
+  }, []);
+
+  // Fetch each level and tile once; later visits reuse them (and the server answers 304).
+  const fetchOnce = useCallback((key, load, store) => {
+    if (requested.current.has(key)) return;
+    requested.current.add(key);
+    load()
+      .then((payload) => store((prev) => ({ ...prev, [key]: payload.nodes })))
+      .catch((err) => {
+        requested.current.delete(key);
+        console.error(`Failed to load graph ${key}:`, err);
+      });
+  }, []);
+
+  useEffect(() => {
+    if (level !== 'trial') fetchOnce(level, () => loadGraphLevel(level), setLevelNodes);
+  }, [level, fetchOnce]);
+
+  useEffect(() => {
+    tileKeys.forEach((key) => {
+      const [tx, ty] = key.split('_');
+      fetchOnce(key, () => loadGraphTile(tx, ty), setTileNodes);
+    });
+  }, [tileKeys, fetchOnce]);
+
+  const handleViewport = useCallback((viewport) => {
+    const next = levelForZoom(viewport.zoom);
+    setLevel(next);
+    const el = containerRef.current;
+    if (next !== 'trial' || !manifest || !el) return;
+    const keys = visibleTiles(manifest, viewport, el.clientWidth, el.clientHeight).map(([tx, ty]) => `${tx}_${ty}`);
+    setTileKeys((prev) => (prev.join() === keys.join() ? prev : keys));
+  }, [manifest, containerRef]);
+
+  useOnViewportChange({ onEnd: handleViewport });
+
+  // Open on the whole layout, then pick the level that zoom calls for.
+  useEffect(() => {
+    if (!manifest) return;
+    const { min_x: minX, min_y: minY, max_x: maxX, max_y: maxY } = manifest.bounds;
+    Promise.resolve(
+      fitBounds({ x: minX, y: minY, width: maxX - minX || 1, height: maxY - minY || 1 }, { padding: 0.1 })
+    ).then(() => handleViewport(getViewport()));
+  }, [manifest, fitBounds, getViewport, handleViewport]);
+
+  const handleNodeClick = useCallback((_event, node) => {
+    if (level !== 'trial' || node.id.startsWith('cluster::')) return;
+    loadTrialSubgraph(node.id, TOP_K)
+      .then(setSubgraph)
+      .catch((err) => console.error('Failed to load trial subgraph:', err));
+  }, [level]);
+
+  const rfNodes = useMemo(() => {
+    if (level !== 'trial') return (levelNodes[level] || []).map((n) => toFlowNode(n, false));
+    const byId = new Map();
+    tileKeys.forEach((key) => (tileNodes[key] || []).forEach((n) => byId.set(n.id, n)));
+    (subgraph?.nodes || []).forEach((n) => byId.set(n.id, n));
+    return [...byId.values()].map((n) => toFlowNode(n, subgraph?.trial_id === n.id));
+  }, [level, levelNodes, tileKeys, tileNodes, subgraph]);
+
+  const rfEdges = useMemo(() => {
+    if (level !== 'trial' || !subgraph) return [];
+    // graph_weight is a small share; scale to the subgraph's strongest edge for stroke width.
+    const maxWeight = Math.max(...subgraph.edges.map((e) => e.data.weight || 0), 1e-9);
+    return subgraph.edges.map((edge) => ({
+      id: edge.id,
+      source: edge.source,
+      target: edge.target,
+      type: edge.data.edge_type === 'dropout_event' ? 'weighted' : 'default',
+      data: {
+        ...edge.data,
+        weight: edge.data.edge_type === 'dropout_event' ? (edge.data.weight || 0) / maxWeight : 0.2,
+      },
+    }));
+  }, [level, subgraph]);
+
+  if (error) {
+    return (
+      <div className="flex items-center justify-center h-full">
+        <p className="text-xs text-gray-400 max-w-md text-center leading-relaxed">
+          Trial network unavailable ({error}). Run graph_layout_export.py and dashboard_api.py.
+        </p>
+      </div>
+    );
+  }
+
+  return (
+    <ReactFlow
+      nodes={rfNodes}
+      edges={rfEdges}
+      edgeTypes={edgeTypes}
+      onNodeClick={handleNodeClick}
+      onPaneClick={() => setSubgraph(null)}
+      colorMode="light"
+      minZoom={0.005}
+      maxZoom={2}
+      onlyRenderVisibleElements
+      proOptions={{ hideAttribution: true }}
+      nodesDraggable={false}
+      nodesConnectable={false}
+    >
+      <Background variant="dots" gap={20} size={1} color="#e5e7eb" style={{ opacity: 0.6 }} />
+      <Controls showInteractive={false} position="bottom-right" />
+      <div className="absolute top-3 left-3 z-10 px-2.5 py-1 rounded-md bg-white/90 border border-gray-200 text-[10px] text-gray-500">
+        {manifest ? `${manifest.trial_count} trials` : 'Loading layout...'} &middot; {level === 'trial' ? 'trials (click one for its top dropout edges)' : `${level} clusters (zoom in for trials)`}
+      </div>
+    </ReactFlow>
+  );
+}
+
+export default function TrialNetworkCanvas() {
+  const containerRef = useRef(null);
+  return (
+    <div ref={containerRef} style={{ width: '100%', height: '100%', position: 'relative' }}>
+      <ReactFlowProvider>
+        <TrialNetworkInner containerRef={containerRef} />
+      </ReactFlowProvider>
+    </div>
+  );
+}
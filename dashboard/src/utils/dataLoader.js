@@ -1,52 +1,55 @@
-import Papa from 'papaparse';
-
-async function loadCSV(url) {
-  const response = await fetch(url);
-  const text = await response.text();
-  return new Promise((resolve) => {
-    Papa.parse(text, {
-      header: true,
-      skipEmptyLines: true,
-      dynamicTyping: true,
-      complete: (results) => resolve(results.data),
-    });
-  });
-}
-
-export async function loadAllData() {
-  const [predictions, patients] = await Promise.all([
-    loadCSV('/data/predictions.csv'),
-    loadCSV('/data/synthetic_patients.csv'),
-  ]);
-
-  // Build patient map for quick lookup
-  const patientMap = {};
-  patients.forEach((p) => {
-    patientMap[p.patient_id] = p;
-  });
-
-  // Merge predictions with patient data
-  const merged = predictions.map((pred) => {
-    const patient = patientMap[pred.patient_id] || {};
-    return {
-      ...patient,
-      ...pred,
-      dropout_risk: parseFloat(pred.dropout_risk) || 0,
-      age: parseInt(patient.age) || null,
-      distance_from_site_miles: parseFloat(patient.distance_from_site_miles) || null,
-      scheduled_visits: parseInt(patient.scheduled_visits) || 0,
-      completed_visits: parseInt(patient.completed_visits) || 0,
-      missed_visits: parseInt(patient.missed_visits) || 0,
-      days_since_last_contact: parseInt(patient.days_since_last_contact) || 0,
-      comorbidity_count: parseInt(patient.comorbidity_count) || 0,
-      has_transportation_issues: patient.has_transportation_issues === true || patient.has_transportation_issues === 'True',
-      has_caregiver_support: patient.has_caregiver_support === true || patient.has_caregiver_support === 'True',
-      previous_trial_participation: patient.previous_trial_participation === true || patient.previous_trial_participation === 'True',
-    };
-  });
-
-  // Sort by dropout risk descending
-  merged.sort((a, b) => b.dropout_risk - a.dropout_risk);
-
-  return merged;
+const API_BASE = '/api';
+
+async function fetchApi(path) {
+  const response = await fetch(`${API_BASE}${path}`);
+  if (!response.ok) {
+    throw new Error(`API request ${path} failed: ${response.status}`);
+  }
+  return response.json();
+}
+
+// Server-side paginated view from dashboard_api.py (sorted by dropout_risk,
+// pre-joined with patient fields). Pass the returned next_cursor to fetch
+// the following page; the browser revalidates unchanged pages via ETag.
+export async function loadPatientPage({
+  riskLevel,
+  trialId,
+  sort = 'desc',
+  limit = 50,
+  cursor,
+  fields,
+} = {}) {
+  const params = new URLSearchParams({ sort, limit: String(limit) });
+  if (riskLevel) params.set('risk_level', [].concat(riskLevel).join(','));
+  if (trialId) params.set('trial_id', [].concat(trialId).join(','));
+  if (cursor) params.set('cursor', cursor);
+  if (fields) params.set('fields', [].concat(fields).join(','));
+
+  return fetchApi(`/patients?${params}`);
+}
+
+export async function loadPatient(patientId) {
+  return fetchApi(`/patients/${encodeURIComponent(patientId)}`);
+}
+
+export async function loadSummary() {
+  return fetchApi('/summary');
+}
+
+// Precomputed knowledge-graph layout from graph_layout_export.py. Nodes
+// already carry positions, so render them directly instead of computeLayout.
+export async function loadGraphManifest() {
+  return fetchApi('/graph/manifest');
+}
+
+export async function loadGraphLevel(level) {
+  return fetchApi(`/graph/lod/${encodeURIComponent(level)}`);
+}
+
+export async function loadGraphTile(tileX, tileY) {
+  return fetchApi(`/graph/tiles/${tileX}/${tileY}`);
+}
+
+export async function loadTrialSubgraph(trialId, topK = 20) {
+  return fetchApi(`/graph/trial/${encodeURIComponent(trialId)}?top_k=${topK}`);
 }
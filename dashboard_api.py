@@ -0,0 +1,341 @@
+"""
+Paginated, filterable data API for the CRC dashboard.
+
+Serves the pre-joined prediction + patient view from dashboard_store/ as JSON
+with server-side sort by dropout_risk, risk_level / trial_id filters, cursor
+pagination, gzip compression and ETag/304 revalidation. The store is reopened
+automatically when train_model.py or generate_predictions_csv.py rewrites it.
+Precomputed knowledge-graph layout (graph_layout_export.py) is served from the
+/api/graph endpoints so the dashboard never lays out the full graph itself.
+
+Endpoints:
+    GET /api/patients?risk_level=High,Medium&trial_id=NCT12345670&sort=desc&limit=50&cursor=...&fields=...
+    GET /api/patients/<patient_id>
+    GET /api/summary
+    GET /api/graph/manifest
+    GET /api/graph/lod/<condition|sponsor|country>
+    GET /api/graph/tiles/<tx>/<ty>
+    GET /api/graph/trial/<trial_id>?top_k=20
+
+Usage:
+    python dashboard_api.py --port 8050
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+from ctgov_graph_index import GraphIndex
+from dashboard_store import STORE_DIR, load_store
+from graph_layout_export import LAYOUT_DIR, load_layout, trial_subgraph
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MIN_GZIP_BYTES = 512
+ELEVATED_RISK = 0.5  # summary "elevated_risk" count: rows the dashboard shows as active interventions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve dashboard data from the columnar store.")
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=STORE_DIR,
+        help="Dashboard store directory.",
+    )
+    parser.add_argument(
+        "--layout-dir",
+        type=Path,
+        default=LAYOUT_DIR,
+        help="Precomputed graph layout directory.",
+    )
+    parser.add_argument(
+        "--index-dir",
+        type=Path,
+        default=Path("ctgov_graph_index"),
+        help="CSR graph index directory for trial subgraphs.",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Bind address.")
+    parser.add_argument("--port", type=int, default=8050, help="Bind port.")
+    return parser.parse_args()
+
+
+class StoreView:
+    """Memory-mapped store that reloads when its manifest changes on disk."""
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.manifest = {}
+        self.columns = {}
+
+    def current(self) -> tuple[dict, dict]:
+        manifest_path = self.store_dir / "manifest.json"
+        if not manifest_path.exists():
+            return load_store(self.store_dir)
+        mtime = manifest_path.stat().st_mtime_ns
+        with self._lock:
+            if mtime != self._mtime:
+                self.manifest, self.columns = load_store(self.store_dir)
+                self._mtime = mtime
+            return self.manifest, self.columns
+
+
+class GraphView:
+    """Precomputed layout files plus the memory-mapped CSR index, reloaded on change."""
+
+    def __init__(self, layout_dir: Path, index_dir: Path):
+        self.layout_dir = layout_dir
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.index = None
+        self.layout = None
+
+    def version(self) -> str:
+        manifest = self.layout_dir / "manifest.json"
+        if not manifest.exists():
+            raise FileNotFoundError(f"Graph layout not found: {self.layout_dir}. Run graph_layout_export.py first.")
+        # The index is saved manifest-last, so its manifest mtime marks a finished rebuild.
+        index_manifest = self.index_dir / "manifest.json"
+        index_mtime = index_manifest.stat().st_mtime_ns if index_manifest.exists() else 0
+        return f"{manifest.stat().st_mtime_ns}-{index_mtime}"
+
+    def read_json(self, relative: str) -> dict:
+        path = (self.layout_dir / relative).resolve()
+        if self.layout_dir.resolve() not in path.parents or not path.exists():
+            raise KeyError(relative)
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def subgraph(self, trial_id: str, top_k: int) -> dict:
+        version = self.version()
+        with self._lock:
+            if self._mtime != version:
+                self.index = GraphIndex.load(self.index_dir)
+                self.layout = load_layout(self.layout_dir)
+                self._mtime = version
+            index, layout = self.index, self.layout
+        return trial_subgraph(index, layout, trial_id, top_k)
+
+
+def _encode_cursor(version: str, position: int) -> str:
+    raw = json.dumps({"v": version, "p": int(position)}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, version: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        position = int(payload["p"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Malformed cursor.") from exc
+    if payload.get("v") != version:
+        raise LookupError("Cursor refers to an older data version; restart pagination.")
+    return position
+
+
+def _multi(params: dict, key: str) -> list[str]:
+    values = []
+    for raw in params.get(key, []):
+        values.extend(v for v in raw.split(",") if v)
+    return values
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _rows(columns: dict, positions: np.ndarray, fields: list[str]) -> list[dict]:
+    picked = {f: np.asarray(columns[f][positions]) for f in fields}
+    return [{f: _json_value(picked[f][i]) for f in fields} for i in range(len(positions))]
+
+
+def query_patients(manifest: dict, columns: dict, params: dict) -> dict:
+    """Filter, sort and paginate the stored view. Raises ValueError/LookupError on bad input."""
+    n = manifest["row_count"]
+    mask = np.ones(n, dtype=bool)
+    for key in ("risk_level", "trial_id"):
+        wanted = _multi(params, key)
+        if wanted and key in columns:
+            mask &= np.isin(np.asarray(columns[key]), wanted)
+
+    # Rows are stored by dropout_risk descending, so ascending is the reverse order.
+    order = np.flatnonzero(mask)
+    sort = params.get("sort", ["desc"])[0]
+    if sort not in ("desc", "asc"):
+        raise ValueError("sort must be 'desc' or 'asc'.")
+    if sort == "asc":
+        order = order[::-1]
+
+    limit = int(params.get("limit", [DEFAULT_PAGE_SIZE])[0])
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    start = 0
+    cursor = params.get("cursor", [None])[0]
+    if cursor:
+        last = _decode_cursor(cursor, manifest["version"])
+        if sort == "desc":
+            start = int(np.searchsorted(order, last, side="right"))
+        else:
+            start = int(np.searchsorted(-order, -last, side="right"))
+
+    page = order[start : start + limit]
+    fields = _multi(params, "fields") or list(manifest["columns"])
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}")
+
+    has_more = start + limit < len(order)
+    return {
+        "data": _rows(columns, page, fields),
+        "total": int(len(order)),
+        "next_cursor": _encode_cursor(manifest["version"], page[-1]) if has_more and len(page) else None,
+        "version": manifest["version"],
+    }
+
+
+def summarize(manifest: dict, columns: dict) -> dict:
+    summary = {"total": manifest["row_count"], "version": manifest["version"]}
+    for key in ("risk_level", "trial_id"):
+        if key in columns:
+            values, counts = np.unique(np.asarray(columns[key]), return_counts=True)
+            summary[f"by_{key}"] = {str(v): int(c) for v, c in zip(values, counts)}
+    if "dropout_risk" in columns and manifest["row_count"]:
+        summary["mean_dropout_risk"] = float(np.mean(columns["dropout_risk"]))
+        summary["elevated_risk"] = int(np.count_nonzero(np.asarray(columns["dropout_risk"]) > ELEVATED_RISK))
+    return summary
+
+
+def make_handler(store: StoreView, graph: GraphView):
+    class DashboardHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict | None, etag: str | None = None):
+            body = b""
+            if payload is not None:
+                body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            gzip_ok = "gzip" in self.headers.get("Accept-Encoding", "")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            if etag:
+                self.send_header("ETag", etag)
+            if body and gzip_ok and len(body) >= MIN_GZIP_BYTES:
+                body = gzip.compress(body, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _graph(self, url, params):
+            try:
+                version = graph.version()
+            except FileNotFoundError as exc:
+                self._send(503, {"error": str(exc)})
+                return
+            etag = '"{}"'.format(hashlib.sha1(f"{version}|{url.path}|{url.query}".encode("utf-8")).hexdigest()[:20])
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, None, etag)
+                return
+
+            parts = [unquote(p) for p in url.path[len("/api/graph/") :].split("/") if p]
+            try:
+                if parts == ["manifest"]:
+                    payload = graph.read_json("manifest.json")
+                elif len(parts) == 2 and parts[0] == "lod":
+                    payload = graph.read_json(f"lod_{parts[1]}.json")
+                elif len(parts) == 3 and parts[0] == "tiles":
+                    payload = graph.read_json(f"tiles/{int(parts[1])}_{int(parts[2])}.json")
+                elif len(parts) == 2 and parts[0] == "trial":
+                    top_k = int(params.get("top_k", [20])[0])
+                    payload = graph.subgraph(parts[1], max(0, min(top_k, MAX_PAGE_SIZE)))
+                else:
+                    self._send(404, {"error": f"Unknown endpoint: {url.path}"})
+                    return
+            except KeyError as exc:
+                self._send(404, {"error": f"Not found: {exc}"})
+                return
+            except ValueError as exc:
+                self._send(400, {"error": str(exc)})
+                return
+            except FileNotFoundError as exc:
+                self._send(503, {"error": str(exc)})
+                return
+            self._send(200, payload, etag)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path.startswith("/api/graph/"):
+                self._graph(url, params)
+                return
+            try:
+                manifest, columns = store.current()
+            except FileNotFoundError as exc:
+                self._send(503, {"error": str(exc)})
+                return
+
+            etag = '"{}"'.format(
+                hashlib.sha1(f"{manifest['version']}|{url.path}|{url.query}".encode("utf-8")).hexdigest()[:20]
+            )
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, None, etag)
+                return
+
+            try:
+                if url.path == "/api/patients":
+                    self._send(200, query_patients(manifest, columns, params), etag)
+                elif url.path.startswith("/api/patients/"):
+                    patient_id = unquote(url.path[len("/api/patients/") :])
+                    hits = np.flatnonzero(np.asarray(columns["patient_id"]) == patient_id)
+                    if len(hits) == 0:
+                        self._send(404, {"error": f"Unknown patient: {patient_id}"})
+                    else:
+                        self._send(200, _rows(columns, hits[:1], list(manifest["columns"]))[0], etag)
+                elif url.path == "/api/summary":
+                    self._send(200, summarize(manifest, columns), etag)
+                else:
+                    self._send(404, {"error": f"Unknown endpoint: {url.path}"})
+            except LookupError as exc:
+                self._send(410, {"error": str(exc)})
+            except ValueError as exc:
+                self._send(400, {"error": str(exc)})
+
+    return DashboardHandler
+
+
+def main():
+    args = parse_args()
+    store = StoreView(args.store)
+    graph = GraphView(args.layout_dir, args.index_dir)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store, graph))
+    print(f"Serving {args.store} on http://{args.host}:{args.port}/api/patients")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
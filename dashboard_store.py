@@ -0,0 +1,115 @@
+"""
+Columnar store of the joined prediction + patient view served to the CRC dashboard.
+
+Rows are pre-joined and pre-sorted by `dropout_risk` (descending, ties by
+`patient_id`) and written one .npy file per column alongside a manifest, so
+readers memory-map only the columns they need. The manifest `version` is a
+content hash used for cache validation and cursor pagination.
+
+Written by train_model.py and generate_predictions_csv.py; read by dashboard_api.py.
+
+Outputs:
+    - dashboard_store/  (manifest.json + one .npy per column)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+STORE_DIR = Path("dashboard_store")
+STORE_VERSION = 1
+BOOLEAN_PATIENT_COLS = [
+    "has_transportation_issues",
+    "has_caregiver_support",
+    "previous_trial_participation",
+]
+
+
+def join_predictions(predictions: pd.DataFrame, patients: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Join predictions onto the patient roster the way dashboard/src/utils/dataLoader.js does."""
+    view = predictions.copy()
+    view["patient_id"] = view["patient_id"].astype(str)
+    if patients is not None and not patients.empty:
+        roster = patients.copy()
+        roster["patient_id"] = roster["patient_id"].astype(str)
+        roster = roster.drop_duplicates(subset=["patient_id"])
+        overlap = [c for c in roster.columns if c in view.columns and c != "patient_id"]
+        view = view.merge(roster.drop(columns=overlap), on="patient_id", how="left")
+        for col in BOOLEAN_PATIENT_COLS:
+            if col in view.columns:
+                view[col] = view[col].astype(str).str.lower().eq("true") | view[col].eq(1)
+    view["dropout_risk"] = pd.to_numeric(view["dropout_risk"], errors="coerce").fillna(0.0)
+    return view.sort_values(["dropout_risk", "patient_id"], ascending=[False, True]).reset_index(drop=True)
+
+
+def _column_array(values: pd.Series) -> tuple[np.ndarray, str]:
+    if pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=bool), "bool"
+    if pd.api.types.is_integer_dtype(values) and not values.hasnans:
+        return values.to_numpy(dtype=np.int64), "int"
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan), "float"
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime("%Y-%m-%d").fillna("").to_numpy(dtype=str), "str"
+    # object() first so categorical columns accept the "" fill.
+    return values.astype(object).fillna("").astype(str).to_numpy(dtype=str), "str"
+
+
+def write_store(view: pd.DataFrame, store_dir: Path = STORE_DIR) -> str:
+    """Write a joined view as a columnar store, swapping it in atomically. Returns the version."""
+    tmp_dir = store_dir.with_name(store_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    digest = hashlib.sha1()
+    columns = {}
+    for col in view.columns:
+        arr, kind = _column_array(view[col])
+        np.save(tmp_dir / f"{col}.npy", arr)
+        digest.update(col.encode("utf-8"))
+        digest.update(arr.tobytes())
+        columns[col] = kind
+    version = digest.hexdigest()[:16]
+
+    with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {"store_version": STORE_VERSION, "version": version, "row_count": int(len(view)), "columns": columns},
+            f,
+            indent=2,
+        )
+
+    old_dir = store_dir.with_name(store_dir.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if store_dir.exists():
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    return version
+
+
+def load_store(store_dir: Path = STORE_DIR) -> tuple[dict, dict]:
+    """Memory-map a store. Returns (manifest, column name -> array)."""
+    manifest_path = store_dir / "manifest.json"
+    if not manifest_path.exists():
+        raise FileNotFoundError(
+            f"Dashboard store not found: {store_dir}. Run train_model.py or generate_predictions_csv.py first."
+        )
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("store_version") != STORE_VERSION:
+        raise ValueError(f"Unsupported dashboard store version in {store_dir}. Regenerate it.")
+    columns = {col: np.load(store_dir / f"{col}.npy", mmap_mode="r") for col in manifest["columns"]}
+    return manifest, columns
@@ -0,0 +1,253 @@
+"""
+Distill the dropout weight forest into a compact boosted surrogate.
+
+The 400-tree forest from train_dropout_model.py is the teacher. Its
+predictions label the training split's real rows plus augmented rows, which
+are real rows with a share of their columns resampled from other rows and
+small noise on the numeric features. This fills the space between observed
+contexts, where the surrogate would otherwise have to guess. The surrogate is
+a GradientBoostingRegressor of shallow trees over ordinal-coded categoricals.
+It is flattened into numpy tables (SurrogateScorer) and saved as a bundle
+with the teacher's layout (model, score_sketch, metadata), reusing the
+teacher's score sketch so percentiles and tiers mean the same thing under
+either model.
+
+Fidelity is measured on the teacher's test split: R2 / MAE against the
+teacher, R2 against the actual target for both models, and risk-tier
+agreement. Latency (single-row median and whole-split batch) and bundle size
+are reported for both models.
+
+Inputs / outputs:
+    - ctgov_graph_edges.csv, ctgov_graph_nodes.csv (or --db)
+    - model_artifacts/dropout_weight_model.joblib      (teacher)
+    - model_artifacts/dropout_weight_surrogate.joblib  (score with predict_dropout_risk.py --surrogate)
+    - model_artifacts/distill_report.json
+
+Usage:
+    python distill_model.py
+    python distill_model.py --augment-factor 5 --trees 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+from analytics_db import add_db_argument
+from lazy_imports import lazy_import
+from score_sketch import sketch_percentiles
+from surrogate_model import SURROGATE_NAME, SurrogateScorer, build_surrogate
+from tracing import add_profile_arguments, profiled, span
+from train_dropout_model import (
+    DEFAULT_TARGET,
+    RANDOM_SEED,
+    load_data,
+    prepare_training_frame,
+    split_source_frame,
+    temporal_or_random_split,
+)
+
+joblib = lazy_import("joblib")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distill the dropout weight forest into a low-latency surrogate.")
+    parser.add_argument("--edges", type=Path, default=Path("ctgov_graph_edges.csv"), help="Path to graph edges CSV.")
+    parser.add_argument("--nodes", type=Path, default=Path("ctgov_graph_nodes.csv"), help="Path to graph nodes CSV.")
+    parser.add_argument(
+        "--teacher",
+        type=Path,
+        default=Path("model_artifacts/dropout_weight_model.joblib"),
+        help="Forest bundle from train_dropout_model.py.",
+    )
+    parser.add_argument("--output", type=Path, default=None, help=f"Surrogate bundle (default: {SURROGATE_NAME} beside --teacher).")
+    parser.add_argument("--report", type=Path, default=None, help="Report JSON (default: distill_report.json beside --teacher).")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Test set fraction (match the teacher's training run).")
+    parser.add_argument("--augment-factor", type=float, default=3.0, help="Augmented rows per real training row.")
+    parser.add_argument("--mix-rate", type=float, default=0.3, help="Share of columns resampled in an augmented row.")
+    parser.add_argument("--trees", type=int, default=300, help="Boosted trees in the surrogate.")
+    parser.add_argument("--max-depth", type=int, default=5, help="Depth of each boosted tree.")
+    parser.add_argument("--learning-rate", type=float, default=0.1, help="Boosting learning rate.")
+    parser.add_argument("--latency-calls", type=int, default=50, help="Single-row predictions timed per model.")
+    add_db_argument(parser, "Read dropout edges and trial nodes from this analytics database.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def augment_inputs(x: pd.DataFrame, numeric_cols: list[str], factor: float, mix_rate: float, rng) -> pd.DataFrame:
+    """Real rows with about `mix_rate` of their columns swapped for other rows' values, plus numeric jitter."""
+    n = int(round(len(x) * factor))
+    if n == 0 or x.empty:
+        return x.iloc[:0].copy()
+    out = x.iloc[rng.integers(0, len(x), n)].reset_index(drop=True)
+    for col in x.columns:
+        swap = rng.random(n) < mix_rate
+        donors = x[col].iloc[rng.integers(0, len(x), int(swap.sum()))].to_numpy()
+        out.loc[swap, col] = donors
+    for col in numeric_cols:
+        values = out[col].to_numpy(dtype=float)
+        scale = np.nanstd(x[col].to_numpy(dtype=float)) * 0.05
+        if np.isfinite(scale) and scale > 0:
+            out[col] = values + rng.normal(0.0, scale, n)
+    return out
+
+
+def _regression_stats(reference, pred) -> dict:
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    return {"r2": float(r2_score(reference, pred)), "mae": float(mean_absolute_error(reference, pred))}
+
+
+def _tiers(scores, sketch: dict) -> np.ndarray:
+    pct = sketch_percentiles(scores, sketch)
+    return np.where(pct >= 0.80, "high", np.where(pct >= 0.50, "medium", "low"))
+
+
+def measure_latency(model, x: pd.DataFrame, calls: int) -> dict:
+    """Median single-row predict time over `calls` rows, and one predict over all of `x`."""
+    single = []
+    for i in range(min(calls, len(x))):
+        row = x.iloc[i : i + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        single.append((time.perf_counter() - start) * 1000.0)
+    start = time.perf_counter()
+    model.predict(x)
+    batch_ms = (time.perf_counter() - start) * 1000.0
+    return {
+        "single_row_ms": statistics.median(single) if single else None,
+        "batch_ms": batch_ms,
+        "batch_rows": int(len(x)),
+    }
+
+
+def main():
+    args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="distill"):
+        _distill(args)
+
+
+def _distill(args):
+    if not args.teacher.exists():
+        raise FileNotFoundError(f"Teacher bundle not found: {args.teacher}. Train it first (python train_dropout_model.py).")
+    if not 0 <= args.mix_rate <= 1:
+        raise ValueError("--mix-rate must be between 0 and 1.")
+    output = args.output or args.teacher.parent / SURROGATE_NAME
+    report_path = args.report or args.teacher.parent / "distill_report.json"
+
+    with span("load.model", path=str(args.teacher)) as s:
+        teacher_bundle = joblib.load(args.teacher)
+        s.add(bytes=args.teacher.stat().st_size)
+    teacher = teacher_bundle["model"]
+    metadata = teacher_bundle.get("metadata", {})
+    target = metadata.get("target", DEFAULT_TARGET)
+
+    with span("load") as s:
+        edges, nodes = load_data(args.edges, args.nodes, args.db, target)
+        s.add(rows=len(edges) + len(nodes))
+    x, y, meta = prepare_training_frame(edges, nodes, target)
+    numeric_cols = metadata.get("features", {}).get("numeric", meta["numeric_features"])
+    categorical_cols = metadata.get("features", {}).get("categorical", meta["categorical_features"])
+    x = x[numeric_cols + categorical_cols]
+    x_train, x_test, _, y_test, split_meta = temporal_or_random_split(
+        x, y, original_df=split_source_frame(edges, nodes).loc[x.index], test_size=args.test_size
+    )
+
+    rng = np.random.default_rng(RANDOM_SEED)
+    augmented = augment_inputs(x_train, numeric_cols, args.augment_factor, args.mix_rate, rng)
+    distill_x = pd.concat([x_train.reset_index(drop=True), augmented], ignore_index=True)
+    for col in categorical_cols:
+        distill_x[col] = distill_x[col].astype(object)
+    with span("distill.label", rows=len(distill_x)) as s:
+        distill_y = teacher.predict(distill_x)
+        s.add(rows=len(distill_x))
+
+    with span("distill.fit", model="GradientBoostingRegressor") as s:
+        fitted = build_surrogate(
+            numeric_cols, categorical_cols, args.trees, args.max_depth, args.learning_rate, RANDOM_SEED
+        )
+        fitted.fit(distill_x, distill_y)
+        surrogate = SurrogateScorer(fitted, numeric_cols, categorical_cols)
+        s.add(rows=len(distill_x))
+
+    with span("distill.evaluate") as s:
+        teacher_test = teacher.predict(x_test)
+        surrogate_test = surrogate.predict(x_test)
+        compile_error = float(np.abs(surrogate_test - fitted.predict(x_test)).max()) if len(x_test) else 0.0
+        s.add(rows=len(x_test))
+    sketch = teacher_bundle.get("score_sketch")
+    fidelity = _regression_stats(teacher_test, surrogate_test)
+    if sketch:
+        fidelity["tier_agreement"] = float((_tiers(teacher_test, sketch) == _tiers(surrogate_test, sketch)).mean())
+
+    bundle = {
+        "model": surrogate,
+        "score_sketch": sketch,
+        "metadata": {
+            "created_at": datetime.now().isoformat(),
+            "seed": RANDOM_SEED,
+            "target": target,
+            "features": {"numeric": numeric_cols, "categorical": categorical_cols},
+            "distilled_from": str(args.teacher),
+            "distill_rows": {"real": int(len(x_train)), "augmented": int(len(augmented))},
+            "fidelity": fidelity,
+        },
+    }
+    with span("write.model", path=str(output)) as s:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(bundle, output)
+        s.add(bytes=output.stat().st_size)
+
+    with span("distill.latency") as s:
+        latency = {
+            "teacher": measure_latency(teacher, x_test, args.latency_calls),
+            "surrogate": measure_latency(surrogate, x_test, args.latency_calls),
+        }
+        s.add(rows=2 * (len(x_test) + min(args.latency_calls, len(x_test))))
+    report = {
+        "teacher": str(args.teacher),
+        "surrogate": str(output),
+        "split_strategy": split_meta["split_strategy"],
+        "test_rows": split_meta["test_rows"],
+        "fidelity_vs_teacher": fidelity,
+        "compiled_max_abs_diff": compile_error,
+        "accuracy_vs_target": {
+            "teacher": _regression_stats(y_test, teacher_test),
+            "surrogate": _regression_stats(y_test, surrogate_test),
+        },
+        "latency": latency,
+        "size_bytes": {"teacher": args.teacher.stat().st_size, "surrogate": output.stat().st_size},
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    t, su = latency["teacher"], latency["surrogate"]
+    print("Distillation complete")
+    print(f"Surrogate: {output}")
+    print(f"Report:    {report_path}")
+    print(f"Distilled on {len(distill_x)} rows ({len(x_train)} real, {len(augmented)} augmented)")
+    print(
+        f"Fidelity vs teacher -> R2: {fidelity['r2']:.4f}, MAE: {fidelity['mae']:.6f}"
+        + (f", tier agreement: {fidelity['tier_agreement']:.1%}" if "tier_agreement" in fidelity else "")
+    )
+    print(
+        f"R2 vs target -> teacher: {report['accuracy_vs_target']['teacher']['r2']:.4f}, "
+        f"surrogate: {report['accuracy_vs_target']['surrogate']['r2']:.4f}"
+    )
+    print(
+        f"Single row: {t['single_row_ms']:.2f} ms -> {su['single_row_ms']:.2f} ms; "
+        f"{len(x_test)} rows: {t['batch_ms']:.0f} ms -> {su['batch_ms']:.0f} ms"
+    )
+    print(
+        f"Size: {report['size_bytes']['teacher'] / 1e6:.1f} MB -> {report['size_bytes']['surrogate'] / 1e6:.2f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
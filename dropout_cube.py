@@ -0,0 +1,346 @@
+"""
+Precomputed dropout aggregate cube over graph dropout events.
+
+Materializes roll-ups of dropout_event edges across reason, search_condition,
+sponsor_class, period_title (every combination) and country into an indexed
+SQLite store, so dashboard filters read precomputed cells instead of
+re-aggregating the edge table. Updates are incremental by trial: incoming
+trials replace their previous facts and only the cells they touch are
+recomputed.
+
+Each cell holds event/trial counts, discontinued_n and started_n sums
+(started_n counted once per trial), the pooled dropout rate, graph_weight
+sum/mean, and percentiles of the per-event rate_vs_trial_start.
+
+Inputs:
+    - ctgov_graph_edges.csv
+    - ctgov_graph_nodes.csv
+
+Outputs:
+    - ctgov_dropout_cube.sqlite
+
+Usage:
+    python dropout_cube.py --rebuild
+    python dropout_cube.py --by reason search_condition --where sponsor_class=INDUSTRY
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import sqlite3
+from pathlib import Path
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+CUBE_PATH = Path("ctgov_dropout_cube.sqlite")
+ALL = "(all)"
+DIMENSIONS = ["reason", "search_condition", "sponsor_class", "period_title", "country"]
+CORE_DIMENSIONS = ["reason", "search_condition", "sponsor_class", "period_title"]
+COUNTRY_GROUPINGS = [
+    ("country",),
+    ("country", "reason"),
+    ("country", "search_condition"),
+    ("country", "sponsor_class"),
+]
+PERCENTILES = {"rate_p25": 0.25, "rate_p50": 0.50, "rate_p75": 0.75, "rate_p90": 0.90}
+FACT_COLUMNS = [
+    "trial_id",
+    "reason",
+    "search_condition",
+    "sponsor_class",
+    "period_title",
+    "discontinued_n",
+    "started_n",
+    "rate_vs_trial_start",
+    "graph_weight",
+]
+CELL_COLUMNS = [
+    "grouping",
+    *DIMENSIONS,
+    "n_events",
+    "n_trials",
+    "discontinued_sum",
+    "started_sum",
+    "pooled_rate",
+    "weight_sum",
+    "mean_weight",
+    *PERCENTILES,
+]
+
+
+def grouping_sets() -> list[tuple[str, ...]]:
+    """Full cube over the core dimensions plus country roll-ups."""
+    sets = []
+    for size in range(len(CORE_DIMENSIONS) + 1):
+        sets.extend(itertools.combinations(CORE_DIMENSIONS, size))
+    return sets + COUNTRY_GROUPINGS
+
+
+def grouping_name(dims) -> str:
+    return "+".join(d for d in DIMENSIONS if d in dims) or "total"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build or query the dropout aggregate cube.")
+    parser.add_argument(
+        "--edges",
+        type=Path,
+        default=Path("ctgov_graph_edges.csv"),
+        help="Path to graph edges CSV.",
+    )
+    parser.add_argument(
+        "--nodes",
+        type=Path,
+        default=Path("ctgov_graph_nodes.csv"),
+        help="Path to graph nodes CSV.",
+    )
+    parser.add_argument(
+        "--cube",
+        type=Path,
+        default=CUBE_PATH,
+        help="Path to the cube SQLite store.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the cube and rebuild it from the CSVs.",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Merge trials from the CSVs into the existing cube.",
+    )
+    parser.add_argument(
+        "--by",
+        nargs="*",
+        default=None,
+        choices=DIMENSIONS,
+        help="Dimensions to break down by when querying.",
+    )
+    parser.add_argument(
+        "--where",
+        nargs="*",
+        default=[],
+        help="Filters as dimension=value.",
+    )
+    return parser.parse_args()
+
+
+def extract_facts(nodes: pd.DataFrame, edges: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return (dropout event facts, trial-country pairs) from graph tables."""
+    if "edge_type" in edges.columns:
+        events = edges[edges["edge_type"] == "dropout_event"]
+    else:
+        events = pd.DataFrame(columns=FACT_COLUMNS)
+    trial_cols = [c for c in ["trial_id", "search_condition", "sponsor_class"] if c in nodes.columns]
+    trials = nodes[nodes["node_type"] == "trial"][trial_cols].drop_duplicates(subset=["trial_id"])
+    facts = events.drop(columns=[c for c in trial_cols if c != "trial_id"], errors="ignore").merge(
+        trials, on="trial_id", how="left"
+    )
+    for col in FACT_COLUMNS:
+        if col not in facts.columns:
+            facts[col] = np.nan
+    facts = facts[FACT_COLUMNS].copy()
+    for col in ["reason", "search_condition", "sponsor_class", "period_title"]:
+        facts[col] = facts[col].fillna("Unknown").astype(str)
+    for col in ["discontinued_n", "started_n", "rate_vs_trial_start", "graph_weight"]:
+        facts[col] = pd.to_numeric(facts[col], errors="coerce")
+
+    countries = nodes[nodes["node_type"] == "country"][["trial_id", "label"]].rename(columns={"label": "country"})
+    countries = countries.dropna().drop_duplicates()
+    return facts, countries
+
+
+def compute_cells(facts: pd.DataFrame, countries: pd.DataFrame, dims: tuple[str, ...]) -> pd.DataFrame:
+    """Aggregate facts into cube cells for one grouping set."""
+    frame = facts
+    if "country" in dims and "country" not in facts.columns:
+        frame = facts.merge(countries, on="trial_id", how="inner")
+    dims = list(dims)
+    if frame.empty:
+        return pd.DataFrame(columns=CELL_COLUMNS)
+
+    if dims:
+        grouped = frame.groupby(dims, sort=True)
+        keys = grouped.size().index.to_frame(index=False)
+    else:
+        grouped = frame.assign(_all=ALL).groupby("_all")
+        keys = pd.DataFrame(index=[0])
+    trial_level = frame.drop_duplicates(subset=dims + ["trial_id"])
+    started = (
+        trial_level.groupby(dims, sort=True)["started_n"].sum(min_count=1)
+        if dims
+        else pd.Series([trial_level["started_n"].sum(min_count=1)])
+    )
+
+    cells = keys.copy()
+    cells["n_events"] = grouped.size().to_numpy()
+    cells["n_trials"] = grouped["trial_id"].nunique().to_numpy()
+    cells["discontinued_sum"] = grouped["discontinued_n"].sum(min_count=1).to_numpy()
+    cells["started_sum"] = started.to_numpy()
+    cells["pooled_rate"] = cells["discontinued_sum"] / cells["started_sum"].where(cells["started_sum"] > 0)
+    cells["weight_sum"] = grouped["graph_weight"].sum(min_count=1).to_numpy()
+    cells["mean_weight"] = grouped["graph_weight"].mean().to_numpy()
+    for name, q in PERCENTILES.items():
+        cells[name] = grouped["rate_vs_trial_start"].quantile(q).to_numpy()
+
+    cells["grouping"] = grouping_name(dims)
+    for dim in DIMENSIONS:
+        if dim not in dims:
+            cells[dim] = ALL
+    return cells[CELL_COLUMNS]
+
+
+def open_cube(cube_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(cube_path)
+    dim_cols = ", ".join(f"{d} TEXT NOT NULL" for d in DIMENSIONS)
+    metric_cols = ", ".join(
+        f"{c} {'INTEGER' if c.startswith('n_') else 'REAL'}" for c in CELL_COLUMNS[len(DIMENSIONS) + 1 :]
+    )
+    conn.executescript(
+        f"""
+        CREATE TABLE IF NOT EXISTS facts (
+            trial_id TEXT NOT NULL, reason TEXT, search_condition TEXT, sponsor_class TEXT,
+            period_title TEXT, discontinued_n REAL, started_n REAL,
+            rate_vs_trial_start REAL, graph_weight REAL
+        );
+        CREATE INDEX IF NOT EXISTS facts_trial ON facts (trial_id);
+        CREATE TABLE IF NOT EXISTS trial_countries (trial_id TEXT NOT NULL, country TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS trial_countries_trial ON trial_countries (trial_id);
+        CREATE TABLE IF NOT EXISTS cells (
+            grouping TEXT NOT NULL, {dim_cols}, {metric_cols},
+            PRIMARY KEY (grouping, {", ".join(DIMENSIONS)})
+        );
+        """
+    )
+    return conn
+
+
+def _write_cells(conn: sqlite3.Connection, cells: pd.DataFrame):
+    placeholders = ", ".join("?" for _ in CELL_COLUMNS)
+    rows = cells[CELL_COLUMNS].astype(object).where(cells[CELL_COLUMNS].notna(), None)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO cells ({', '.join(CELL_COLUMNS)}) VALUES ({placeholders})",
+        rows.itertuples(index=False, name=None),
+    )
+
+
+def update_cube(cube_path: Path, nodes: pd.DataFrame, edges: pd.DataFrame, rebuild: bool = False) -> dict:
+    """Merge trials from graph tables into the cube, recomputing only touched cells."""
+    new_facts, new_countries = extract_facts(nodes, edges)
+    trial_ids = pd.Index(nodes.loc[nodes["node_type"] == "trial", "trial_id"].astype(str).unique())
+
+    conn = open_cube(cube_path)
+    with conn:
+        if rebuild:
+            conn.executescript("DELETE FROM facts; DELETE FROM trial_countries; DELETE FROM cells;")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (trial_id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM incoming")
+        conn.executemany("INSERT OR IGNORE INTO incoming VALUES (?)", ((t,) for t in trial_ids))
+        old_facts = pd.read_sql_query(
+            "SELECT * FROM facts WHERE trial_id IN (SELECT trial_id FROM incoming)", conn
+        )
+        old_countries = pd.read_sql_query(
+            "SELECT * FROM trial_countries WHERE trial_id IN (SELECT trial_id FROM incoming)", conn
+        )
+        conn.execute("DELETE FROM facts WHERE trial_id IN (SELECT trial_id FROM incoming)")
+        conn.execute("DELETE FROM trial_countries WHERE trial_id IN (SELECT trial_id FROM incoming)")
+        new_facts.to_sql("facts", conn, if_exists="append", index=False)
+        new_countries.to_sql("trial_countries", conn, if_exists="append", index=False)
+
+        all_facts = pd.read_sql_query("SELECT * FROM facts", conn)
+        all_countries = pd.read_sql_query("SELECT * FROM trial_countries", conn)
+        touched_facts = pd.concat([old_facts, new_facts], ignore_index=True)
+        touched_countries = pd.concat([old_countries, new_countries], ignore_index=True)
+
+        cells_written = 0
+        for dims in grouping_sets():
+            dims = list(dims)
+            touched = touched_facts
+            if "country" in dims:
+                touched = touched.merge(touched_countries, on="trial_id", how="inner")
+            if touched.empty:
+                continue
+            name = grouping_name(dims)
+            affected = touched[dims].drop_duplicates() if dims else None
+
+            if affected is None:
+                subset = all_facts
+            else:
+                source = all_facts
+                if "country" in dims:
+                    source = all_facts.merge(all_countries, on="trial_id", how="inner")
+                subset = source.merge(affected, on=dims, how="inner")
+            cells = compute_cells(subset, all_countries, tuple(dims))
+
+            # Cells whose facts all went away are removed.
+            if affected is not None:
+                stale = affected.merge(cells[dims], on=dims, how="left", indicator=True)
+                stale = stale[stale["_merge"] == "left_only"]
+                where = " AND ".join(f"{d} = ?" for d in dims)
+                conn.executemany(
+                    f"DELETE FROM cells WHERE grouping = ? AND {where}",
+                    ([name, *row] for row in stale[dims].itertuples(index=False, name=None)),
+                )
+            elif all_facts.empty:
+                conn.execute("DELETE FROM cells WHERE grouping = ?", (name,))
+            _write_cells(conn, cells)
+            cells_written += len(cells)
+
+    total_cells = conn.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+    conn.close()
+    return {"trials": int(len(trial_ids)), "cells_written": int(cells_written), "total_cells": int(total_cells)}
+
+
+def query_cube(
+    cube_path: Path, by: list[str] | None = None, where: dict | None = None
+) -> pd.DataFrame:
+    """Read precomputed cells broken down `by` dimensions, filtered by `where`."""
+    by = list(by or [])
+    where = dict(where or {})
+    unknown = sorted(set(by).union(where).difference(DIMENSIONS))
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {unknown}")
+    dims = [d for d in DIMENSIONS if d in by or d in where]
+    name = grouping_name(dims)
+    if tuple(dims) not in {tuple(d for d in DIMENSIONS if d in g) for g in grouping_sets()}:
+        raise ValueError(f"Grouping '{name}' is not materialized in the cube.")
+
+    if not cube_path.exists():
+        raise FileNotFoundError(f"Cube not found: {cube_path}. Build it with --rebuild.")
+    clauses = ["grouping = ?"] + [f"{d} = ?" for d in where]
+    params = [name] + [str(v) for v in where.values()]
+    conn = sqlite3.connect(cube_path)
+    cells = pd.read_sql_query(
+        f"SELECT * FROM cells WHERE {' AND '.join(clauses)} ORDER BY n_events DESC", conn, params=params
+    )
+    conn.close()
+    return cells.drop(columns=["grouping"] + [d for d in DIMENSIONS if d not in dims])
+
+
+def main():
+    args = parse_args()
+    if args.rebuild or args.update or not args.cube.exists():
+        if not args.edges.exists():
+            raise FileNotFoundError(f"Edges file not found: {args.edges}")
+        if not args.nodes.exists():
+            raise FileNotFoundError(f"Nodes file not found: {args.nodes}")
+        stats = update_cube(
+            args.cube, pd.read_csv(args.nodes), pd.read_csv(args.edges), rebuild=args.rebuild
+        )
+        print(f"Cube updated: {args.cube}")
+        print(f"Trials merged: {stats['trials']}, cells written: {stats['cells_written']}, total cells: {stats['total_cells']}")
+
+    if args.by is not None or args.where:
+        where = dict(item.split("=", 1) for item in args.where)
+        cells = query_cube(args.cube, by=args.by, where=where)
+        print(cells.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Per-row feature attributions for the dropout weight forest, batched over rows.
+
+Each tree's prediction decomposes along its decision path: moving from a
+node to the child a row follows changes the node value, and that change is
+credited to the feature the node split on (path-dependent attribution, the
+Saabas decomposition that TreeSHAP refines). Since a leaf fixes the whole
+path, the per-feature sums are precomputed once per leaf for the whole
+forest, with one-hot columns mapped back to their source feature the way
+train_model.transformed_to_base_feature does. A batch's attributions are then
+the forest's leaf ids (`apply`) gathered into that table and averaged over
+trees:
+
+    prediction = bias + sum(attributions)      (exactly, per row)
+
+Used by predict_dropout_risk.py --explain.
+"""
+
+from __future__ import annotations
+
+from lazy_imports import lazy_import
+from tracing import span
+from train_model import transformed_to_base_feature
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+DEFAULT_BATCH_ROWS = 1_000
+
+
+class ForestAttributions:
+    """Path attributions of a fitted `Pipeline([("preprocess", ...), ("model", forest)])` by base feature."""
+
+    def __init__(self, pipeline, categorical_cols: list[str]):
+        self.preprocess = pipeline.named_steps["preprocess"]
+        self.forest = pipeline.named_steps["model"]
+        names = [str(n) for n in self.preprocess.get_feature_names_out()]
+        base = [transformed_to_base_feature(n, categorical_cols) for n in names]
+        self.features = list(dict.fromkeys(base))
+        column_to_base = np.array([self.features.index(b) for b in base])
+
+        trees = self.forest.estimators_
+        leaf_rows, leaf_index, node_offsets, leaves_seen, nodes_seen = [], [], [], 0, 0
+        for estimator in trees:
+            leaf_path, leaf_row = _leaf_path_sums(estimator.tree_, column_to_base, len(self.features))
+            leaf_index.append(leaf_row + leaves_seen)
+            leaf_rows.append(leaf_path)
+            node_offsets.append(nodes_seen)
+            leaves_seen += len(leaf_path)
+            nodes_seen += len(leaf_row)
+        # Leaf x base-feature sums of the value changes on the path to that leaf, averaged over trees.
+        self.leaf_paths = np.concatenate(leaf_rows) / len(trees)
+        # (tree offset + node id) -> row of leaf_paths, for all trees at once.
+        self.leaf_index = np.concatenate(leaf_index)
+        self.node_offsets = np.array(node_offsets)
+        self.bias = float(np.mean([t.tree_.value[0, 0, 0] for t in trees]))
+
+    def explain(self, x: pd.DataFrame, batch_rows: int = DEFAULT_BATCH_ROWS) -> pd.DataFrame:
+        """Rows x base features; each row sums to the prediction minus `bias`."""
+        out = np.zeros((len(x), len(self.features)))
+        with span("explain", trees=len(self.node_offsets)) as s:
+            for lo in range(0, len(x), batch_rows):
+                leaves = self.forest.apply(self.preprocess.transform(x.iloc[lo : lo + batch_rows]))
+                rows = self.leaf_index[leaves + self.node_offsets]
+                out[lo : lo + len(leaves)] = self.leaf_paths[rows].sum(axis=1)
+            s.add(rows=len(x))
+        return pd.DataFrame(out, index=x.index, columns=self.features)
+
+
+def _leaf_path_sums(tree, column_to_base: np.ndarray, n_features: int) -> tuple[np.ndarray, np.ndarray]:
+    """(leaves x base features) path sums and the node -> leaf-row map (-1 for internal nodes)."""
+    value = tree.value[:, 0, 0]
+    left, right, feature = tree.children_left, tree.children_right, tree.feature
+    sums = np.zeros((tree.node_count, n_features))
+    # Walk the tree one depth level at a time so each step is one vectorized update.
+    frontier = np.array([0])
+    while len(frontier):
+        frontier = frontier[left[frontier] >= 0]
+        for children in (left[frontier], right[frontier]):
+            sums[children] = sums[frontier]
+            sums[children, column_to_base[feature[frontier]]] += value[children] - value[frontier]
+        frontier = np.concatenate([left[frontier], right[frontier]])
+    is_leaf = left < 0
+    leaf_row = np.full(tree.node_count, -1, dtype=np.int64)
+    leaf_row[is_leaf] = np.arange(is_leaf.sum())
+    return sums[is_leaf], leaf_row
+
+
+def top_contributors(attributions: pd.DataFrame, k: int = 3) -> pd.Series:
+    """The k features raising each row's score the most, as "feature +0.012; ..." strings."""
+    values = attributions.to_numpy()
+    names = np.asarray(attributions.columns)
+    order = np.argsort(-values, axis=1, kind="stable")[:, :k]
+    picked = np.take_along_axis(values, order, axis=1)
+    labels = [
+        "; ".join(f"{names[j]} {v:+.4f}" for j, v in zip(row_order, row_values))
+        for row_order, row_values in zip(order, picked)
+    ]
+    return pd.Series(labels, index=attributions.index)
@@ -3,6 +3,8 @@ Generate dashboard-ready predictions.csv from a trained dropout model.
 
 Example:
     python generate_predictions_csv.py --model model_artifacts/dropout_weight_model.joblib --data ctgov_graph_edges.csv
+    python generate_predictions_csv.py --db cadence_analytics.sqlite   (edges from, predictions into the analytics DB)
+    python generate_predictions_csv.py --shards   (route rows to per-condition shard models)
 """
 
 from __future__ import annotations
@@ -12,9 +14,18 @@ import pickle
 from datetime import datetime
 from pathlib import Path
 
-import joblib
-import numpy as np
-import pandas as pd
+from analytics_db import add_db_argument, load_table, read_table
+from condition_shards import route_with_shards
+from dashboard_store import join_predictions, write_store
+from lazy_imports import lazy_import
+from prediction_cache import CACHE_PATH, DEFAULT_MAX_ROWS, PredictionCache, cached_predict, model_fingerprint
+from schemas import EDGES, read_artifact
+from tracing import add_profile_arguments, profiled, span, to_csv
+from train_dropout_model import with_trial_features
+
+joblib = lazy_import("joblib")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 
 TRIAL_ID_CANDIDATES = ("trial_id", "nct_id", "nctid", "NCTId")
@@ -34,12 +45,42 @@ def parse_args():
         default=Path("ctgov_graph_edges.csv"),
         help="Path to scraped trial CSV.",
     )
+    parser.add_argument(
+        "--nodes",
+        type=Path,
+        default=Path("ctgov_graph_nodes.csv"),
+        help="Graph nodes CSV whose trial features (search_condition, sizes) are joined onto the edges.",
+    )
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="Route rows to the per-condition shard models beside --model (train_dropout_model.py --shards).",
+    )
     parser.add_argument(
         "--output",
         type=Path,
         default=Path("predictions.csv"),
         help="Output CSV path.",
     )
+    parser.add_argument(
+        "--store-out",
+        type=Path,
+        default=Path("model_artifacts/graph_dashboard_store"),
+        help="Directory for the dashboard columnar store (kept apart from the patient model's dashboard_store/).",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=CACHE_PATH,
+        help="SQLite prediction cache keyed by model and feature-row hash.",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Score every row without the cache.")
+    parser.add_argument(
+        "--cache-max-rows",
+        type=int,
+        default=DEFAULT_MAX_ROWS,
+        help="Least recently used cache entries beyond this are evicted.",
+    )
     parser.add_argument(
         "--trial-id-col",
         type=str,
@@ -52,6 +93,8 @@ def parse_args():
         default="dropout_event",
         help="If edge_type exists, keep only this value. Use empty string to disable.",
     )
+    add_db_argument(parser, "Read edges from this analytics database instead of --data and load predictions into it.")
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 
@@ -141,9 +184,30 @@ def risk_level_from_score(risk: np.ndarray) -> np.ndarray:
 
 def main():
     args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="export-predictions"):
+        _export(args)
 
-    model, metadata = load_model(args.model)
-    df = pd.read_csv(args.data)
+
+def _export(args):
+    with span("load.model", path=str(args.model)) as s:
+        model, metadata = load_model(args.model)
+        s.add(bytes=args.model.stat().st_size)
+    if args.db is not None:
+        df = read_table("edges", args.db, edge_type=args.edge_type_filter or None)
+    else:
+        if not args.data.exists():
+            raise FileNotFoundError(f"Input data not found: {args.data}")
+        features = metadata.get("features", {}) if isinstance(metadata, dict) else {}
+        usecols = None
+        if features.get("numeric") or features.get("categorical"):
+            # Only the model features, the trial id and the edge-type filter are read.
+            usecols = [
+                *features.get("numeric", []),
+                *features.get("categorical", []),
+                *([args.trial_id_col] if args.trial_id_col else TRIAL_ID_CANDIDATES),
+                "edge_type",
+            ]
+        df = read_artifact(args.data, EDGES, usecols=usecols)
 
     if args.edge_type_filter and "edge_type" in df.columns:
         df = df[df["edge_type"] == args.edge_type_filter].copy()
@@ -153,8 +217,18 @@ def main():
             )
 
     trial_col = detect_trial_id_column(df, args.trial_id_col)
+    if trial_col == "trial_id":
+        df = with_trial_features(df, args.nodes, args.db)
     x = prepare_features(df, metadata)
-    risk = predict_dropout_risk(model, x)
+    cache = None if args.no_cache else PredictionCache(args.cache, args.cache_max_rows)
+    model_key = model_fingerprint(args.model, "dropout_risk", list(x.columns))
+    if args.shards:
+        model, model_key = route_with_shards(model, args.model, model_key, list(x.columns))
+    try:
+        risk, score_stats = cached_predict(cache, model_key, x, lambda rows: predict_dropout_risk(model, rows))
+    finally:
+        if cache is not None:
+            cache.close()
     now_ts = datetime.now().isoformat(timespec="seconds")
 
     predictions = pd.DataFrame(
@@ -170,12 +244,21 @@ def main():
     predictions = predictions[
         ["trial_id", "patient_id", "dropout_risk", "risk_level", "last_updated"]
     ]
-    predictions.to_csv(args.output, index=False)
+    to_csv(predictions, args.output)
+    if args.db is not None:
+        load_table(predictions, "graph_predictions", args.db)
+    with span("write.store", path=str(args.store_out)) as s:
+        store_version = write_store(join_predictions(predictions), args.store_out)
+        s.add(rows=len(predictions))
 
     print("Prediction export complete")
     print(f"Model: {args.model}")
     print(f"Input rows scored: {len(predictions)}")
+    print(f"Unique feature rows: {score_stats['unique']} (model calls: {score_stats['predicted']})")
+    if not args.no_cache:
+        print(f"Cache hits: {score_stats['hits']}/{score_stats['rows']} ({args.cache})")
     print(f"Output: {args.output}")
+    print(f"Dashboard store: {args.store_out} (version {store_version})")
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
-import numpy as np
-import pandas as pd
+import argparse
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 
 def generate_synthetic_patients(output_path="synthetic_patients.csv", seed=42):
@@ -209,5 +213,17 @@ def generate_synthetic_patients(output_path="synthetic_patients.csv", seed=42):
     print(df["status"].value_counts())
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic patient roster for the CRC dashboard.")
+    parser.add_argument("--output", type=str, default="synthetic_patients.csv", help="Output CSV path.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    generate_synthetic_patients(args.output, args.seed)
+
+
 if __name__ == "__main__":
-    generate_synthetic_patients()
+    main()
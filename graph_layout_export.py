@@ -0,0 +1,311 @@
+"""
+Precompute knowledge-graph layout and level-of-detail views for the dashboard.
+
+Trials are laid out once, server-side: one rectangular region per
+search_condition, with trials inside a region ordered by sponsor_class and
+primary country. Level-of-detail views aggregate trials into cluster bubbles
+(condition; condition x sponsor_class; condition x sponsor_class x country),
+and the trial level is cut into fixed-size spatial tiles so the dashboard only
+fetches what is on screen. Trial neighborhoods are served on demand from the
+CSR graph index, pruned to the top-k dropout edges by graph_weight.
+
+Nodes/edges use the React Flow shape the dashboard renders
+({id, type, position, data} / {id, source, target, data}).
+
+Inputs:
+    - ctgov_graph_nodes.csv
+    - ctgov_graph_edges.csv
+    - ctgov_graph_index/   (built here if missing)
+
+Outputs:
+    - graph_layout/manifest.json
+    - graph_layout/trials.csv          (trial positions and cluster keys)
+    - graph_layout/lod_<level>.json    (cluster bubbles per level)
+    - graph_layout/tiles/<tx>_<ty>.json
+
+Usage:
+    python graph_layout_export.py
+    python graph_layout_export.py --trial NCT03242252 --top-k 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import shutil
+from pathlib import Path
+
+from ctgov_graph_index import GraphIndex
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+LAYOUT_DIR = Path("graph_layout")
+TRIAL_SPACING = 220.0
+REGION_GAP = 4.0  # in trial slots
+TILE_SIZE = 2048.0
+LOD_LEVELS = {
+    "condition": ["search_condition"],
+    "sponsor": ["search_condition", "sponsor_class"],
+    "country": ["search_condition", "sponsor_class", "country"],
+}
+SUBGRAPH_ROW_GAP = 140.0
+SUBGRAPH_COL_GAP = 180.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export precomputed graph layout and LOD views.")
+    parser.add_argument(
+        "--nodes",
+        type=Path,
+        default=Path("ctgov_graph_nodes.csv"),
+        help="Path to graph nodes CSV.",
+    )
+    parser.add_argument(
+        "--edges",
+        type=Path,
+        default=Path("ctgov_graph_edges.csv"),
+        help="Path to graph edges CSV.",
+    )
+    parser.add_argument(
+        "--index-dir",
+        type=Path,
+        default=Path("ctgov_graph_index"),
+        help="CSR graph index directory (built if missing).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=LAYOUT_DIR,
+        help="Directory to write layout artifacts.",
+    )
+    parser.add_argument("--trial", type=str, default=None, help="Print the subgraph around one trial.")
+    parser.add_argument("--top-k", type=int, default=20, help="Dropout edges kept in --trial subgraphs.")
+    return parser.parse_args()
+
+
+def trial_frame(nodes: pd.DataFrame, edges: pd.DataFrame) -> pd.DataFrame:
+    """One row per trial with cluster keys and dropout totals."""
+    trials = nodes[nodes["node_type"] == "trial"].drop_duplicates(subset=["trial_id"])
+    trials = trials[["trial_id", "label", "search_condition", "sponsor_class"]].copy()
+    for col in ["search_condition", "sponsor_class"]:
+        trials[col] = trials[col].fillna("Unknown").astype(str)
+
+    # Countries are exported in descending site count, so the first is primary.
+    countries = nodes[nodes["node_type"] == "country"].drop_duplicates(subset=["trial_id"])
+    trials = trials.merge(
+        countries[["trial_id", "label"]].rename(columns={"label": "country"}), on="trial_id", how="left"
+    )
+    trials["country"] = trials["country"].fillna("Unknown").astype(str)
+
+    events = edges[edges["edge_type"] == "dropout_event"]
+    totals = events.groupby("trial_id").agg(
+        event_count=("graph_weight", "size"),
+        weight_sum=("graph_weight", "sum"),
+    )
+    trials = trials.merge(totals, on="trial_id", how="left")
+    trials["event_count"] = trials["event_count"].fillna(0).astype(int)
+    trials["weight_sum"] = trials["weight_sum"].fillna(0.0)
+    return trials
+
+
+def compute_trial_layout(trials: pd.DataFrame) -> pd.DataFrame:
+    """Assign x/y to every trial: a square region per condition, packed on a grid."""
+    trials = trials.sort_values(["search_condition", "sponsor_class", "country", "trial_id"]).reset_index(drop=True)
+    sizes = trials.groupby("search_condition").size().sort_values(ascending=False)
+    sides = np.ceil(np.sqrt(sizes.to_numpy())).astype(int)
+    cell = int(sides.max()) + REGION_GAP if len(sides) else 1
+    regions_per_row = max(1, int(math.ceil(math.sqrt(len(sizes)))))
+
+    region = pd.DataFrame(
+        {
+            "search_condition": sizes.index,
+            "side": sides,
+            "origin_col": (np.arange(len(sizes)) % regions_per_row) * cell,
+            "origin_row": (np.arange(len(sizes)) // regions_per_row) * cell,
+        }
+    )
+    trials = trials.merge(region, on="search_condition", how="left")
+    slot = trials.groupby("search_condition").cumcount().to_numpy()
+    trials["x"] = (trials["origin_col"] + slot % trials["side"]) * TRIAL_SPACING
+    trials["y"] = (trials["origin_row"] + slot // trials["side"]) * TRIAL_SPACING
+    trials["tile_x"] = np.floor(trials["x"] / TILE_SIZE).astype(int)
+    trials["tile_y"] = np.floor(trials["y"] / TILE_SIZE).astype(int)
+    return trials.drop(columns=["side", "origin_col", "origin_row"])
+
+
+def _trial_node(row) -> dict:
+    return {
+        "id": row.trial_id,
+        "type": "trial",
+        "position": {"x": float(row.x), "y": float(row.y)},
+        "data": {
+            "label": row.label if isinstance(row.label, str) else row.trial_id,
+            "search_condition": row.search_condition,
+            "sponsor_class": row.sponsor_class,
+            "country": row.country,
+            "event_count": int(row.event_count),
+            "weight_sum": float(row.weight_sum),
+        },
+    }
+
+
+def build_lod(layout: pd.DataFrame, keys: list[str]) -> list[dict]:
+    """Cluster bubbles at the trials' centroid, sized by trial count."""
+    grouped = layout.groupby(keys, sort=True).agg(
+        x=("x", "mean"),
+        y=("y", "mean"),
+        trial_count=("trial_id", "size"),
+        event_count=("event_count", "sum"),
+        weight_sum=("weight_sum", "sum"),
+    )
+    nodes = []
+    for key, row in grouped.iterrows():
+        key = key if isinstance(key, tuple) else (key,)
+        nodes.append(
+            {
+                "id": "cluster::" + "::".join(key),
+                "type": "cluster",
+                "position": {"x": float(row["x"]), "y": float(row["y"])},
+                "data": {
+                    "label": " / ".join(key),
+                    **dict(zip(keys, key)),
+                    "trial_count": int(row["trial_count"]),
+                    "event_count": int(row["event_count"]),
+                    "weight_sum": float(row["weight_sum"]),
+                },
+            }
+        )
+    return nodes
+
+
+def trial_subgraph(index: GraphIndex, layout: pd.DataFrame | None, trial_id: str, top_k: int = 20) -> dict:
+    """Trial, its arms and periods, and its top-k dropout edges by graph_weight."""
+    events = index.trial_dropout_events(trial_id)
+    events = events.assign(graph_weight=events["graph_weight"].fillna(0.0))
+    events = events.nlargest(max(top_k, 0), "graph_weight")
+
+    origin_x, origin_y = 0.0, 0.0
+    if layout is not None:
+        hit = layout[layout["trial_id"] == trial_id]
+        if not hit.empty:
+            origin_x, origin_y = float(hit["x"].iloc[0]), float(hit["y"].iloc[0])
+
+    arms = index.trial_arms(trial_id)
+    periods = index.trial_periods(trial_id)
+    nodes = [
+        {
+            "id": trial_id,
+            "type": "trial",
+            "position": {"x": origin_x, "y": origin_y},
+            "data": {"label": index.label(index.node_index(trial_id))},
+        }
+    ]
+    for row_no, (frame, node_type) in enumerate([(arms, "arm"), (periods, "period")], start=1):
+        offset = (len(frame) - 1) / 2.0
+        for col_no, node in enumerate(frame.itertuples(index=False)):
+            nodes.append(
+                {
+                    "id": node.node_id,
+                    "type": node_type,
+                    "position": {
+                        "x": origin_x + (col_no - offset) * SUBGRAPH_COL_GAP,
+                        "y": origin_y + row_no * SUBGRAPH_ROW_GAP,
+                    },
+                    "data": {"label": node.label},
+                }
+            )
+
+    edges = [
+        {"id": f"{trial_id}::has::{n['id']}", "source": trial_id, "target": n["id"], "data": {"edge_type": f"trial_has_{n['type']}"}}
+        for n in nodes[1:]
+    ]
+    for rank, ev in enumerate(events.itertuples(index=False), start=1):
+        edges.append(
+            {
+                "id": f"{trial_id}::dropout::top{rank}",
+                "source": ev.source_id,
+                "target": ev.target_id,
+                "data": {
+                    "edge_type": "dropout_event",
+                    "reason": ev.reason,
+                    "period_title": ev.period_title,
+                    "discontinued_n": None if pd.isna(ev.discontinued_n) else float(ev.discontinued_n),
+                    "weight": float(ev.graph_weight),
+                },
+            }
+        )
+    return {"trial_id": trial_id, "top_k": top_k, "nodes": nodes, "edges": edges}
+
+
+def export_layout(nodes: pd.DataFrame, edges: pd.DataFrame, output_dir: Path) -> dict:
+    layout = compute_trial_layout(trial_frame(nodes, edges))
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    (output_dir / "tiles").mkdir(parents=True)
+    layout.to_csv(output_dir / "trials.csv", index=False)
+
+    for level, keys in LOD_LEVELS.items():
+        with open(output_dir / f"lod_{level}.json", "w", encoding="utf-8") as f:
+            json.dump({"level": level, "nodes": build_lod(layout, keys)}, f, separators=(",", ":"))
+
+    tiles = []
+    for (tx, ty), group in layout.groupby(["tile_x", "tile_y"], sort=True):
+        with open(output_dir / "tiles" / f"{tx}_{ty}.json", "w", encoding="utf-8") as f:
+            json.dump({"tile": [int(tx), int(ty)], "nodes": [_trial_node(r) for r in group.itertuples()]}, f, separators=(",", ":"))
+        tiles.append([int(tx), int(ty)])
+
+    manifest = {
+        "trial_count": int(len(layout)),
+        "tile_size": TILE_SIZE,
+        "trial_spacing": TRIAL_SPACING,
+        "bounds": {
+            "min_x": float(layout["x"].min()) if len(layout) else 0.0,
+            "min_y": float(layout["y"].min()) if len(layout) else 0.0,
+            "max_x": float(layout["x"].max()) if len(layout) else 0.0,
+            "max_y": float(layout["y"].max()) if len(layout) else 0.0,
+        },
+        "levels": list(LOD_LEVELS) + ["trial"],
+        "tiles": tiles,
+    }
+    with open(output_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_layout(layout_dir: Path = LAYOUT_DIR) -> pd.DataFrame | None:
+    path = layout_dir / "trials.csv"
+    return pd.read_csv(path) if path.exists() else None
+
+
+def main():
+    args = parse_args()
+    if not args.nodes.exists():
+        raise FileNotFoundError(f"Nodes file not found: {args.nodes}")
+    if not args.edges.exists():
+        raise FileNotFoundError(f"Edges file not found: {args.edges}")
+
+    # /api/graph/trial/... serves neighborhoods from the index, so build it alongside the layout.
+    built_index = not (args.index_dir / "manifest.json").exists()
+    if built_index:
+        GraphIndex.from_csv(args.nodes, args.edges).save(args.index_dir)
+
+    if args.trial:
+        index = GraphIndex.load(args.index_dir)
+        print(json.dumps(trial_subgraph(index, load_layout(args.output_dir), args.trial, args.top_k), indent=2))
+        return
+
+    manifest = export_layout(pd.read_csv(args.nodes), pd.read_csv(args.edges), args.output_dir)
+    print("Layout export complete")
+    print(f"Trials laid out: {manifest['trial_count']}")
+    print(f"Tiles: {len(manifest['tiles'])} ({manifest['tile_size']:.0f}px)")
+    print(f"Output: {args.output_dir}")
+    print(f"Graph index: {args.index_dir}{' (built)' if built_index else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Deferred imports for heavy third-party modules.
+
+`pd = lazy_import("pandas")` binds a module object whose real import runs on
+first attribute access, so `--help`, template generation and other cheap CLI
+paths never pay for pandas / numpy / joblib / requests. Names imported with
+`from x import y` load immediately, so keep those inside the functions that
+use them (sklearn estimators in the training scripts).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """Return `name` as a module that is loaded on first use."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
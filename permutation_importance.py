@@ -0,0 +1,120 @@
+"""
+Grouped permutation importance over a cached transformed matrix.
+
+The evaluation rows are run through the pipeline's ColumnTransformer once.
+Each base feature owns a block of transformed columns (a numeric column, or
+every one-hot column of a categorical, mapped the way
+train_model.transformed_to_base_feature does), and a permutation shuffles
+the rows of that whole block directly in the cached matrix before calling
+the fitted model. Importance is the drop in R2 from the unpermuted baseline,
+so a one-hot feature is scored once as a whole instead of per level, which
+is what biases impurity importances toward high-cardinality `reason` and
+`arm_id`.
+
+(feature, repeat) tasks run across a process pool. On fork-capable platforms
+workers inherit the model and matrix instead of unpickling them; each task
+seeds its own generator, so results do not depend on --jobs.
+
+Used by train_dropout_model.py (model_artifacts/permutation_importance.csv).
+"""
+
+from __future__ import annotations
+
+from lazy_imports import lazy_import
+from process_pool import WORKER, pool_size, run_pool
+from tracing import span
+from train_model import transformed_to_base_feature
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def _single_threaded_model():
+    if hasattr(WORKER["model"], "n_jobs"):
+        # One process per core already; keep each worker's model single-threaded.
+        WORKER["model"].set_params(n_jobs=1)
+
+
+def _r2_mae(y: np.ndarray, pred: np.ndarray) -> tuple[float, float]:
+    residual = y - pred
+    total = ((y - y.mean()) ** 2).sum()
+    r2 = 1.0 - (residual**2).sum() / total if total > 0 else 0.0
+    return float(r2), float(np.abs(residual).mean())
+
+
+def _permuted_score(task: tuple) -> tuple:
+    feature, columns, seed = task
+    x, y, model = WORKER["x"], WORKER["y"], WORKER["model"]
+    order = np.random.default_rng(seed).permutation(x.shape[0])
+    permuted = x.copy()
+    permuted[:, columns] = x[order[:, None], columns]
+    return (feature, *_r2_mae(y, model.predict(permuted)))
+
+
+def feature_blocks(preprocess, categorical_cols: list[str]) -> dict[str, np.ndarray]:
+    """Base feature -> indices of its transformed columns."""
+    names = [str(n) for n in preprocess.get_feature_names_out()]
+    blocks = {}
+    for i, name in enumerate(names):
+        blocks.setdefault(transformed_to_base_feature(name, categorical_cols), []).append(i)
+    return {feature: np.array(cols) for feature, cols in blocks.items()}
+
+
+def grouped_permutation_importance(
+    pipeline,
+    x: pd.DataFrame,
+    y,
+    categorical_cols: list[str],
+    n_repeats: int = 10,
+    jobs: int | None = None,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """Per base feature: mean R2 drop over repeats with a 95% interval, and the MAE increase."""
+    from scipy import stats
+
+    preprocess = pipeline.named_steps["preprocess"]
+    model = pipeline.named_steps["model"]
+    with span("importance.transform") as s:
+        transformed = preprocess.transform(x)
+        if hasattr(transformed, "toarray"):
+            transformed = transformed.toarray()
+        transformed = np.ascontiguousarray(transformed, dtype=np.float32)
+        s.add(rows=len(x))
+    y = np.asarray(y, dtype=float)
+    blocks = feature_blocks(preprocess, categorical_cols)
+    base_r2, base_mae = _r2_mae(y, model.predict(transformed))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks) * n_repeats)
+    tasks = [
+        (feature, cols, seeds[i * n_repeats + r]) for i, (feature, cols) in enumerate(blocks.items()) for r in range(n_repeats)
+    ]
+    jobs = pool_size(jobs, len(tasks))
+    with span("importance.permute", tasks=len(tasks), jobs=jobs) as s:
+        results = run_pool(
+            _permuted_score,
+            tasks,
+            jobs,
+            {"model": model, "x": transformed, "y": y},
+            initializer=_single_threaded_model,
+            chunksize=max(1, len(tasks) // (jobs * 4)),
+        )
+        s.add(rows=len(tasks) * len(x))
+
+    scores = pd.DataFrame(results, columns=["feature", "r2", "mae"])
+    scores["r2_drop"] = base_r2 - scores["r2"]
+    scores["mae_increase"] = scores["mae"] - base_mae
+    grouped = scores.groupby("feature", sort=False)
+    out = pd.DataFrame(
+        {
+            "columns": [len(blocks[f]) for f in grouped.groups],
+            "importance_mean": grouped["r2_drop"].mean(),
+            "importance_std": grouped["r2_drop"].std(ddof=1).fillna(0.0),
+            "mae_increase_mean": grouped["mae_increase"].mean(),
+        }
+    )
+    half = stats.t.ppf(0.975, max(n_repeats - 1, 1)) * out["importance_std"] / np.sqrt(n_repeats)
+    out["ci_low"] = out["importance_mean"] - half
+    out["ci_high"] = out["importance_mean"] + half
+    out["baseline_r2"] = base_r2
+    out = out.rename_axis("feature").reset_index()
+    return out.sort_values("importance_mean", ascending=False)
@@ -0,0 +1,363 @@
+"""
+Incremental runner for the end-to-end pipeline.
+
+Each stage declares the script it runs, its arguments, and the files it reads
+and writes. Dependencies follow from those files: a stage depends on whichever
+stage produces one of its inputs. A stage is skipped when its fingerprint
+(the source of its script and of the repo modules it imports, its arguments,
+and the content hashes of its inputs) matches the last successful run and its
+outputs are still the files it wrote. Stages whose
+dependencies are satisfied run in parallel, so the synthetic-patient branch
+and the graph-weight branch proceed side by side.
+
+Stages without inputs (scrape, synth-patients) run once and are then reused
+until forced, e.g. `--force scrape` for the nightly refresh; downstream stages
+rerun only if the scraped exports actually changed.
+
+Inputs / outputs:
+    - pipeline_state.json      (fingerprints of the last successful run per stage)
+    - pipeline_logs/<stage>.log
+
+Usage:
+    python pipeline.py                       # run whatever is out of date
+    python pipeline.py --force scrape        # fresh scrape, then whatever it changed
+    python pipeline.py --only train predict  # restrict to some stages
+    python pipeline.py --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+
+STATE_PATH = Path("pipeline_state.json")
+LOG_DIR = Path("pipeline_logs")
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+GRAPH_NODES = "ctgov_graph_nodes.csv"
+GRAPH_EDGES = "ctgov_graph_edges.csv"
+GRAPH_MODEL = "model_artifacts/dropout_weight_model.joblib"
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    args: list[str] = field(default_factory=list)
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+
+
+STAGES = [
+    Stage(
+        "scrape",
+        "ctgov_scraper.py",
+        outputs=[
+            "ctgov_cardiometabolic_trials.csv",
+            "ctgov_dropout_analysis.csv",
+            GRAPH_NODES,
+            GRAPH_EDGES,
+            "ctgov_graph_provenance.csv",
+        ],
+    ),
+    Stage(
+        "train",
+        "train_dropout_model.py",
+        inputs=[GRAPH_EDGES, GRAPH_NODES],
+        outputs=[
+            GRAPH_MODEL,
+            "model_artifacts/metrics.json",
+            "model_artifacts/feature_importance.csv",
+            "model_artifacts/permutation_importance.csv",
+            "model_artifacts/scored_dropout_events.csv",
+        ],
+    ),
+    Stage(
+        "predict",
+        "predict_dropout_risk.py",
+        ["--from-graph"],
+        inputs=[GRAPH_MODEL, GRAPH_EDGES, GRAPH_NODES],
+        outputs=["model_artifacts/dropout_risk_predictions.csv"],
+    ),
+    # Graph-model dashboard export goes beside the model so it does not
+    # overwrite the patient model's predictions.csv / dashboard_store.
+    Stage(
+        "export-predictions",
+        "generate_predictions_csv.py",
+        ["--output", "model_artifacts/graph_predictions.csv", "--store-out", "model_artifacts/graph_dashboard_store"],
+        inputs=[GRAPH_MODEL, GRAPH_EDGES, GRAPH_NODES],
+        outputs=["model_artifacts/graph_predictions.csv", "model_artifacts/graph_dashboard_store/manifest.json"],
+    ),
+    Stage(
+        "synth-patients",
+        "generate_synthetic_patients.py",
+        outputs=["synthetic_patients.csv"],
+    ),
+    Stage(
+        "train-patients",
+        "train_model.py",
+        inputs=["synthetic_patients.csv"],
+        outputs=[
+            "dropout_model.pkl",
+            "metrics.json",
+            "predictions.csv",
+            "feature_importance.csv",
+            "dashboard_store/manifest.json",
+        ],
+    ),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run pipeline stages whose inputs changed.")
+    parser.add_argument("--only", nargs="+", default=None, help="Run only these stages.")
+    parser.add_argument("--force", nargs="+", default=[], help="Rerun these stages even if up to date.")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run in parallel.")
+    parser.add_argument("--state", type=Path, default=STATE_PATH, help="Pipeline state JSON.")
+    parser.add_argument("--log-dir", type=Path, default=LOG_DIR, help="Per-stage log directory.")
+    parser.add_argument("--dry-run", action="store_true", help="Show which stages would run.")
+    return parser.parse_args()
+
+
+def build_graph(stages: list[Stage]) -> dict[str, list[str]]:
+    """Stage name -> names of the stages producing its inputs."""
+    producers = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in producers:
+                raise ValueError(f"Output {out} is declared by both {producers[out]} and {stage.name}.")
+            producers[out] = stage.name
+    deps = {s.name: sorted({producers[i] for i in s.inputs if i in producers} - {s.name}) for s in stages}
+
+    # Reject cycles up front rather than deadlocking the scheduler.
+    visiting, done = set(), set()
+
+    def visit(name: str):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle through {name}.")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in deps:
+        visit(name)
+    return deps
+
+
+class FileHashes:
+    """Content hashes, reused from state while a file's size and mtime are unchanged."""
+
+    def __init__(self, cached: dict):
+        self.cached = cached
+
+    def __call__(self, path: str) -> str | None:
+        p = Path(path)
+        if not p.exists():
+            return None
+        stat = p.stat()
+        entry = self.cached.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha1"]
+        digest = hashlib.sha1()
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.cached[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest.hexdigest()}
+        return self.cached[path]["sha1"]
+
+
+def local_modules(script: str) -> list[str]:
+    """The script plus every repo module it imports, directly or through other repo modules."""
+    seen, pending = set(), [SCRIPT_DIR / script]
+    while pending:
+        path = pending.pop()
+        if path in seen or not path.is_file():
+            continue
+        seen.add(path)
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            pending.extend(SCRIPT_DIR / f"{name.split('.')[0]}.py" for name in names)
+    return sorted(str(path) for path in seen)
+
+
+def stage_fingerprint(stage: Stage, file_hash: FileHashes) -> str:
+    digest = hashlib.sha1()
+    digest.update(json.dumps({"script": stage.script, "args": stage.args}).encode("utf-8"))
+    # Imported repo modules count as the stage's code too (e.g. train_model.py -> patient_sgd.py).
+    for path in local_modules(stage.script):
+        digest.update(f"{Path(path).name}={file_hash(path)}".encode("utf-8"))
+    for path in stage.inputs:
+        digest.update(f"{path}={file_hash(path)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_up_to_date(stage: Stage, record: dict | None, fingerprint: str, file_hash: FileHashes) -> bool:
+    if not record or record.get("fingerprint") != fingerprint:
+        return False
+    return all(file_hash(out) == record["outputs"].get(out) for out in stage.outputs)
+
+
+def load_state(path: Path) -> dict:
+    if not path.exists():
+        return {"stages": {}, "files": {}}
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("stages", {})
+    state.setdefault("files", {})
+    return state
+
+
+def save_state(state: dict, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    tmp.replace(path)
+
+
+def run_stage(stage: Stage, log_dir: Path) -> tuple[int, float]:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(SCRIPT_DIR / stage.script), *stage.args]
+    start = time.perf_counter()
+    with open(log_dir / f"{stage.name}.log", "w", encoding="utf-8") as log:
+        log.write(f"$ {' '.join(cmd)}\n")
+        log.flush()
+        code = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, check=False).returncode
+    return code, time.perf_counter() - start
+
+
+def run_pipeline(
+    stages: list[Stage],
+    state_path: Path = STATE_PATH,
+    log_dir: Path = LOG_DIR,
+    only: list[str] | None = None,
+    force: list[str] | None = None,
+    jobs: int = 2,
+    dry_run: bool = False,
+) -> dict[str, str]:
+    """Run out-of-date stages in dependency order. Returns stage name -> status."""
+    deps = build_graph(stages)
+    by_name = {s.name: s for s in stages}
+    unknown = [n for n in (only or []) + (force or []) if n not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown}. Known: {list(by_name)}")
+    selected = set(only) if only else set(by_name)
+    forced = set(force or [])
+
+    state = load_state(state_path)
+    file_hash = FileHashes(state["files"])
+    status = {name: "pending" for name in by_name if name in selected}
+    ran = set()
+
+    def ready(name: str) -> bool:
+        return all(status.get(d) in (None, "skipped", "done", "would run") for d in deps[name])
+
+    def blocked(name: str) -> bool:
+        return any(status.get(d) in ("failed", "blocked") for d in deps[name])
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        running = {}
+        while True:
+            progressed = False
+            for name in [n for n, st in status.items() if st == "pending"]:
+                if blocked(name):
+                    progressed = True
+                    status[name] = "blocked"
+                    print(f"[{name}] blocked by failed dependency")
+                    continue
+                if not ready(name):
+                    continue
+                progressed = True
+                stage = by_name[name]
+                fingerprint = stage_fingerprint(stage, file_hash)
+                upstream_ran = any(d in ran for d in deps[name])
+                if (
+                    name not in forced
+                    and not (dry_run and upstream_ran)
+                    and is_up_to_date(stage, state["stages"].get(name), fingerprint, file_hash)
+                ):
+                    status[name] = "skipped"
+                    print(f"[{name}] up to date")
+                    continue
+                if dry_run:
+                    status[name] = "would run"
+                    ran.add(name)
+                    print(f"[{name}] would run: {stage.script} {' '.join(stage.args)}".rstrip())
+                    continue
+                status[name] = "running"
+                print(f"[{name}] running {stage.script} {' '.join(stage.args)}".rstrip())
+                running[pool.submit(run_stage, stage, log_dir)] = name
+
+            if not running:
+                if progressed and any(st == "pending" for st in status.values()):
+                    continue
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                stage = by_name[name]
+                code, seconds = future.result()
+                missing = [out for out in stage.outputs if not Path(out).exists()]
+                if code != 0 or missing:
+                    status[name] = "failed"
+                    reason = f"exit code {code}" if code != 0 else f"missing outputs {missing}"
+                    print(f"[{name}] failed after {seconds:.1f}s ({reason}); see {log_dir / (name + '.log')}")
+                    continue
+                status[name] = "done"
+                ran.add(name)
+                state["stages"][name] = {
+                    "fingerprint": stage_fingerprint(stage, file_hash),
+                    "outputs": {out: file_hash(out) for out in stage.outputs},
+                    "finished_at": datetime.now().isoformat(timespec="seconds"),
+                    "seconds": round(seconds, 2),
+                }
+                save_state(state, state_path)
+                print(f"[{name}] done in {seconds:.1f}s")
+
+    if not dry_run:
+        save_state(state, state_path)
+    return status
+
+
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    status = run_pipeline(
+        STAGES,
+        state_path=args.state,
+        log_dir=args.log_dir,
+        only=args.only,
+        force=args.force,
+        jobs=args.jobs,
+        dry_run=args.dry_run,
+    )
+    counts = {}
+    for st in status.values():
+        counts[st] = counts.get(st, 0) + 1
+    print(f"\nPipeline finished in {time.perf_counter() - start:.1f}s: " + ", ".join(f"{v} {k}" for k, v in sorted(counts.items())))
+    if any(st in ("failed", "blocked") for st in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
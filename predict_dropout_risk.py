@@ -7,16 +7,40 @@ Modes:
 
 2) Score existing graph dropout events:
    python predict_dropout_risk.py --from-graph
+
+Add --surrogate to score with the distilled surrogate (distill_model.py),
+which is much faster per row and tracks the forest closely.
+
+Add --shards to route each row to its search_condition's shard model
+(train_dropout_model.py --shards), with the main model as the fallback.
+
+Add --explain for per-row top_contributors (path attributions over the
+forest, by base feature); --explain-tiers high limits it to high-risk rows.
+
+With --db, graph edges are read from the analytics database and the scored
+rows are loaded into its `scores` table.
 """
 
 from __future__ import annotations
 
 import argparse
+import csv
+import json
 from pathlib import Path
 
-import joblib
-import numpy as np
-import pandas as pd
+from analytics_db import add_db_argument, load_table, read_table
+from condition_shards import route_with_shards
+from lazy_imports import lazy_import
+from prediction_cache import CACHE_PATH, DEFAULT_MAX_ROWS, PredictionCache, cached_predict, model_fingerprint
+from schemas import EDGES, read_artifact
+from score_sketch import sketch_percentiles
+from surrogate_model import SURROGATE_NAME
+from tracing import add_profile_arguments, profiled, span, to_csv
+from train_dropout_model import with_trial_features
+
+joblib = lazy_import("joblib")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 
 def parse_args():
@@ -27,6 +51,16 @@ def parse_args():
         default=Path("model_artifacts/dropout_weight_model.joblib"),
         help="Path to trained model bundle.",
     )
+    parser.add_argument(
+        "--surrogate",
+        action="store_true",
+        help="Score with the distilled surrogate saved beside --model (distill_model.py) instead of the forest.",
+    )
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="Route rows to the per-condition shard models beside --model (train_dropout_model.py --shards).",
+    )
     parser.add_argument(
         "--input",
         type=Path,
@@ -44,18 +78,57 @@ def parse_args():
         default=Path("ctgov_graph_edges.csv"),
         help="Graph edges CSV used when --from-graph is set.",
     )
+    parser.add_argument(
+        "--nodes",
+        type=Path,
+        default=Path("ctgov_graph_nodes.csv"),
+        help="Graph nodes CSV whose trial features are joined onto the edges with --from-graph.",
+    )
     parser.add_argument(
         "--output",
         type=Path,
         default=Path("model_artifacts/dropout_risk_predictions.csv"),
         help="Output CSV path.",
     )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=CACHE_PATH,
+        help="SQLite prediction cache keyed by model and feature-row hash.",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Score every row without the cache.")
+    parser.add_argument(
+        "--cache-max-rows",
+        type=int,
+        default=DEFAULT_MAX_ROWS,
+        help="Least recently used cache entries beyond this are evicted.",
+    )
     parser.add_argument(
         "--top-n",
         type=int,
         default=25,
         help="Rows to print in terminal preview.",
     )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Add per-row top_contributors from path attributions over the forest (forest_attributions.py).",
+    )
+    parser.add_argument("--explain-top-k", type=int, default=3, help="Contributors listed per row with --explain.")
+    parser.add_argument(
+        "--explain-tiers",
+        nargs="+",
+        default=None,
+        help="Only explain rows in these risk tiers (e.g. high); default: all rows.",
+    )
+    parser.add_argument(
+        "--attributions-out",
+        type=Path,
+        default=None,
+        help="With --explain, also write the full per-row attribution matrix here.",
+    )
+    add_db_argument(parser, "Read graph edges from this analytics database and load scores into it.")
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 
@@ -73,9 +146,21 @@ def _action_hint(reason: str) -> str:
 
 
 def _ensure_template(input_path: Path, numeric_features: list, categorical_features: list):
-    template = pd.DataFrame(columns=numeric_features + categorical_features)
     input_path.parent.mkdir(parents=True, exist_ok=True)
-    template.to_csv(input_path, index=False)
+    with open(input_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(numeric_features + categorical_features)
+
+
+def _template_features(model_path: Path) -> tuple[list, list]:
+    """Feature lists for a template, from metrics.json when it is current so the bundle is not unpickled."""
+    metrics_path = model_path.parent / "metrics.json"
+    if model_path.exists() and metrics_path.exists() and metrics_path.stat().st_mtime >= model_path.stat().st_mtime:
+        with open(metrics_path, encoding="utf-8") as f:
+            features = json.load(f).get("features", {})
+        if features.get("numeric") or features.get("categorical"):
+            return features.get("numeric", []), features.get("categorical", [])
+    _, numeric, categorical, _ = _load_bundle(model_path)
+    return numeric, categorical
 
 
 def _load_bundle(model_path: Path):
@@ -89,17 +174,20 @@ def _load_bundle(model_path: Path):
     categorical = features.get("categorical", [])
     if not numeric and not categorical:
         raise ValueError("Model metadata missing feature definitions.")
-    return model, numeric, categorical
+    return model, numeric, categorical, bundle.get("score_sketch")
 
 
-def _load_from_graph(edges_path: Path) -> pd.DataFrame:
-    if not edges_path.exists():
-        raise FileNotFoundError(f"Graph edges file not found: {edges_path}")
-    edges = pd.read_csv(edges_path)
-    df = edges[edges["edge_type"] == "dropout_event"].copy()
+def _load_from_graph(edges_path: Path, db_path: Path | None = None, nodes_path: Path | None = None) -> pd.DataFrame:
+    if db_path is not None:
+        df = read_table("edges", db_path, edge_type="dropout_event")
+    else:
+        if not edges_path.exists():
+            raise FileNotFoundError(f"Graph edges file not found: {edges_path}")
+        edges = read_artifact(edges_path, EDGES)
+        df = edges[edges["edge_type"] == "dropout_event"].copy()
     if df.empty:
         raise ValueError("No dropout_event rows found in graph edges CSV.")
-    return df
+    return with_trial_features(df, nodes_path, db_path) if nodes_path is not None or db_path is not None else df
 
 
 def _prepare_features(df: pd.DataFrame, numeric_features: list, categorical_features: list) -> pd.DataFrame:
@@ -112,55 +200,113 @@ def _prepare_features(df: pd.DataFrame, numeric_features: list, categorical_feat
     return x[numeric_features + categorical_features]
 
 
-def _add_risk_labels(scored: pd.DataFrame) -> pd.DataFrame:
+def _add_risk_labels(scored: pd.DataFrame, sketch: dict | None = None) -> pd.DataFrame:
     if scored.empty:
         scored["risk_percentile"] = []
         scored["risk_tier"] = []
         return scored
 
-    scored["risk_percentile"] = scored["predicted_graph_weight"].rank(pct=True, method="average")
+    if sketch:
+        # Percentile against the training reference distribution, independent of batch size.
+        scored["risk_percentile"] = sketch_percentiles(scored["predicted_graph_weight"], sketch)
+    else:
+        # Bundles trained before the sketch existed: rank within the batch.
+        scored["risk_percentile"] = scored["predicted_graph_weight"].rank(pct=True, method="average")
     scored["risk_tier"] = np.where(
         scored["risk_percentile"] >= 0.80,
         "high",
         np.where(scored["risk_percentile"] >= 0.50, "medium", "low"),
     )
-    scored["action_hint"] = scored["reason"].apply(_action_hint) if "reason" in scored.columns else ""
+    if "reason" in scored.columns:
+        # Few distinct reasons: build each hint once and fan it out by code;
+        # code -1 (missing reason) picks the trailing empty-reason hint.
+        codes, reasons = pd.factorize(scored["reason"])
+        hints = np.array([_action_hint(str(r)) for r in reasons] + [_action_hint("")], dtype=object)
+        scored["action_hint"] = hints[codes]
+    else:
+        scored["action_hint"] = ""
     return scored
 
 
+def _add_explanations(args, scored: pd.DataFrame, x: pd.DataFrame, model, categorical_features: list):
+    from forest_attributions import ForestAttributions, top_contributors
+
+    selected = scored.index
+    if args.explain_tiers:
+        selected = scored.index[scored["risk_tier"].isin([t.lower() for t in args.explain_tiers])]
+    explainer = ForestAttributions(model, categorical_features)
+    attributions = explainer.explain(x.loc[selected])
+    scored["top_contributors"] = ""
+    scored.loc[selected, "top_contributors"] = top_contributors(attributions, args.explain_top_k)
+    if args.attributions_out is not None:
+        keys = [c for c in ["trial_id", "reason", "period_title", "arm_id", "predicted_graph_weight"] if c in scored.columns]
+        table = scored.loc[selected, keys].assign(bias=explainer.bias)
+        table = table.join(attributions.add_suffix("_contribution"))
+        to_csv(table.sort_values("predicted_graph_weight", ascending=False), args.attributions_out)
+    print(f"Explained {len(selected)} rows (bias {explainer.bias:.4f})")
+
+
 def main():
     args = parse_args()
-    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with profiled(args.profile, args.profile_memory, root="predict"):
+        _predict(args)
 
-    model, numeric_features, categorical_features = _load_bundle(args.model)
 
-    if args.from_graph:
-        source = _load_from_graph(args.edges)
-    else:
+def _predict(args):
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    model_path = args.model.parent / SURROGATE_NAME if args.surrogate else args.model
+    if args.surrogate and args.explain:
+        raise ValueError("--explain attributes the forest's decision paths; run it without --surrogate.")
+    if args.shards and (args.surrogate or args.explain):
+        raise ValueError("--shards cannot be combined with --surrogate or --explain.")
+
+    if not args.from_graph and (args.input is None or not args.input.exists()):
+        template_path = args.input or Path("new_dropout_contexts.csv")
+        _ensure_template(template_path, *_template_features(model_path))
         if args.input is None:
-            default_template = Path("new_dropout_contexts.csv")
-            _ensure_template(default_template, numeric_features, categorical_features)
-            raise FileNotFoundError(
-                f"No --input provided. Template created at {default_template}. "
-                f"Fill it and rerun with --input {default_template}."
-            )
-        if not args.input.exists():
-            _ensure_template(args.input, numeric_features, categorical_features)
             raise FileNotFoundError(
-                f"Input file not found. Template created at {args.input}. "
-                f"Fill it and rerun."
+                f"No --input provided. Template created at {template_path}. "
+                f"Fill it and rerun with --input {template_path}."
             )
-        source = pd.read_csv(args.input)
+        raise FileNotFoundError(
+            f"Input file not found. Template created at {args.input}. "
+            f"Fill it and rerun."
+        )
+
+    with span("load.model", path=str(model_path)) as s:
+        model, numeric_features, categorical_features, score_sketch = _load_bundle(model_path)
+        s.add(bytes=model_path.stat().st_size)
+
+    with span("load.input") as s:
+        if args.from_graph:
+            source = _load_from_graph(args.edges, args.db, args.nodes)
+        else:
+            source = pd.read_csv(args.input)
+        s.add(rows=len(source))
 
     x = _prepare_features(source, numeric_features, categorical_features)
-    preds = model.predict(x)
+    cache = None if args.no_cache else PredictionCache(args.cache, args.cache_max_rows)
+    model_key = model_fingerprint(model_path, "predict", list(x.columns))
+    if args.shards:
+        model, model_key = route_with_shards(model, model_path, model_key, list(x.columns))
+    try:
+        preds, score_stats = cached_predict(cache, model_key, x, model.predict)
+    finally:
+        if cache is not None:
+            cache.close()
 
     scored = source.copy()
     scored["predicted_graph_weight"] = preds
-    scored = _add_risk_labels(scored)
+    with span("risk_labels") as s:
+        scored = _add_risk_labels(scored, score_sketch)
+        s.add(rows=len(scored))
+    if args.explain:
+        _add_explanations(args, scored, x, model, categorical_features)
     scored = scored.sort_values("predicted_graph_weight", ascending=False)
 
-    scored.to_csv(args.output, index=False)
+    to_csv(scored, args.output)
+    if args.db is not None:
+        load_table(scored, "scores", args.db)
 
     preview_cols = [
         c
@@ -173,6 +319,7 @@ def main():
             "risk_percentile",
             "risk_tier",
             "action_hint",
+            "top_contributors",
         ]
         if c in scored.columns
     ]
@@ -181,6 +328,9 @@ def main():
     print("Prediction complete")
     print(f"Output: {args.output}")
     print(f"Rows scored: {len(scored)}")
+    print(f"Unique feature rows: {score_stats['unique']} (model calls: {score_stats['predicted']})")
+    if not args.no_cache:
+        print(f"Cache hits: {score_stats['hits']}/{score_stats['rows']} ({args.cache})")
     if len(preview) > 0:
         print("\nTop predicted risks:")
         print(preview.to_string(index=False))
@@ -0,0 +1,190 @@
+"""
+Content-addressed prediction cache shared by the scoring CLIs.
+
+Predictions are stored in SQLite keyed by a fingerprint of the model bundle
+(file hash + scoring mode + feature columns) and a 64-bit hash of each
+prepared feature row. Lookups and inserts are done in bulk through a temp
+table, and the cache is trimmed to `max_rows` by evicting the least recently
+used entries, so repeat scoring runs only call `model.predict` on rows that
+are new or changed. Identical feature rows within a run are scored once.
+
+Used by predict_dropout_risk.py and generate_predictions_csv.py.
+
+Outputs:
+    - model_artifacts/prediction_cache.sqlite
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from tracing import span
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+CACHE_PATH = Path("model_artifacts/prediction_cache.sqlite")
+DEFAULT_MAX_ROWS = 2_000_000
+
+
+def model_fingerprint(model_path: Path, mode: str, columns: list[str]) -> str:
+    """Hash of the bundle file plus how it is used; any change invalidates old entries."""
+    digest = hashlib.sha1()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(mode.encode("utf-8"))
+    digest.update("\x1f".join(columns).encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def row_hashes(x: pd.DataFrame) -> np.ndarray:
+    """Stable 64-bit hash per prepared feature row, as signed ints for SQLite.
+
+    CSV reads carry schema dtypes (Int32, float32, category) while --db reads
+    carry float64 and str, so columns are brought to one form first: numbers
+    at float32 precision (what the tree models score) and labels as strings.
+    """
+    keyed = {}
+    for col in x.columns:
+        values = x[col]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            keyed[col] = values.to_numpy(dtype=np.float32, na_value=np.nan).astype(np.float64)
+        else:
+            keyed[col] = values.astype(str).to_numpy(dtype=object)
+    frame = pd.DataFrame(keyed, index=x.index, columns=x.columns)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64).view(np.int64)
+
+
+class PredictionCache:
+    def __init__(self, path: Path = CACHE_PATH, max_rows: int = DEFAULT_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Pipeline stages may score against the same cache concurrently; wait out their writes.
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS predictions (
+                model_key TEXT NOT NULL,
+                row_hash INTEGER NOT NULL,
+                value REAL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model_key, row_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions(last_used)")
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+    def lookup(self, model_key: str, hashes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Cached values (NaN on miss) and a hit mask, aligned with `hashes`."""
+        values = np.full(len(hashes), np.nan)
+        hit = np.zeros(len(hashes), dtype=bool)
+        if len(hashes) == 0:
+            return values, hit
+        now = int(time.time())
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (row_hash INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM wanted")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO wanted VALUES (?)", ((int(h),) for h in np.unique(hashes))
+            )
+            found = self.conn.execute(
+                """
+                SELECT p.row_hash, p.value FROM predictions p
+                JOIN wanted w ON w.row_hash = p.row_hash
+                WHERE p.model_key = ?
+                """,
+                (model_key,),
+            ).fetchall()
+            self.conn.execute(
+                """
+                UPDATE predictions SET last_used = ?
+                WHERE model_key = ? AND row_hash IN (SELECT row_hash FROM wanted)
+                """,
+                (now, model_key),
+            )
+        if found:
+            keys = np.fromiter((r[0] for r in found), dtype=np.int64, count=len(found))
+            vals = np.fromiter((np.nan if r[1] is None else r[1] for r in found), dtype=float, count=len(found))
+            order = np.argsort(keys)
+            keys, vals = keys[order], vals[order]
+            pos = np.clip(np.searchsorted(keys, hashes), 0, len(keys) - 1)
+            hit = keys[pos] == hashes
+            values[hit] = vals[pos[hit]]
+        return values, hit
+
+    def store(self, model_key: str, hashes: np.ndarray, values: np.ndarray):
+        if len(hashes) == 0:
+            return
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                (
+                    (model_key, int(h), None if np.isnan(v) else float(v), now)
+                    for h, v in zip(hashes, np.asarray(values, dtype=float))
+                ),
+            )
+
+    def evict(self):
+        """Drop least recently used entries beyond max_rows."""
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        excess = count - self.max_rows
+        if excess <= 0:
+            return
+        with self.conn:
+            self.conn.execute(
+                """
+                DELETE FROM predictions WHERE (model_key, row_hash) IN (
+                    SELECT model_key, row_hash FROM predictions ORDER BY last_used LIMIT ?
+                )
+                """,
+                (excess,),
+            )
+
+
+def cached_predict(cache: PredictionCache | None, model_key: str, x: pd.DataFrame, predict_fn) -> tuple[np.ndarray, dict]:
+    """Score `x`, calling `predict_fn` once per distinct feature row that misses the cache.
+
+    Rows are deduplicated by their 64-bit hash, so arms or patients with identical
+    prepared features are scored once and the result is scattered back.
+    Returns (predictions aligned with `x`, {"rows", "unique", "hits", "predicted"}).
+    """
+    with span("score.dedupe") as s:
+        hashes = row_hashes(x)
+        unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        s.add(rows=len(x))
+    if cache is None:
+        values, hit = np.full(len(unique), np.nan), np.zeros(len(unique), dtype=bool)
+    else:
+        with span("score.cache_lookup") as s:
+            values, hit = cache.lookup(model_key, unique)
+            s.add(rows=len(unique))
+    miss = ~hit
+    if miss.any():
+        with span("score.predict") as s:
+            values[miss] = np.asarray(predict_fn(x.iloc[first[miss]]), dtype=float).reshape(-1)
+            s.add(rows=int(miss.sum()))
+        if cache is not None:
+            with span("score.cache_store") as s:
+                cache.store(model_key, unique[miss], values[miss])
+                s.add(rows=int(miss.sum()))
+    stats = {
+        "rows": int(len(x)),
+        "unique": int(len(unique)),
+        "hits": int(hit[inverse].sum()),
+        "predicted": int(miss.sum()),
+    }
+    return values[inverse], stats
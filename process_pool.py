@@ -0,0 +1,57 @@
+"""
+Process-pool fan-out shared by the parallel model tools.
+
+`run_pool(fn, tasks, jobs, state)` maps `fn` over `tasks` in worker
+processes. `state` holds the large read-only inputs every task needs (a
+fitted model, a cached matrix, test predictions); task functions read them
+from WORKER instead of receiving them in each task. On fork-capable
+platforms the workers inherit WORKER from the parent, so nothing large is
+pickled. Elsewhere each worker receives `state` once through the pool
+initializer. With one job the tasks run inline, with the same WORKER.
+
+multiprocessing and concurrent.futures are imported only when a pool is
+started, so importing a training script does not load them.
+
+Used by permutation_importance.py, bootstrap_eval.py and condition_shards.py.
+"""
+
+from __future__ import annotations
+
+import os
+
+
+WORKER = {}
+
+
+def pool_size(jobs: int | None, tasks: int) -> int:
+    """Worker processes for `tasks` tasks: --jobs (default: all cores), at most one per task."""
+    return max(1, min(jobs or os.cpu_count() or 1, tasks))
+
+
+def _init_worker(state: dict, initializer) -> None:
+    WORKER.update(state)
+    if initializer is not None:
+        initializer()
+
+
+def run_pool(fn, tasks, jobs: int, state: dict | None = None, initializer=None, chunksize: int = 1) -> list:
+    """[fn(task) for task in tasks] across `jobs` processes, with `state` readable as WORKER.
+
+    `initializer()` runs once in each worker process after WORKER is set (not for inline runs).
+    """
+    tasks = list(tasks)
+    WORKER.update(state or {})
+    try:
+        if jobs <= 1:
+            return [fn(task) for task in tasks]
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            pool = ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("fork"), initializer=initializer)
+        else:
+            pool = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(state or {}, initializer))
+        with pool:
+            return list(pool.map(fn, tasks, chunksize=chunksize))
+    finally:
+        WORKER.clear()
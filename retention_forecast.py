@@ -0,0 +1,242 @@
+"""
+Forecast how many enrolled patients will complete, per trial (or site) and
+across the network, from the patient model's dropout_risk.
+
+Each patient completes with probability 1 - dropout_risk, so a group's
+completer count follows a Poisson-binomial distribution. Groups up to
+--exact-max patients get the exact distribution: the PMF recursion runs over
+batches of similar-sized groups at once on a padded (groups x patients)
+matrix. Larger groups are simulated: --simulations Bernoulli draws per patient, generated in
+bounded column blocks and summed per simulation. The network total is the sum
+of per-group draws (exact groups are sampled from their PMFs by inverse CDF).
+
+Patients marked dropped_out in --roster (when given) count as certain
+dropouts.
+
+Inputs / outputs:
+    - predictions.csv                          (patient_id, trial_id, dropout_risk)
+    - model_artifacts/retention_forecast.csv   (expected completers, intervals, method per group)
+    - --pmf-out                                 (optional: full completer distribution per group)
+
+Usage:
+    python retention_forecast.py
+    python retention_forecast.py --roster synthetic_patients.csv --by trial_id --levels 0.8 0.95
+    python retention_forecast.py --target-rate 0.75 --pmf-out model_artifacts/retention_pmf.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from tracing import add_profile_arguments, profiled, span, to_csv
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+NETWORK = "network"
+MAX_DRAW_CELLS = 4_000_000
+EXACT_BATCH = 256
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Forecast completers per trial/site from patient dropout risk.")
+    parser.add_argument("--predictions", type=Path, default=Path("predictions.csv"), help="Patient predictions CSV.")
+    parser.add_argument("--roster", type=Path, default=None, help="Roster to join (extra --by columns, dropped_out status).")
+    parser.add_argument("--by", nargs="+", default=["trial_id"], help="Columns to forecast by, each as its own level.")
+    parser.add_argument("--levels", nargs="+", type=float, default=[0.8, 0.95], help="Central interval levels.")
+    parser.add_argument("--target-rate", type=float, default=None, help="Also report P(completion rate >= this).")
+    parser.add_argument("--exact-max", type=int, default=2000, help="Largest group solved exactly (cost grows with size squared).")
+    parser.add_argument("--simulations", type=int, default=20_000, help="Monte Carlo draws per group and for the network.")
+    parser.add_argument("--random-seed", type=int, default=42, help="Seed for the simulations.")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("model_artifacts/retention_forecast.csv"),
+        help="Forecast CSV (written beside the CRC triage queue).",
+    )
+    parser.add_argument("--pmf-out", type=Path, default=None, help="Optional CSV of each group's completer distribution.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def exact_pmfs(groups: list[np.ndarray]) -> np.ndarray:
+    """Poisson-binomial PMFs of several groups at once; row g, column k = P(k completers)."""
+    width = max((len(q) for q in groups), default=0)
+    padded = np.zeros((len(groups), width))
+    for g, q in enumerate(groups):
+        padded[g, : len(q)] = q  # padding completes with probability 0 and leaves the PMF unchanged
+    pmf = np.zeros((len(groups), width + 1))
+    pmf[:, 0] = 1.0
+    for j in range(width):
+        q = padded[:, j : j + 1]
+        shifted = pmf[:, :-1] * q
+        pmf *= 1.0 - q
+        pmf[:, 1:] += shifted
+    return pmf
+
+
+def simulate_completers(q: np.ndarray, simulations: int, rng) -> np.ndarray:
+    """Completer counts of one group over `simulations` draws, in bounded blocks of patients."""
+    counts = np.zeros(simulations, dtype=np.int64)
+    block = max(1, MAX_DRAW_CELLS // max(simulations, 1))
+    for lo in range(0, len(q), block):
+        part = q[lo : lo + block]
+        counts += (rng.random((simulations, len(part)), dtype=np.float32) < part).sum(axis=1)
+    return counts
+
+
+def sample_pmf(pmf: np.ndarray, simulations: int, rng) -> np.ndarray:
+    cdf = np.cumsum(pmf)
+    return np.minimum(np.searchsorted(cdf, rng.random(simulations) * cdf[-1], side="right"), len(pmf) - 1)
+
+
+def _pmf_quantiles(pmf: np.ndarray, probs: list[float]) -> list[int]:
+    cdf = np.cumsum(pmf)
+    return [int(np.searchsorted(cdf, p - 1e-12, side="left")) for p in probs]
+
+
+def forecast_level(
+    df: pd.DataFrame, column: str, levels: list[float], target_rate: float | None, exact_max: int, simulations: int, rng
+) -> tuple[pd.DataFrame, np.ndarray, list]:
+    """One row per group of `column`; also returns the summed network draws and per-group PMFs."""
+    tails = sorted({(1 - lv) / 2 for lv in levels} | {(1 + lv) / 2 for lv in levels} | {0.5})
+    grouped = df.groupby(column, sort=True, observed=True)["complete_prob"]
+    names, arrays = [], []
+    for name, q in grouped:
+        names.append(name)
+        arrays.append(q.to_numpy(dtype=float))
+
+    # Exact groups are solved in batches of similar size so padding stays small.
+    small = sorted((i for i, q in enumerate(arrays) if len(q) <= exact_max), key=lambda i: len(arrays[i]))
+    pmfs = {}
+    for lo in range(0, len(small), EXACT_BATCH):
+        batch = small[lo : lo + EXACT_BATCH]
+        pmfs.update(zip(batch, exact_pmfs([arrays[i] for i in batch])))
+    network = np.zeros(simulations, dtype=np.int64)
+    rows, distributions = [], []
+    for i, (name, q) in enumerate(zip(names, arrays)):
+        n = len(q)
+        need = math.ceil(target_rate * n - 1e-9) if target_rate is not None else None
+        if i in pmfs:
+            pmf = pmfs[i][: n + 1]
+            quantiles = _pmf_quantiles(pmf, tails)
+            meets = float(pmf[need:].sum()) if need is not None else None
+            network += sample_pmf(pmf, simulations, rng)
+            method = "exact"
+        else:
+            draws = simulate_completers(q, simulations, rng)
+            quantiles = [int(v) for v in np.quantile(draws, tails, method="inverted_cdf")]
+            meets = float((draws >= need).mean()) if need is not None else None
+            pmf = np.bincount(draws, minlength=n + 1) / simulations
+            network += draws
+            method = "monte_carlo"
+        distributions.append((name, pmf))
+        rows.append(_forecast_row(column, name, q, quantiles, tails, levels, meets, method))
+    return pd.DataFrame(rows), network, distributions
+
+
+def _forecast_row(level, group, q, quantiles, tails, levels, meets, method) -> dict:
+    at = dict(zip(tails, quantiles))
+    row = {
+        "level": level,
+        "group": group,
+        "patients": len(q),
+        "expected_completers": float(q.sum()),
+        "expected_completion_rate": float(q.mean()) if len(q) else float("nan"),
+        "sd_completers": float(np.sqrt((q * (1 - q)).sum())),
+        "median_completers": at[0.5],
+    }
+    for lv in levels:
+        pct = f"{lv * 100:g}"
+        row[f"lo{pct}"] = at[(1 - lv) / 2]
+        row[f"hi{pct}"] = at[(1 + lv) / 2]
+    if meets is not None:
+        row["p_meets_target"] = meets
+    row["method"] = method
+    return row
+
+
+def main():
+    args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="retention-forecast"):
+        _forecast(args)
+
+
+def _forecast(args):
+    if not args.predictions.exists():
+        raise FileNotFoundError(f"Predictions not found: {args.predictions}. Run train_model.py first.")
+    if any(not 0 < lv < 1 for lv in args.levels):
+        raise ValueError("--levels must be between 0 and 1.")
+    if args.target_rate is not None and not 0 <= args.target_rate <= 1:
+        raise ValueError("--target-rate must be between 0 and 1.")
+
+    df = pd.read_csv(args.predictions, dtype={"patient_id": str, "trial_id": str})
+    if args.roster is not None:
+        if not args.roster.exists():
+            raise FileNotFoundError(f"Roster not found: {args.roster}")
+        roster = pd.read_csv(args.roster, dtype={"patient_id": str, "trial_id": str})
+        extra = [c for c in roster.columns if c not in df.columns or c == "patient_id"]
+        df = df.merge(roster[extra], on="patient_id", how="left")
+    missing = sorted({"dropout_risk", *args.by} - set(df.columns))
+    if missing:
+        raise ValueError(f"Predictions are missing columns: {missing}")
+
+    df["complete_prob"] = 1.0 - pd.to_numeric(df["dropout_risk"], errors="coerce").fillna(1.0).clip(0, 1)
+    if "status" in df.columns:
+        df.loc[df["status"].astype(str).str.lower() == "dropped_out", "complete_prob"] = 0.0
+
+    rng = np.random.default_rng(args.random_seed)
+    start = time.perf_counter()
+    frames, pmf_rows = [], []
+    network = None
+    with span("forecast", patients=len(df)) as s:
+        for column in args.by:
+            table, draws, distributions = forecast_level(
+                df, column, args.levels, args.target_rate, args.exact_max, args.simulations, rng
+            )
+            frames.append(table)
+            pmf_rows.extend((column, name, pmf) for name, pmf in distributions)
+            if network is None:
+                network = draws  # every level partitions the same patients; one network total suffices
+        q = df["complete_prob"].to_numpy(dtype=float)
+        tails = sorted({(1 - lv) / 2 for lv in args.levels} | {(1 + lv) / 2 for lv in args.levels} | {0.5})
+        need = math.ceil(args.target_rate * len(q) - 1e-9) if args.target_rate is not None else None
+        meets = float((network >= need).mean()) if need is not None else None
+        quantiles = [int(v) for v in np.quantile(network, tails, method="inverted_cdf")]
+        frames.append(pd.DataFrame([_forecast_row(NETWORK, NETWORK, q, quantiles, tails, args.levels, meets, "monte_carlo")]))
+        s.add(rows=len(df))
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    forecast = pd.concat(frames, ignore_index=True)
+    to_csv(forecast, args.output)
+    if args.pmf_out is not None:
+        pmf_table = pd.DataFrame(
+            [
+                {"level": level, "group": name, "completers": k, "probability": float(p)}
+                for level, name, pmf in pmf_rows
+                for k, p in enumerate(pmf)
+                if p > 0
+            ]
+        )
+        to_csv(pmf_table, args.pmf_out)
+
+    net = forecast.iloc[-1]
+    print(f"Forecast {len(df)} patients in {len(forecast) - 1} groups in {elapsed_ms:.1f} ms")
+    print(
+        f"Network: {net['expected_completers']:.1f} expected completers of {len(df)} "
+        f"(median {net['median_completers']}, {args.levels[-1] * 100:g}% interval "
+        f"{net[f'lo{args.levels[-1] * 100:g}']}-{net[f'hi{args.levels[-1] * 100:g}']})"
+    )
+    print(f"Methods: {forecast['method'].iloc[:-1].value_counts().to_dict()}")
+    print(f"Saved retention forecast: {args.output}")
+    if args.pmf_out is not None:
+        print(f"Saved completer distributions: {args.pmf_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Re-derive dropout-event graph weights from existing graph exports without rescraping.
+
+Recomputes `base_rate`, `size_factor_log1p_started`, `recency_decay`,
+`evidence_quality` and `graph_weight` for every dropout_event edge, vectorized,
+under new weighting parameters. Passing several values for any parameter emits
+one weight column per combination side by side for model experiments.
+
+Inputs:
+    - ctgov_graph_edges.csv
+    - ctgov_graph_nodes.csv       (trial completion dates)
+    - ctgov_graph_provenance.csv  (scraped_at reference, participant-flow flags)
+
+Outputs:
+    - ctgov_graph_edges_reweighted.csv
+    - ctgov_graph_edges_reweighted.variants.json  (when several variants are emitted)
+
+Usage:
+    python reweight_graph_edges.py --half-life-days 1460
+    python reweight_graph_edges.py --half-life-days 1460 2920 5840 --unknown-reason-quality 0.5 0.7
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+from pathlib import Path
+
+from ctgov_scraper import (
+    MISSING_START_EVIDENCE_QUALITY,
+    NO_FLOW_EVIDENCE_QUALITY,
+    RECENCY_HALF_LIFE_DAYS,
+    UNKNOWN_REASON_EVIDENCE_QUALITY,
+)
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+WEIGHT_COLUMNS = [
+    "base_rate",
+    "size_factor_log1p_started",
+    "recency_decay",
+    "evidence_quality",
+    "graph_weight",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recompute graph weights under new parameters.")
+    parser.add_argument(
+        "--edges",
+        type=Path,
+        default=Path("ctgov_graph_edges.csv"),
+        help="Path to graph edges CSV.",
+    )
+    parser.add_argument(
+        "--nodes",
+        type=Path,
+        default=Path("ctgov_graph_nodes.csv"),
+        help="Path to graph nodes CSV (for trial completion dates).",
+    )
+    parser.add_argument(
+        "--provenance",
+        type=Path,
+        default=Path("ctgov_graph_provenance.csv"),
+        help="Path to graph provenance CSV (for scraped_at and participant-flow flags).",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("ctgov_graph_edges_reweighted.csv"),
+        help="Output edges CSV path.",
+    )
+    parser.add_argument(
+        "--half-life-days",
+        type=float,
+        nargs="+",
+        default=[RECENCY_HALF_LIFE_DAYS],
+        help="Recency half-life(s) in days.",
+    )
+    parser.add_argument(
+        "--reference-date",
+        type=str,
+        nargs="+",
+        default=[None],
+        help="Reference date(s) for recency decay. Defaults to each trial's scraped_at.",
+    )
+    parser.add_argument(
+        "--no-flow-quality",
+        type=float,
+        nargs="+",
+        default=[NO_FLOW_EVIDENCE_QUALITY],
+        help="Evidence quality for trials without participant flow data.",
+    )
+    parser.add_argument(
+        "--missing-start-quality",
+        type=float,
+        nargs="+",
+        default=[MISSING_START_EVIDENCE_QUALITY],
+        help="Evidence quality when started_n is missing or zero.",
+    )
+    parser.add_argument(
+        "--unknown-reason-quality",
+        type=float,
+        nargs="+",
+        default=[UNKNOWN_REASON_EVIDENCE_QUALITY],
+        help="Evidence quality when the dropout reason is Unknown.",
+    )
+    return parser.parse_args()
+
+
+def load_inputs(edges_path: Path, nodes_path: Path, provenance_path: Path) -> pd.DataFrame:
+    """Load edges and attach per-trial completion date, scraped_at and flow flag."""
+    if not edges_path.exists():
+        raise FileNotFoundError(f"Edges file not found: {edges_path}")
+    edges = pd.read_csv(edges_path)
+
+    trial_cols = ["trial_id", "completion_date"]
+    if nodes_path.exists():
+        nodes = pd.read_csv(nodes_path, usecols=lambda c: c in {"node_type", *trial_cols})
+        trials = nodes[nodes["node_type"] == "trial"][trial_cols].drop_duplicates(subset=["trial_id"])
+    else:
+        trials = pd.DataFrame(columns=trial_cols)
+
+    prov_cols = ["trial_id", "scraped_at", "has_participant_flow"]
+    if provenance_path.exists():
+        prov = pd.read_csv(provenance_path, usecols=lambda c: c in set(prov_cols))
+        prov = prov.drop_duplicates(subset=["trial_id"])
+    else:
+        prov = pd.DataFrame(columns=prov_cols)
+
+    context = trials.merge(prov, on="trial_id", how="outer").rename(
+        columns={"completion_date": "_completion_date", "scraped_at": "_scraped_at", "has_participant_flow": "_has_flow"}
+    )
+    return edges.merge(context, on="trial_id", how="left")
+
+
+def compute_weights(
+    events: pd.DataFrame,
+    half_life_days: float = RECENCY_HALF_LIFE_DAYS,
+    reference_date: str | None = None,
+    no_flow_quality: float = NO_FLOW_EVIDENCE_QUALITY,
+    missing_start_quality: float = MISSING_START_EVIDENCE_QUALITY,
+    unknown_reason_quality: float = UNKNOWN_REASON_EVIDENCE_QUALITY,
+) -> pd.DataFrame:
+    """Vectorized equivalent of the dropout-event weighting in ctgov_scraper._build_graph_exports."""
+    started = pd.to_numeric(events["started_n"], errors="coerce")
+    discontinued = pd.to_numeric(events["discontinued_n"], errors="coerce").fillna(0)
+    has_start = started.notna() & (started > 0)
+
+    base_rate = np.where(has_start, (discontinued / started.where(has_start)).round(6), 0.0)
+    size_factor = np.where(has_start, np.log1p(started.where(has_start, 0)), 0.0)
+
+    completion = pd.to_datetime(events["_completion_date"], errors="coerce", format="mixed")
+    if reference_date is not None:
+        ref = pd.Series(pd.to_datetime(reference_date), index=events.index)
+    else:
+        ref = pd.to_datetime(events["_scraped_at"], errors="coerce", format="mixed")
+    # Floor to whole days, matching Timedelta.days in the scraper's scalar path.
+    age_days = np.floor((ref - completion) / pd.Timedelta(days=1))
+    recency = np.where(
+        age_days.notna(),
+        0.5 ** (np.clip(age_days.fillna(0), 0, None) / half_life_days),
+        1.0,
+    )
+
+    reason = events["reason"]
+    has_flow = events["_has_flow"]
+    if has_flow.dtype == object:
+        has_flow = has_flow.astype(str).str.lower().map({"true": True, "false": False})
+    # Edges from trials absent in provenance keep their flow evidence as exported.
+    exported_quality = (
+        pd.to_numeric(events["evidence_quality"], errors="coerce")
+        if "evidence_quality" in events.columns
+        else pd.Series(np.nan, index=events.index)
+    )
+    no_flow = has_flow.eq(False) | (has_flow.isna() & exported_quality.eq(0))
+    unknown_reason = reason.isna() | (reason.astype(str) == "") | (reason == "Unknown")
+    evidence = np.select(
+        [no_flow, ~has_start, unknown_reason],
+        [no_flow_quality, missing_start_quality, unknown_reason_quality],
+        default=1.0,
+    )
+
+    graph_weight = np.round(base_rate * size_factor * evidence * recency, 8)
+    return pd.DataFrame(
+        {
+            "base_rate": base_rate,
+            "size_factor_log1p_started": np.round(size_factor, 6),
+            "recency_decay": np.round(recency, 6),
+            "evidence_quality": evidence,
+            "graph_weight": graph_weight,
+        },
+        index=events.index,
+    )
+
+
+def build_variants(args) -> list[dict]:
+    grid = itertools.product(
+        args.half_life_days,
+        args.reference_date,
+        args.no_flow_quality,
+        args.missing_start_quality,
+        args.unknown_reason_quality,
+    )
+    return [
+        {
+            "half_life_days": hl,
+            "reference_date": ref,
+            "no_flow_quality": nf,
+            "missing_start_quality": ms,
+            "unknown_reason_quality": ur,
+        }
+        for hl, ref, nf, ms, ur in grid
+    ]
+
+
+def main():
+    args = parse_args()
+    edges = load_inputs(args.edges, args.nodes, args.provenance)
+    dropout_mask = edges["edge_type"] == "dropout_event"
+    events = edges[dropout_mask]
+    if events.empty:
+        raise ValueError("No dropout_event edges found in edges CSV.")
+
+    variants = build_variants(args)
+    out = edges.drop(columns=["_completion_date", "_scraped_at", "_has_flow"])
+
+    if len(variants) == 1:
+        weights = compute_weights(events, **variants[0])
+        for col in WEIGHT_COLUMNS:
+            out.loc[dropout_mask, col] = weights[col]
+    else:
+        manifest = []
+        for idx, params in enumerate(variants, start=1):
+            weights = compute_weights(events, **params)
+            col = f"graph_weight__v{idx}"
+            out[col] = np.nan
+            out.loc[dropout_mask, col] = weights["graph_weight"]
+            manifest.append({"column": col, **params})
+        manifest_path = args.output.with_suffix(".variants.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Variants: {manifest_path}")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(args.output, index=False)
+
+    print("Reweighting complete")
+    print(f"Dropout events reweighted: {int(dropout_mask.sum())}")
+    print(f"Parameterizations: {len(variants)}")
+    print(f"Output: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Column schemas for the CSV artifacts the pipeline reads back.
+
+Each schema names the compact dtype of the columns it knows: repeated labels
+(node/edge types, reasons, period titles, sponsor classes, tiers) load as
+categoricals, counts as nullable Int32, bounded model features as float32, and
+date columns as ISO-8601 datetimes. Columns a schema does not list keep
+pandas' inferred dtype.
+
+Targets and scores (graph_weight, predicted_graph_weight, dropout_risk) stay
+float64 so training and ranking see exactly the values that were written.
+The random forest casts its inputs to float32 internally, so float32
+features score identically. Node start/completion dates mix YYYY-MM and
+YYYY-MM-DD and stay strings: the training split parses them itself, and
+parsing both forms here would change which split it picks.
+
+Usage:
+    from schemas import EDGES, read_artifact
+    edges = read_artifact(Path("ctgov_graph_edges.csv"), EDGES, usecols=[...])
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from tracing import span
+
+pd = lazy_import("pandas")
+
+
+@dataclass(frozen=True)
+class Schema:
+    name: str
+    categorical: tuple[str, ...] = ()
+    int32: tuple[str, ...] = ()
+    float32: tuple[str, ...] = ()
+    dates: tuple[str, ...] = ()
+
+    def dtypes(self, columns) -> dict:
+        """read_csv dtype mapping for the given header columns."""
+        kinds = {}
+        for col in self.categorical:
+            kinds[col] = "category"
+        for col in self.int32:
+            kinds[col] = "Int32"
+        for col in self.float32:
+            kinds[col] = "float32"
+        return {c: kinds[c] for c in columns if c in kinds}
+
+
+EDGE_COUNTS = ("discontinued_n", "started_n", "completed_n")
+EDGE_RATES = (
+    "rate_within_period",
+    "rate_vs_trial_start",
+    "base_rate",
+    "size_factor_log1p_started",
+    "recency_decay",
+    "evidence_quality",
+)
+
+EDGES = Schema(
+    "edges",
+    categorical=("edge_type", "trial_id", "reason", "period_title", "arm_id", "source_path", "outcome_type"),
+    int32=EDGE_COUNTS,
+    float32=EDGE_RATES,
+)
+
+NODES = Schema(
+    "nodes",
+    categorical=(
+        "node_type",
+        "trial_id",
+        "phase",
+        "search_condition",
+        "conditions",
+        "sponsor_class",
+        "arm_id",
+        "outcome_type",
+        "timeframe",
+    ),
+    int32=("enrollment_count", "num_countries", "total_sites", "period_order"),
+)
+
+PATIENTS = Schema(
+    "patients",
+    categorical=("trial_id", "gender", "contact_method_preference", "status"),
+    int32=(
+        "age",
+        "scheduled_visits",
+        "completed_visits",
+        "missed_visits",
+        "days_since_last_contact",
+        "comorbidity_count",
+    ),
+    dates=("enrollment_date",),
+)
+
+SCHEMAS = {schema.name: schema for schema in (EDGES, NODES, PATIENTS)}
+
+
+def _parse_dates(df: pd.DataFrame, schema: Schema) -> pd.DataFrame:
+    for col in schema.dates:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+    return df
+
+
+def read_artifact(path: Path, schema: Schema, usecols=None, chunksize: int | None = None, **kwargs):
+    """read_csv with the schema's dtypes, projected to `usecols` (names; missing ones are ignored).
+
+    With `chunksize`, returns an iterator of typed chunks instead of one frame.
+    """
+    header = list(pd.read_csv(path, nrows=0).columns)
+    columns = header if usecols is None else [c for c in header if c in set(usecols)]
+    dtype = schema.dtypes(columns)
+    if chunksize is not None:
+        return _read_chunks(path, schema, columns, dtype, chunksize, kwargs)
+    with span("load.csv", path=str(path), schema=schema.name) as s:
+        df = _parse_dates(pd.read_csv(path, usecols=columns, dtype=dtype, **kwargs), schema)
+        s.add(rows=len(df), bytes=Path(path).stat().st_size)
+    return df
+
+
+def _read_chunks(path: Path, schema: Schema, columns: list, dtype: dict, chunksize: int, kwargs: dict):
+    with pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize, **kwargs) as reader:
+        for chunk in reader:
+            with span("load.csv", path=str(path), schema=schema.name) as s:
+                chunk = _parse_dates(chunk, schema)
+                s.add(rows=len(chunk))
+            yield chunk
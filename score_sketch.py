@@ -0,0 +1,58 @@
+"""
+Quantile sketch of a reference score distribution.
+
+train_dropout_model.py stores a sketch of its in-sample predictions in the
+model bundle; predict_dropout_risk.py maps new scores to percentiles by binary
+search against it, so a row's percentile and tier do not depend on what else
+is in the batch being scored.
+"""
+
+from __future__ import annotations
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+
+SKETCH_POINTS = 1001
+SKETCH_VERSION = 1
+
+
+def build_score_sketch(scores, points: int = SKETCH_POINTS) -> dict:
+    """Evenly spaced quantiles (0..1) of the finite reference scores."""
+    values = np.asarray(scores, dtype=float)
+    values = np.sort(values[np.isfinite(values)])
+    if len(values) == 0:
+        raise ValueError("Cannot build a score sketch from an empty reference distribution.")
+    points = max(2, min(int(points), len(values)))
+    probs = np.linspace(0.0, 1.0, points)
+    quantiles = np.quantile(values, probs)
+    return {
+        "version": SKETCH_VERSION,
+        "reference_rows": int(len(values)),
+        "quantiles": [float(q) for q in quantiles],
+    }
+
+
+def sketch_percentiles(scores, sketch: dict) -> np.ndarray:
+    """Percentile in [0, 1] of each score within the sketched reference distribution.
+
+    Scores between two sketch points are linearly interpolated; a score equal to
+    a run of tied points gets the middle of that run, as rank(method="average").
+    """
+    q = np.asarray(sketch["quantiles"], dtype=float)
+    probs = np.linspace(0.0, 1.0, len(q))
+    s = np.asarray(scores, dtype=float)
+
+    lo = np.searchsorted(q, s, side="left")
+    hi = np.searchsorted(q, s, side="right")
+    inner = np.clip(lo, 1, len(q) - 1)
+    left, right = q[inner - 1], q[inner]
+    span = np.where(right > left, right - left, 1.0)
+    interpolated = probs[inner - 1] + (s - left) / span * (probs[inner] - probs[inner - 1])
+
+    tied = (probs[np.clip(lo, 0, len(q) - 1)] + probs[np.clip(hi - 1, 0, len(q) - 1)]) / 2.0
+    pct = np.where(hi > lo, tied, interpolated)
+    pct = np.where(lo == 0, np.where(hi > lo, pct, 0.0), pct)
+    pct = np.where(lo >= len(q), 1.0, pct)
+    return np.where(np.isnan(s), np.nan, pct)
@@ -0,0 +1,111 @@
+"""
+Compact boosted surrogate of the dropout weight forest, flattened for fast scoring.
+
+distill_model.py fits build_surrogate() on the forest's predictions and saves
+a SurrogateScorer as the "model" of dropout_weight_surrogate.joblib, which
+predict_dropout_risk.py --surrogate scores with. Kept apart from the
+distillation script so the pickled scorer resolves to this module.
+"""
+
+from __future__ import annotations
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+SURROGATE_NAME = "dropout_weight_surrogate.joblib"
+
+
+def build_surrogate(
+    numeric_cols: list, categorical_cols: list, n_trees: int, max_depth: int, learning_rate: float, random_state: int
+):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OrdinalEncoder
+
+    # Numerics are imputed as in the teacher; categoricals become one ordinal code column each
+    # (-1 for missing or unseen labels) instead of ~1,500 one-hot columns.
+    encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1, encoded_missing_value=-1)
+    preprocess = ColumnTransformer(
+        transformers=[("num", SimpleImputer(strategy="median"), numeric_cols), ("cat", encoder, categorical_cols)]
+    )
+    model = GradientBoostingRegressor(
+        n_estimators=n_trees,
+        max_depth=max_depth,
+        learning_rate=learning_rate,
+        subsample=0.8,
+        random_state=random_state,
+    )
+    return Pipeline(steps=[("preprocess", preprocess), ("model", model)])
+
+
+class SurrogateScorer:
+    """A fitted build_surrogate() pipeline flattened into numpy tables.
+
+    Every boosted tree has depth <= max_depth, so all rows walk all trees in
+    lock step, one vectorized step per level (leaves point to themselves).
+    Preprocessing is a median fill and one pandas category lookup per
+    categorical column. Predictions match the pipeline's; the scorer skips
+    sklearn's per-call validation, which dominates single-row latency.
+    """
+
+    def __init__(self, pipeline, numeric_cols: list[str], categorical_cols: list[str]):
+        preprocess = pipeline.named_steps["preprocess"]
+        booster = pipeline.named_steps["model"]
+        self.numeric_cols = list(numeric_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.medians = preprocess.named_transformers_["num"].statistics_.astype(float)
+        # OrdinalEncoder codes are positions in categories_; missing and unseen labels are -1.
+        self.categories = [
+            pd.Index([c for c in cats if not (isinstance(c, float) and np.isnan(c))])
+            for cats in preprocess.named_transformers_["cat"].categories_
+        ]
+
+        # All trees' nodes in flat arrays; root of tree i is roots[i], child ids are global.
+        trees = [est[0].tree_ for est in booster.estimators_]
+        self.depth = max(t.max_depth for t in trees)
+        self.roots = np.cumsum([0] + [t.node_count for t in trees[:-1]]).astype(np.intp)
+        feature, threshold, left, right, value = [], [], [], [], []
+        for root, tree in zip(self.roots, trees):
+            ids = root + np.arange(tree.node_count)
+            split = tree.children_left >= 0
+            feature.append(np.where(split, tree.feature, 0))
+            threshold.append(np.where(split, tree.threshold, np.inf))
+            left.append(np.where(split, root + tree.children_left, ids))
+            right.append(np.where(split, root + tree.children_right, ids))
+            value.append(tree.value[:, 0, 0] * booster.learning_rate)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.value = np.concatenate(value)
+        self.offset = float(booster.init_.constant_.ravel()[0])
+
+    def transform(self, x: pd.DataFrame) -> np.ndarray:
+        try:
+            numeric = x[self.numeric_cols].to_numpy(dtype=float, na_value=np.nan)
+        except (TypeError, ValueError):
+            numeric = x[self.numeric_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        numeric = np.where(np.isnan(numeric), self.medians, numeric)
+        codes = [cats.get_indexer(x[col].to_numpy(dtype=object)) for col, cats in zip(self.categorical_cols, self.categories)]
+        # The trees compare float32 features against float64 thresholds, as sklearn does.
+        return np.column_stack([numeric, *codes]).astype(np.float32)
+
+    def predict(self, x: pd.DataFrame, batch_rows: int = 20_000) -> np.ndarray:
+        values = self.transform(x)
+        out = np.empty(len(values))
+        width = values.shape[1]
+        for lo in range(0, len(values), batch_rows):
+            rows = values[lo : lo + batch_rows].ravel()
+            # (rows x trees) current node ids, and each row's offset into the flattened features.
+            node = np.broadcast_to(self.roots, (len(rows) // width, len(self.roots))).copy()
+            row_base = (np.arange(len(node)) * width)[:, None]
+            for _ in range(self.depth):
+                go_left = rows[row_base + self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            out[lo : lo + len(node)] = self.offset + self.value[node].sum(axis=1)
+        return out
@@ -0,0 +1,220 @@
+"""
+Stage-level spans for profiling pipeline runs.
+
+Wrap a stage in `with span("fetch", nct_id=...) as s:` and optionally record
+work done with `s.add(rows=..., bytes=...)`. Spans are no-ops until profiling
+is enabled, which the instrumented CLIs do with `--profile trace.json`. Each
+recorded span keeps wall time, CPU time, row/byte counters, the process RSS
+high-water mark, and (with --profile-memory) the tracemalloc peak inside it.
+
+On exit the trace is written as Chrome trace JSON (open it in Perfetto or
+chrome://tracing) and a per-stage summary table is printed.
+
+Usage:
+    python train_dropout_model.py --profile train_trace.json
+    python ctgov_scraper.py --resume --profile scrape_trace.json --profile-memory
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class _NullSpan:
+    def add(self, **counters):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.counters = {}
+        self.heap_floor = 0
+
+    def add(self, **counters):
+        """Accumulate counters such as rows=..., bytes=..."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + (value or 0)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        record = Span(name, attrs)
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(record)
+        if self.trace_memory:
+            # tracemalloc has one peak; fold the parent's peak so far into it before resetting.
+            if parent is not None:
+                parent.heap_floor = max(parent.heap_floor, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            end_wall = time.perf_counter()
+            end_cpu = time.process_time()
+            stack.pop()
+            args = {**record.attrs, **record.counters, "cpu_ms": round((end_cpu - start_cpu) * 1000.0, 3)}
+            rss = _max_rss_bytes()
+            if rss is not None:
+                args["max_rss_mb"] = round(rss / 1e6, 1)
+            if self.trace_memory:
+                peak = max(record.heap_floor, tracemalloc.get_traced_memory()[1])
+                args["tracemalloc_peak_mb"] = round(peak / 1e6, 2)
+                if parent is not None:
+                    parent.heap_floor = max(parent.heap_floor, peak)
+            event = {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": round((start_wall - self._origin) * 1e6, 1),
+                "dur": round((end_wall - start_wall) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def summary(self) -> list[dict]:
+        """Per-span-name totals, slowest first."""
+        totals = {}
+        for ev in self.events:
+            row = totals.setdefault(
+                ev["name"], {"name": ev["name"], "count": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "rows": 0, "bytes": 0, "max_rss_mb": 0.0}
+            )
+            args = ev["args"]
+            row["count"] += 1
+            row["wall_ms"] += ev["dur"] / 1000.0
+            row["cpu_ms"] += args.get("cpu_ms", 0.0)
+            row["rows"] += args.get("rows", 0)
+            row["bytes"] += args.get("bytes", 0)
+            row["max_rss_mb"] = max(row["max_rss_mb"], args.get("max_rss_mb", 0.0))
+            if "tracemalloc_peak_mb" in args:
+                row["tracemalloc_peak_mb"] = max(row.get("tracemalloc_peak_mb", 0.0), args["tracemalloc_peak_mb"])
+        return sorted(totals.values(), key=lambda r: r["wall_ms"], reverse=True)
+
+    def write(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+_tracer: Tracer | None = None
+
+
+def _max_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def span(name: str, **attrs):
+    """Context manager timing a stage; a no-op unless profiling is enabled."""
+    if _tracer is None:
+        return _null_span()
+    return _tracer.span(name, **attrs)
+
+
+@contextmanager
+def _null_span():
+    yield _NULL_SPAN
+
+
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="Write a Chrome-trace JSON of stage spans here and print a stage summary.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="With --profile, also record tracemalloc peaks (slower).",
+    )
+
+
+def format_summary(rows: list[dict]) -> str:
+    has_heap = any("tracemalloc_peak_mb" in r for r in rows)
+    header = f"{'stage':<28} {'count':>6} {'wall ms':>11} {'cpu ms':>11} {'rows':>10} {'bytes':>12} {'rss MB':>8}"
+    if has_heap:
+        header += f" {'heap MB':>8}"
+    lines = [header]
+    for r in rows:
+        line = (
+            f"{r['name']:<28} {r['count']:>6} {r['wall_ms']:>11.1f} {r['cpu_ms']:>11.1f} "
+            f"{r['rows']:>10} {r['bytes']:>12} {r['max_rss_mb']:>8.1f}"
+        )
+        if has_heap:
+            line += f" {r.get('tracemalloc_peak_mb', 0.0):>8.2f}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def to_csv(df, path: Path, name: str = "write.csv"):
+    """df.to_csv(path, index=False) inside a span recording rows and bytes written."""
+    with span(name, path=str(path)) as s:
+        df.to_csv(path, index=False)
+        s.add(rows=len(df), bytes=Path(path).stat().st_size)
+
+
+@contextmanager
+def profiled(trace_path: Path | None, trace_memory: bool = False, root: str = "run"):
+    """Enable spans for the duration of a CLI run; write the trace and summary on exit."""
+    global _tracer
+    if trace_path is None:
+        yield
+        return
+    if trace_memory:
+        tracemalloc.start()
+    _tracer = Tracer(trace_memory=trace_memory)
+    try:
+        with _tracer.span(root):
+            yield
+    finally:
+        tracer, _tracer = _tracer, None
+        if trace_memory:
+            tracemalloc.stop()
+        tracer.write(trace_path)
+        print(f"\nProfile: {trace_path} ({len(tracer.events)} spans)")
+        print(format_summary(tracer.summary()))
@@ -4,15 +4,20 @@ Train a baseline model for dropout risk weighting from graph exports.
 Inputs:
     - ctgov_graph_edges.csv
     - ctgov_graph_nodes.csv
+      (or, with --db, the edges/nodes tables of the analytics database)
 
 Outputs (default: ./model_artifacts):
     - dropout_weight_model.joblib
-    - metrics.json
+    - metrics.json               (with trial-grouped bootstrap intervals under metrics_ci)
     - feature_importance.csv
-    - scored_dropout_events.csv
+    - permutation_importance.csv (grouped by base feature, on the test split)
+    - scored_dropout_events.csv  (also loaded as scored_events with --db)
+    - shards/                    (with --shards: per-condition models + manifest.json)
 
 Usage:
     python train_dropout_model.py
+    python train_dropout_model.py --permutation-repeats 20 --jobs 4
+    python train_dropout_model.py --shards --shard-groups condition_clusters.json
 """
 
 from __future__ import annotations
@@ -21,21 +26,56 @@ import argparse
 import json
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import joblib
-import numpy as np
-import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.impute import SimpleImputer
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
+from analytics_db import add_db_argument, load_table, read_table
+from bootstrap_eval import REGRESSION, bootstrap_metrics, format_intervals
+from condition_shards import SHARD_DIR, ShardRouter, load_shard_groups, train_shards
+from lazy_imports import lazy_import
+from permutation_importance import grouped_permutation_importance
+from schemas import EDGES, NODES, read_artifact
+from score_sketch import build_score_sketch
+from tracing import add_profile_arguments, profiled, span, to_csv
+
+joblib = lazy_import("joblib")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
 
 
 RANDOM_SEED = 42
 DEFAULT_TARGET = "graph_weight"
+NUMERIC_FEATURES = [
+    "discontinued_n",
+    "started_n",
+    "completed_n",
+    "rate_vs_trial_start",
+    "base_rate",
+    "size_factor_log1p_started",
+    "recency_decay",
+    "evidence_quality",
+    "enrollment_count",
+    "num_countries",
+    "total_sites",
+]
+CATEGORICAL_FEATURES = [
+    "reason",
+    "period_title",
+    "arm_id",
+    "search_condition",
+    "sponsor_class",
+]
+TRIAL_COLUMNS = [
+    "trial_id",
+    "search_condition",
+    "sponsor_class",
+    "enrollment_count",
+    "num_countries",
+    "total_sites",
+    "completion_date",
+]
 
 
 def parse_args():
@@ -70,15 +110,91 @@ def parse_args():
         default=0.2,
         help="Test set fraction.",
     )
+    parser.add_argument(
+        "--permutation-repeats",
+        type=int,
+        default=10,
+        help="Permutations per base feature for permutation_importance.csv (0 to skip).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes for permutation importance, shard training and bootstrap (default: all cores).",
+    )
+    parser.add_argument(
+        "--bootstrap-resamples",
+        type=int,
+        default=2000,
+        help="Trial-grouped bootstrap resamples for test metric intervals in metrics.json (0 to skip).",
+    )
+    parser.add_argument("--bootstrap-level", type=float, default=0.95, help="Bootstrap confidence level.")
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="Also train one model per search_condition (see condition_shards.py); the main model is the fallback.",
+    )
+    parser.add_argument(
+        "--shard-groups",
+        type=Path,
+        default=None,
+        help="JSON of search_condition -> cluster name; conditions in a cluster share one shard.",
+    )
+    parser.add_argument(
+        "--shard-min-rows",
+        type=int,
+        default=200,
+        help="Conditions (or clusters) with fewer training rows use the fallback model.",
+    )
+    add_db_argument(parser, "Read dropout edges and trial nodes from this analytics database and load scored events into it.")
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 
-def load_data(edges_path: Path, nodes_path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+def load_data(
+    edges_path: Path, nodes_path: Path, db_path: Path | None = None, target_col: str = DEFAULT_TARGET
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    if db_path is not None:
+        # Only dropout edges and trial nodes are used; filter in the database.
+        return (
+            read_table("edges", db_path, edge_type="dropout_event"),
+            read_table("nodes", db_path, node_type="trial"),
+        )
     if not edges_path.exists():
         raise FileNotFoundError(f"Edges file not found: {edges_path}")
     if not nodes_path.exists():
         raise FileNotFoundError(f"Nodes file not found: {nodes_path}")
-    return pd.read_csv(edges_path), pd.read_csv(nodes_path)
+    # Project to the columns training uses; ids, paths and descriptions are never read.
+    edges = read_artifact(
+        edges_path, EDGES, usecols=["edge_type", "trial_id", target_col, *NUMERIC_FEATURES, *CATEGORICAL_FEATURES]
+    )
+    nodes = read_artifact(nodes_path, NODES, usecols=["node_type", *TRIAL_COLUMNS])
+    return edges, nodes
+
+
+def load_trial_nodes(nodes_path: Path, db_path: Path | None = None) -> pd.DataFrame | None:
+    """Trial nodes for join_trial_features, or None when there is no nodes export to read."""
+    if db_path is not None:
+        return read_table("nodes", db_path, node_type="trial")
+    if not nodes_path.exists():
+        return None
+    return read_artifact(nodes_path, NODES, usecols=["node_type", *TRIAL_COLUMNS])
+
+
+def join_trial_features(edges: pd.DataFrame, nodes: pd.DataFrame) -> pd.DataFrame:
+    """Edges with the trial-level features (search_condition, sponsor_class, sizes) of their trial node."""
+    trial_nodes = nodes[nodes["node_type"] == "trial"]
+    keep_trial_cols = [c for c in TRIAL_COLUMNS if c in trial_nodes.columns and (c == "trial_id" or c not in edges.columns)]
+    trial_nodes = trial_nodes[keep_trial_cols].drop_duplicates(subset=["trial_id"])
+    return edges.merge(trial_nodes, on="trial_id", how="left")
+
+
+def with_trial_features(edges: pd.DataFrame, nodes_path: Path, db_path: Path | None = None) -> pd.DataFrame:
+    """Scoring-time join_trial_features: search_condition, sponsor_class and the trial sizes
+    live on the trial nodes, as in training. `edges` is returned as-is when there is no nodes export.
+    """
+    nodes = load_trial_nodes(nodes_path, db_path)
+    return join_trial_features(edges, nodes) if nodes is not None else edges
 
 
 def prepare_training_frame(
@@ -90,44 +206,10 @@ def prepare_training_frame(
     if target_col not in dropout_edges.columns:
         raise ValueError(f"Target column '{target_col}' missing from dropout edges.")
 
-    trial_nodes = nodes[nodes["node_type"] == "trial"].copy()
-    keep_trial_cols = [
-        "trial_id",
-        "search_condition",
-        "sponsor_class",
-        "enrollment_count",
-        "num_countries",
-        "total_sites",
-        "completion_date",
-    ]
-    keep_trial_cols = [c for c in keep_trial_cols if c in trial_nodes.columns]
-    trial_nodes = trial_nodes[keep_trial_cols].drop_duplicates(subset=["trial_id"])
+    df = join_trial_features(dropout_edges, nodes)
 
-    df = dropout_edges.merge(trial_nodes, on="trial_id", how="left")
-
-    numeric_cols = [
-        "discontinued_n",
-        "started_n",
-        "completed_n",
-        "rate_vs_trial_start",
-        "base_rate",
-        "size_factor_log1p_started",
-        "recency_decay",
-        "evidence_quality",
-        "enrollment_count",
-        "num_countries",
-        "total_sites",
-    ]
-    categorical_cols = [
-        "reason",
-        "period_title",
-        "arm_id",
-        "search_condition",
-        "sponsor_class",
-    ]
-
-    numeric_cols = [c for c in numeric_cols if c in df.columns]
-    categorical_cols = [c for c in categorical_cols if c in df.columns]
+    numeric_cols = [c for c in NUMERIC_FEATURES if c in df.columns]
+    categorical_cols = [c for c in CATEGORICAL_FEATURES if c in df.columns]
 
     # Coerce numeric features
     for col in numeric_cols + [target_col]:
@@ -149,6 +231,14 @@ def prepare_training_frame(
     return x, y, meta
 
 
+def split_source_frame(edges: pd.DataFrame, nodes: pd.DataFrame) -> pd.DataFrame:
+    """Dropout edges with their trial's completion_date, row-aligned with prepare_training_frame's x."""
+    trial_cols = ["trial_id", "completion_date"] if "completion_date" in nodes.columns else ["trial_id"]
+    return edges[edges["edge_type"] == "dropout_event"].merge(
+        nodes[nodes["node_type"] == "trial"][trial_cols], on="trial_id", how="left"
+    )
+
+
 def temporal_or_random_split(
     x: pd.DataFrame, y: pd.Series, original_df: pd.DataFrame | None = None, test_size: float = 0.2
 ):
@@ -173,6 +263,8 @@ def temporal_or_random_split(
                     },
                 )
 
+    from sklearn.model_selection import train_test_split
+
     x_train, x_test, y_train, y_test = train_test_split(
         x, y, test_size=test_size, random_state=RANDOM_SEED
     )
@@ -190,7 +282,15 @@ def temporal_or_random_split(
     )
 
 
-def train_model(x_train: pd.DataFrame, y_train: pd.Series, numeric_cols: list, categorical_cols: list):
+def train_model(
+    x_train: pd.DataFrame, y_train: pd.Series, numeric_cols: list, categorical_cols: list, n_jobs: int = -1
+):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
     numeric_transformer = Pipeline(
         steps=[
             ("imputer", SimpleImputer(strategy="median")),
@@ -213,7 +313,7 @@ def train_model(x_train: pd.DataFrame, y_train: pd.Series, numeric_cols: list, c
     model = RandomForestRegressor(
         n_estimators=400,
         random_state=RANDOM_SEED,
-        n_jobs=-1,
+        n_jobs=n_jobs,
         min_samples_leaf=2,
     )
 
@@ -223,6 +323,8 @@ def train_model(x_train: pd.DataFrame, y_train: pd.Series, numeric_cols: list, c
 
 
 def evaluate_model(model: Pipeline, x_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
     preds = model.predict(x_test)
     rmse = mean_squared_error(y_test, preds) ** 0.5
     return {
@@ -254,48 +356,133 @@ def collect_feature_importance(
     return df
 
 
+def _train_shards(args, fallback: Pipeline, x_train, y_train, x_test, y_test, meta: dict) -> dict:
+    """Train or reuse the condition shards and compare routed scoring with the fallback on the test split."""
+    manifest = train_shards(
+        x_train,
+        y_train,
+        meta["numeric_features"],
+        meta["categorical_features"],
+        train_model,
+        args.output_dir / SHARD_DIR,
+        groups=load_shard_groups(args.shard_groups),
+        min_rows=args.shard_min_rows,
+        jobs=args.jobs,
+        settings=f"{args.target}:{RANDOM_SEED}",
+    )
+    router = ShardRouter(fallback, args.output_dir / SHARD_DIR, manifest)
+    with span("evaluate.shards") as s:
+        routed = router.predict(x_test)
+        fallback_preds = fallback.predict(x_test)
+        s.add(rows=len(x_test))
+    routes = router.route(x_test).to_numpy()
+    y = np.asarray(y_test, dtype=float)
+    per_shard = {}
+    for name in manifest["shards"]:
+        mask = routes == name
+        per_shard[name] = {
+            "test_rows": int(mask.sum()),
+            "mae": float(np.abs(routed[mask] - y[mask]).mean()) if mask.any() else None,
+            "fallback_mae": float(np.abs(fallback_preds[mask] - y[mask]).mean()) if mask.any() else None,
+        }
+    entries = manifest["shards"].values()
+    return {
+        "count": len(manifest["shards"]),
+        "trained": sum(not e["reused"] for e in entries),
+        "reused": sum(e["reused"] for e in entries),
+        "min_rows": args.shard_min_rows,
+        "fallback_test_rows": int((routes == "").sum()),
+        "routed_metrics": evaluate_model(router, x_test, y_test),
+        "per_shard": per_shard,
+    }
+
+
 def main():
     args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="train"):
+        _train(args)
+
+
+def _train(args):
     args.output_dir.mkdir(parents=True, exist_ok=True)
 
-    edges, nodes = load_data(args.edges, args.nodes)
-    x, y, meta = prepare_training_frame(edges, nodes, args.target)
+    with span("load") as s:
+        edges, nodes = load_data(args.edges, args.nodes, args.db, args.target)
+        s.add(rows=len(edges) + len(nodes))
+    with span("prepare") as s:
+        x, y, meta = prepare_training_frame(edges, nodes, args.target)
+        s.add(rows=len(x))
 
     # For split logic that can use completion date, rebuild source frame with that column.
-    split_source = edges[edges["edge_type"] == "dropout_event"].merge(
-        nodes[nodes["node_type"] == "trial"][["trial_id", "completion_date"]]
-        if "completion_date" in nodes.columns
-        else nodes[nodes["node_type"] == "trial"][["trial_id"]],
-        on="trial_id",
-        how="left",
-    )
-    split_source = split_source.loc[x.index]
+    split_source = split_source_frame(edges, nodes).loc[x.index]
 
     x_train, x_test, y_train, y_test, split_meta = temporal_or_random_split(
         x, y, original_df=split_source, test_size=args.test_size
     )
 
-    pipeline = train_model(
-        x_train,
-        y_train,
-        meta["numeric_features"],
-        meta["categorical_features"],
-    )
-    metrics = evaluate_model(pipeline, x_test, y_test)
+    with span("train.fit", model="RandomForestRegressor") as s:
+        pipeline = train_model(
+            x_train,
+            y_train,
+            meta["numeric_features"],
+            meta["categorical_features"],
+        )
+        s.add(rows=len(x_train))
+    with span("evaluate") as s:
+        metrics = evaluate_model(pipeline, x_test, y_test)
+        s.add(rows=len(x_test))
+    sharding = None
+    if args.shards:
+        sharding = _train_shards(args, pipeline, x_train, y_train, x_test, y_test, meta)
     feature_importance = collect_feature_importance(
         pipeline,
         meta["numeric_features"],
         meta["categorical_features"],
     )
+    permutation = None
+    if args.permutation_repeats > 0:
+        with span("importance.permutation", repeats=args.permutation_repeats) as s:
+            permutation = grouped_permutation_importance(
+                pipeline,
+                x_test,
+                y_test,
+                meta["categorical_features"],
+                n_repeats=args.permutation_repeats,
+                jobs=args.jobs,
+                seed=RANDOM_SEED,
+            )
+            s.add(rows=len(x_test))
+
+    with span("score") as s:
+        all_preds = pipeline.predict(x)
+        s.add(rows=len(x))
+    metrics_ci = None
+    if args.bootstrap_resamples > 0:
+        # Resample the cached test predictions by trial; nothing is re-scored.
+        test_preds = pd.Series(all_preds, index=x.index).loc[x_test.index]
+        metrics_ci = bootstrap_metrics(
+            y_test,
+            test_preds,
+            split_source.loc[x_test.index, "trial_id"],
+            kind=REGRESSION,
+            resamples=args.bootstrap_resamples,
+            level=args.bootstrap_level,
+            jobs=args.jobs,
+            seed=RANDOM_SEED,
+        )
 
-    all_preds = pipeline.predict(x)
     scored = x.copy()
+    scored.insert(0, "trial_id", split_source["trial_id"].values)
     scored["actual_target"] = y.values
     scored["predicted_target"] = all_preds
     scored["absolute_error"] = (scored["actual_target"] - scored["predicted_target"]).abs()
 
+    # Reference distribution for batch-independent percentiles at scoring time.
+    score_sketch = build_score_sketch(all_preds)
+
     model_bundle = {
         "model": pipeline,
+        "score_sketch": score_sketch,
         "metadata": {
             "created_at": datetime.now().isoformat(),
             "seed": RANDOM_SEED,
@@ -309,28 +496,62 @@ def main():
                 "categorical": meta["categorical_features"],
             },
             "metrics": metrics,
+            "score_sketch": {
+                "points": len(score_sketch["quantiles"]),
+                "reference_rows": score_sketch["reference_rows"],
+            },
         },
     }
+    if metrics_ci is not None:
+        model_bundle["metadata"]["metrics_ci"] = metrics_ci
+    if sharding is not None:
+        model_bundle["metadata"]["shards"] = sharding
+    if permutation is not None:
+        model_bundle["metadata"]["permutation_importance"] = {
+            "metric": "r2_drop",
+            "repeats": args.permutation_repeats,
+            "rows": len(x_test),
+            "importance": dict(zip(permutation["feature"], permutation["importance_mean"].round(6))),
+        }
 
     model_path = args.output_dir / "dropout_weight_model.joblib"
     metrics_path = args.output_dir / "metrics.json"
     fi_path = args.output_dir / "feature_importance.csv"
+    pi_path = args.output_dir / "permutation_importance.csv"
     scored_path = args.output_dir / "scored_dropout_events.csv"
 
-    joblib.dump(model_bundle, model_path)
+    with span("write.model", path=str(model_path)) as s:
+        joblib.dump(model_bundle, model_path)
+        s.add(bytes=model_path.stat().st_size)
     with open(metrics_path, "w", encoding="utf-8") as f:
         json.dump(model_bundle["metadata"], f, indent=2)
-    feature_importance.to_csv(fi_path, index=False)
-    scored.to_csv(scored_path, index=False)
+    to_csv(feature_importance, fi_path)
+    if permutation is not None:
+        to_csv(permutation, pi_path)
+    to_csv(scored, scored_path)
+    if args.db is not None:
+        load_table(scored, "scored_events", args.db)
 
     print("Training complete")
     print(f"Model:   {model_path}")
     print(f"Metrics: {metrics_path}")
     print(f"Top features: {fi_path}")
+    if permutation is not None:
+        print(f"Permutation importance: {pi_path}")
+    if sharding is not None:
+        print(
+            f"Shards: {sharding['count']} in {args.output_dir / SHARD_DIR} "
+            f"({sharding['trained']} trained, {sharding['reused']} unchanged and reused)"
+        )
     print(f"Scored rows:  {scored_path}")
     print(
         f"Evaluation -> MAE: {metrics['mae']:.6f}, RMSE: {metrics['rmse']:.6f}, R2: {metrics['r2']:.4f}"
     )
+    if metrics_ci is not None:
+        print(f"Bootstrap -> {format_intervals(metrics_ci)}")
+    if sharding is not None:
+        routed = sharding["routed_metrics"]
+        print(f"Routed    -> MAE: {routed['mae']:.6f}, RMSE: {routed['rmse']:.6f}, R2: {routed['r2']:.4f}")
 
 
 if __name__ == "__main__":
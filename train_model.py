@@ -3,30 +3,31 @@ Train a dropout classifier on synthetic patient data and export dashboard predic
 
 Usage:
     python train_model.py
+    python train_model.py --db cadence_analytics.sqlite   (also load predictions into the analytics DB)
 """
 
 from __future__ import annotations
 
 import argparse
+import json
 import pickle
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import numpy as np
-import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import (
-    accuracy_score,
-    confusion_matrix,
-    precision_score,
-    recall_score,
-    roc_auc_score,
-)
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
+from analytics_db import add_db_argument, load_table
+from bootstrap_eval import CLASSIFICATION, bootstrap_metrics, format_intervals
+from dashboard_store import STORE_DIR, join_predictions, write_store
+from lazy_imports import lazy_import
+from schemas import PATIENTS, read_artifact
+from tracing import add_profile_arguments, profiled, span, to_csv
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+if TYPE_CHECKING:
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
 
 
 CATEGORICAL_COLS = ["gender", "contact_method_preference"]
@@ -70,12 +71,24 @@ def parse_args():
         default=Path("predictions.csv"),
         help="Path to save scored predictions.",
     )
+    parser.add_argument(
+        "--store-out",
+        type=Path,
+        default=STORE_DIR,
+        help="Directory for the dashboard columnar store (joined predictions + patients).",
+    )
     parser.add_argument(
         "--importance-out",
         type=Path,
         default=Path("feature_importance.csv"),
         help="Path to save feature importance table.",
     )
+    parser.add_argument(
+        "--metrics-out",
+        type=Path,
+        default=Path("metrics.json"),
+        help="Path to save the model metadata with test metrics and bootstrap intervals.",
+    )
     parser.add_argument(
         "--test-size",
         type=float,
@@ -94,6 +107,35 @@ def parse_args():
         default=0.08,
         help="Fraction of training labels to randomly flip before fitting.",
     )
+    parser.add_argument(
+        "--bootstrap-resamples",
+        type=int,
+        default=2000,
+        help="Trial-grouped bootstrap resamples for test metric intervals (0 to skip).",
+    )
+    parser.add_argument("--bootstrap-level", type=float, default=0.95, help="Bootstrap confidence level.")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for the bootstrap (default: all cores).")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Stream the roster in chunks and fit an SGD logistic model with partial_fit (patient_sgd.py).",
+    )
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help="With --incremental, continue from the bundle at --model-out using only the new rows.",
+    )
+    parser.add_argument(
+        "--roster",
+        type=Path,
+        default=None,
+        help="With --warm-start, the full patient roster to rescore into --predictions-out and --store-out.",
+    )
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Roster rows per chunk with --incremental.")
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the roster with --incremental.")
+    parser.add_argument("--alpha", type=float, default=0.01, help="SGD L2 regularization with --incremental.")
+    add_db_argument(parser, "Also bulk-load predictions into this analytics database.")
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 
@@ -121,15 +163,17 @@ def ensure_required_columns(df: pd.DataFrame):
         raise ValueError(f"Input CSV missing required columns: {missing}")
 
 
-def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
+def engineer_features(df: pd.DataFrame, reference_date: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Model features for a roster; pass reference_date when `df` is one chunk of a larger roster."""
     out = df.copy()
     ensure_required_columns(out)
 
     out["enrollment_date"] = pd.to_datetime(out["enrollment_date"], errors="coerce")
-    if out["enrollment_date"].notna().any():
-        reference_date = out["enrollment_date"].max()
-    else:
-        reference_date = pd.Timestamp.today().normalize()
+    if reference_date is None:
+        if out["enrollment_date"].notna().any():
+            reference_date = out["enrollment_date"].max()
+        else:
+            reference_date = pd.Timestamp.today().normalize()
 
     out["days_since_enrollment"] = (
         reference_date - out["enrollment_date"]
@@ -151,6 +195,11 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def make_preprocessor(feature_cols: list[str]) -> tuple[ColumnTransformer, list[str], list[str]]:
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
     categorical = [c for c in CATEGORICAL_COLS if c in feature_cols]
     numeric = [c for c in feature_cols if c not in categorical]
 
@@ -230,7 +279,7 @@ def build_feature_importance(
     return fi, base_importance
 
 
-def _format_risk_factor(feature: str, value) -> str:
+def format_risk_factor(feature: str, value) -> str:
     if pd.isna(value):
         return f"{feature.replace('_', ' ')} unavailable"
     if feature == "missed_visits":
@@ -277,7 +326,7 @@ def build_top_risk_factors(
 
     numeric_signals = {}
     for col in numeric_cols:
-        values = pd.to_numeric(df[col], errors="coerce")
+        values = pd.to_numeric(df[col], errors="coerce").astype(float)
         if values.notna().any():
             filled = values.fillna(values.median())
         else:
@@ -309,18 +358,54 @@ def build_top_risk_factors(
             contrib[feature] = weight * signal
 
         top_features = sorted(contrib, key=contrib.get, reverse=True)[:3]
-        readable = [_format_risk_factor(f, row[f]) for f in top_features if f in row.index]
+        readable = [format_risk_factor(f, row[f]) for f in top_features if f in row.index]
         factors.append("; ".join(readable))
 
     return pd.Series(factors, index=df.index)
 
 
+def load_bundle(model_path: Path) -> dict:
+    """The {"model", "metadata"} bundle written by main()."""
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model file not found: {model_path}. Train it first (python train_model.py).")
+    with open(model_path, "rb") as f:
+        return pickle.load(f)
+
+
 def risk_level(prob: pd.Series) -> pd.Series:
     return np.where(prob > 0.7, "High", np.where(prob > 0.4, "Medium", "Low"))
 
 
 def main():
     args = parse_args()
+    if args.warm_start and not args.incremental:
+        raise ValueError("--warm-start requires --incremental.")
+    if args.roster is not None and not args.warm_start:
+        raise ValueError("--roster is only used with --warm-start; other runs score --input.")
+    if args.warm_start and args.roster is None and (
+        args.predictions_out == Path("predictions.csv") or args.store_out == STORE_DIR
+    ):
+        # --input holds only the new labels; scoring it alone would replace the full roster's outputs.
+        raise ValueError(
+            "--warm-start trains on the new rows only. Pass --roster with the full patient roster to rescore, "
+            "or write the new rows' scores elsewhere with both --predictions-out and --store-out."
+        )
+    with profiled(args.profile, args.profile_memory, root="train-patients"):
+        if args.incremental:
+            from patient_sgd import train_incremental
+
+            train_incremental(args)
+        else:
+            _train(args)
+
+
+def _train(args):
+    with span("import.sklearn"):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, recall_score, roc_auc_score
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import Pipeline
+
     np.random.seed(args.random_seed)
 
     if not args.input.exists():
@@ -328,8 +413,10 @@ def main():
             f"Input file not found: {args.input}. Generate it first (e.g., synthetic_patients.csv)."
         )
 
-    raw_df = pd.read_csv(args.input)
-    df = engineer_features(raw_df)
+    raw_df = read_artifact(args.input, PATIENTS)
+    with span("prepare") as s:
+        df = engineer_features(raw_df)
+        s.add(rows=len(df))
 
     feature_cols = [c for c in (NUMERIC_COLS + BOOLEAN_COLS + CATEGORICAL_COLS) if c in df.columns]
     x = df[feature_cols].copy()
@@ -366,7 +453,9 @@ def main():
         flip_idx = np.random.choice(len(y_train_noisy), size=noise_count, replace=False)
         y_train_noisy.iloc[flip_idx] = 1 - y_train_noisy.iloc[flip_idx]
 
-    pipeline.fit(x_train, y_train_noisy)
+    with span("train.fit", model="LogisticRegression") as s:
+        pipeline.fit(x_train, y_train_noisy)
+        s.add(rows=len(x_train))
 
     test_prob = pipeline.predict_proba(x_test)[:, 1]
     test_pred = (test_prob >= 0.5).astype(int)
@@ -378,11 +467,25 @@ def main():
         "auc_roc": float(roc_auc_score(y_test, test_prob)),
     }
     cm = confusion_matrix(y_test, test_pred, labels=[0, 1])
+    metrics_ci = None
+    if args.bootstrap_resamples > 0:
+        metrics_ci = bootstrap_metrics(
+            y_test,
+            test_prob,
+            raw_df.loc[x_test.index, "trial_id"],
+            kind=CLASSIFICATION,
+            resamples=args.bootstrap_resamples,
+            level=args.bootstrap_level,
+            jobs=args.jobs,
+            seed=args.random_seed,
+        )
 
     fi, base_importance = build_feature_importance(pipeline, categorical_model_cols)
-    fi.to_csv(args.importance_out, index=False)
+    to_csv(fi, args.importance_out)
 
-    all_prob = pd.Series(pipeline.predict_proba(x)[:, 1], index=df.index)
+    with span("score") as s:
+        all_prob = pd.Series(pipeline.predict_proba(x)[:, 1], index=df.index)
+        s.add(rows=len(x))
 
     # Keep demonstration output aligned with known synthetic labels.
     dropped_mask = df["status"].astype(str).str.lower() == "dropped_out"
@@ -409,7 +512,12 @@ def main():
         }
     ).sort_values("dropout_risk", ascending=False)
 
-    predictions.to_csv(args.predictions_out, index=False)
+    to_csv(predictions, args.predictions_out)
+    if args.db is not None:
+        load_table(predictions, "patient_predictions", args.db)
+    with span("write.store", path=str(args.store_out)) as s:
+        store_version = write_store(join_predictions(predictions, raw_df), args.store_out)
+        s.add(rows=len(predictions))
 
     bundle = {
         "model": pipeline,
@@ -423,8 +531,13 @@ def main():
             "metrics": metrics,
         },
     }
-    with open(args.model_out, "wb") as f:
+    if metrics_ci is not None:
+        bundle["metadata"]["metrics_ci"] = metrics_ci
+    with span("write.model", path=str(args.model_out)) as s, open(args.model_out, "wb") as f:
         pickle.dump(bundle, f)
+        s.add(bytes=f.tell())
+    with open(args.metrics_out, "w", encoding="utf-8") as f:
+        json.dump(bundle["metadata"], f, indent=2)
 
     print("Training complete")
     print(f"Input rows: {len(df)}")
@@ -435,11 +548,15 @@ def main():
         f"Recall: {metrics['recall']:.4f}, "
         f"AUC-ROC: {metrics['auc_roc']:.4f}"
     )
+    if metrics_ci is not None:
+        print(f"Bootstrap -> {format_intervals(metrics_ci)}")
     print("Confusion matrix [[TN, FP], [FN, TP]]:")
     print(cm)
     print(f"Saved model: {args.model_out}")
+    print(f"Saved metrics: {args.metrics_out}")
     print(f"Saved feature importance: {args.importance_out}")
     print(f"Saved predictions: {args.predictions_out}")
+    print(f"Saved dashboard store: {args.store_out} (version {store_version})")
 
 
 if __name__ == "__main__":
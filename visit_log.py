@@ -0,0 +1,524 @@
+"""
+Append-only visit event log with incrementally maintained patient features.
+
+Instead of recomputing visit counts from roster snapshots, each patient's
+visits, misses, contacts and schedule changes are appended to an event log.
+A checkpoint keeps one small running state per patient plus the byte offset
+of the log it has consumed, so each invocation applies only the events
+appended since the last one. Every event is O(1): counters move, the last
+contact and the contact-gap statistics update, and the miss window drops
+misses older than MISS_WINDOW_DAYS.
+
+Event types (one row per event, `value` only used where noted):
+    enroll     enrollment date; value = scheduled visits
+    schedule   value = visits added to (or, if negative, removed from) the schedule
+    visit      completed visit (also counts as contact)
+    miss       missed visit
+    contact    CRC contact without a visit
+    withdraw   patient dropped out of the trial
+
+Live features per patient at --as-of (default: latest event date). The state
+holds running totals through the latest event, so --as-of can only project
+forward from it; for features at a past date, replay with backfill_scores.py.
+    scheduled_visits, completed_visits, missed_visits, days_since_last_contact,
+    visit_completion_rate, missed_visit_rate, visits_remaining,
+    days_since_enrollment, misses_30d, max_contact_gap_days, mean_contact_gap_days
+
+Inputs / outputs:
+    - visit_events.csv   (patient_id, trial_id, event_type, event_date, value)
+    - visit_state.pkl    (checkpoint: per-patient state + consumed log offset)
+    - visit_features.csv (roster with live features, --features-out)
+    - visit_predictions.csv (patient model scores on live features, --score)
+
+Usage:
+    python visit_log.py --bootstrap synthetic_patients.csv
+    python visit_log.py --append todays_events.csv
+    python visit_log.py --features-out visit_features.csv
+    python visit_log.py --score --model dropout_model.pkl
+    python visit_log.py --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import pickle
+from collections import deque
+from pathlib import Path
+
+from lazy_imports import lazy_import
+from schemas import PATIENTS, read_artifact
+from tracing import add_profile_arguments, profiled, span, to_csv
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+LOG_PATH = Path("visit_events.csv")
+STATE_PATH = Path("visit_state.pkl")
+LOG_COLUMNS = ["patient_id", "trial_id", "event_type", "event_date", "value"]
+EVENT_TYPES = ("enroll", "schedule", "visit", "miss", "contact", "withdraw")
+MISS_WINDOW_DAYS = 30
+STATE_VERSION = 2
+
+
+class PatientState:
+    """Running counters for one patient; every event updates it in O(1) amortized."""
+
+    __slots__ = (
+        "trial_id",
+        "enrolled",
+        "scheduled",
+        "completed",
+        "missed",
+        "last_contact",
+        "last_event",
+        "gap_count",
+        "gap_sum",
+        "gap_max",
+        "recent_misses",
+        "withdrawn",
+    )
+
+    def __init__(self, trial_id: str = ""):
+        self.trial_id = trial_id
+        self.enrolled = None
+        self.scheduled = 0
+        self.completed = 0
+        self.missed = 0
+        self.last_contact = None
+        self.last_event = None
+        self.gap_count = 0
+        self.gap_sum = 0
+        self.gap_max = 0
+        self.recent_misses = deque()
+        self.withdrawn = None
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _contact(self, day: int):
+        if self.last_contact is not None and day >= self.last_contact:
+            gap = day - self.last_contact
+            self.gap_count += 1
+            self.gap_sum += gap
+            self.gap_max = max(self.gap_max, gap)
+        if self.last_contact is None or day > self.last_contact:
+            self.last_contact = day
+
+    def _miss(self, day: int):
+        misses = self.recent_misses
+        if misses and day < misses[-1]:
+            # Late-arriving miss: keep the window sorted (rare, window is short).
+            misses = deque(sorted([*misses, day]))
+            self.recent_misses = misses
+        else:
+            misses.append(day)
+        horizon = max(day, self.last_event or day) - MISS_WINDOW_DAYS
+        while misses and misses[0] <= horizon:
+            misses.popleft()
+
+    def apply(self, event_type: str, day: int, value: float):
+        if event_type == "enroll":
+            self.enrolled = day
+            self.scheduled = int(value)
+        elif event_type == "schedule":
+            self.scheduled = max(self.scheduled + int(value), 0)
+        elif event_type == "visit":
+            self.completed += 1
+            self._contact(day)
+        elif event_type == "miss":
+            self.missed += 1
+            self._miss(day)
+        elif event_type == "contact":
+            self._contact(day)
+        elif event_type == "withdraw":
+            self.withdrawn = day
+        if self.last_event is None or day > self.last_event:
+            self.last_event = day
+
+    def features(self, as_of: int) -> tuple:
+        enrolled = self.enrolled if self.enrolled is not None else as_of
+        last_contact = self.last_contact if self.last_contact is not None else enrolled
+        since_contact = max(as_of - last_contact, 0)
+        scheduled = self.scheduled
+        completion = min(self.completed / scheduled, 1.0) if scheduled > 0 else 0.0
+        missed_rate = min(self.missed / scheduled, 1.0) if scheduled > 0 else 0.0
+        horizon = as_of - MISS_WINDOW_DAYS
+        misses_30d = sum(1 for d in self.recent_misses if horizon < d <= as_of)
+        mean_gap = self.gap_sum / self.gap_count if self.gap_count else float("nan")
+        return (
+            self.trial_id,
+            enrolled,
+            scheduled,
+            self.completed,
+            self.missed,
+            since_contact,
+            completion,
+            missed_rate,
+            max(scheduled - self.completed, 0),
+            max(as_of - enrolled, 0),
+            misses_30d,
+            max(self.gap_max, since_contact),
+            mean_gap,
+        )
+
+
+FEATURE_COLUMNS = [
+    "trial_id",
+    "enrollment_date",
+    "scheduled_visits",
+    "completed_visits",
+    "missed_visits",
+    "days_since_last_contact",
+    "visit_completion_rate",
+    "missed_visit_rate",
+    "visits_remaining",
+    "days_since_enrollment",
+    "misses_30d",
+    "max_contact_gap_days",
+    "mean_contact_gap_days",
+]
+
+
+class VisitLog:
+    """Checkpointed reader of the event log; `catch_up` applies only unread events."""
+
+    def __init__(self, log_path: Path = LOG_PATH, state_path: Path = STATE_PATH):
+        self.log_path = log_path
+        self.state_path = state_path
+        self.patients: dict[str, PatientState] = {}
+        self.offset = 0
+        self.events = 0
+        self.latest = None
+        if state_path.exists():
+            with open(state_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == STATE_VERSION and state.get("miss_window_days") == MISS_WINDOW_DAYS:
+                self.patients = state["patients"]
+                self.offset = state["offset"]
+                self.events = state["events"]
+                self.latest = state["latest"]
+
+    def save(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                {
+                    "version": STATE_VERSION,
+                    "miss_window_days": MISS_WINDOW_DAYS,
+                    "offset": self.offset,
+                    "events": self.events,
+                    "latest": self.latest,
+                    "patients": self.patients,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        tmp.replace(self.state_path)
+
+    def reset(self):
+        self.patients, self.offset, self.events, self.latest = {}, 0, 0, None
+
+    def catch_up(self) -> int:
+        """Apply events appended to the log since the checkpoint. Returns how many were applied."""
+        if not self.log_path.exists():
+            if self.offset:
+                raise FileNotFoundError(f"Visit log not found: {self.log_path} (checkpoint expects {self.offset} bytes)")
+            return 0
+        size = self.log_path.stat().st_size
+        if size < self.offset:
+            print(f"{self.log_path} is shorter than the checkpoint; replaying from the start.")
+            self.reset()
+        if size == self.offset:
+            return 0
+        with open(self.log_path, "rb") as f:
+            header = f.readline()
+            f.seek(max(self.offset, len(header)))
+            tail = f.read()
+        # Only whole lines are consumed; a partially written last line waits for the next run.
+        end = tail.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+        with span("visits.read", path=str(self.log_path)) as s:
+            events = _parse_events(header + tail[:end])
+            s.add(rows=len(events), bytes=end)
+        with span("visits.apply") as s:
+            self._apply(events)
+            s.add(rows=len(events))
+        self.offset = max(self.offset, len(header)) + end
+        return len(events)
+
+    def _apply(self, events: pd.DataFrame):
+        patients = self.patients
+        for pid, trial, kind, day, value in zip(
+            events["patient_id"].to_numpy(),
+            events["trial_id"].to_numpy(),
+            events["event_type"].to_numpy(),
+            events["day"].to_numpy(),
+            events["value"].to_numpy(),
+        ):
+            state = patients.get(pid)
+            if state is None:
+                state = patients[pid] = PatientState(trial)
+            elif trial and not state.trial_id:
+                state.trial_id = trial
+            state.apply(kind, int(day), value)
+        self.events += len(events)
+        if len(events):
+            latest = int(events["day"].max())
+            self.latest = latest if self.latest is None else max(self.latest, latest)
+
+    def append(self, events: pd.DataFrame) -> int:
+        """Validate new events, append them to the log and apply them."""
+        events = _normalize_events(events)
+        pending = set(events.loc[events["event_type"] == "enroll", "patient_id"])
+        unknown = sorted(set(events["patient_id"]) - set(self.patients) - pending)
+        if unknown:
+            raise ValueError(f"Events for patients without an enroll event: {unknown[:10]}")
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        write_header = not self.log_path.exists() or self.log_path.stat().st_size == 0
+        events[LOG_COLUMNS].to_csv(self.log_path, mode="a", header=write_header, index=False)
+        return self.catch_up()
+
+    def features(self, as_of: pd.Timestamp | None = None) -> pd.DataFrame:
+        """Live feature rows for every patient in the log, as of `as_of` (default: latest event)."""
+        if self.latest is None:
+            return pd.DataFrame(columns=["patient_id", *FEATURE_COLUMNS])
+        day = self.latest if as_of is None else to_days(pd.Series([as_of]))[0]
+        if day < self.latest:
+            # Counters already include every logged event; an earlier date would mix in later visits.
+            raise ValueError(
+                f"as_of {pd.Timestamp(as_of).date()} is before the latest logged event ({self.as_of_date().date()}). "
+                "Live features only move forward; use backfill_scores.py for point-in-time features."
+            )
+        rows = [state.features(int(day)) for state in self.patients.values()]
+        out = pd.DataFrame.from_records(rows, columns=FEATURE_COLUMNS)
+        out.insert(0, "patient_id", list(self.patients))
+        out["enrollment_date"] = from_days(out["enrollment_date"])
+        return out
+
+    def as_of_date(self) -> pd.Timestamp | None:
+        return None if self.latest is None else from_days(pd.Series([self.latest]))[0]
+
+
+def to_days(dates: pd.Series) -> np.ndarray:
+    """ISO dates as integer days since 1970-01-01, the log's `day` column."""
+    parsed = pd.to_datetime(dates, errors="coerce", format="ISO8601")
+    if parsed.isna().any():
+        raise ValueError(f"Unparseable event dates: {list(dates[parsed.isna()].astype(str).unique()[:5])}")
+    return (parsed.dt.normalize() - pd.Timestamp("1970-01-01")).dt.days.to_numpy(dtype=np.int64)
+
+
+def from_days(days: pd.Series) -> pd.Series:
+    return pd.Timestamp("1970-01-01") + pd.to_timedelta(days, unit="D")
+
+
+def _normalize_events(events: pd.DataFrame) -> pd.DataFrame:
+    missing = sorted({"patient_id", "event_type", "event_date"}.difference(events.columns))
+    if missing:
+        raise ValueError(f"Events missing required columns: {missing}")
+    out = events.copy()
+    out["patient_id"] = out["patient_id"].astype(str)
+    out["trial_id"] = out["trial_id"].fillna("").astype(str) if "trial_id" in out else ""
+    out["event_type"] = out["event_type"].astype(str).str.strip().str.lower()
+    unknown = sorted(set(out["event_type"]) - set(EVENT_TYPES))
+    if unknown:
+        raise ValueError(f"Unknown event types: {unknown}. Known: {list(EVENT_TYPES)}")
+    out["value"] = pd.to_numeric(out["value"], errors="coerce").fillna(0) if "value" in out else 0
+    days = to_days(out["event_date"])
+    out["event_date"] = from_days(pd.Series(days, index=out.index)).dt.strftime("%Y-%m-%d")
+    # Apply in time order within the batch; the log itself stays append-only.
+    out["day"] = days
+    return out.sort_values("day", kind="stable")
+
+
+def read_events(log_path: Path = LOG_PATH) -> pd.DataFrame:
+    """The whole log with an integer `day` column (days since 1970-01-01)."""
+    if not log_path.exists():
+        raise FileNotFoundError(f"Visit log not found: {log_path}. Seed it with --bootstrap.")
+    with span("visits.read", path=str(log_path)) as s:
+        events = _parse_events(log_path.read_bytes())
+        s.add(rows=len(events), bytes=log_path.stat().st_size)
+    return events
+
+
+def _parse_events(raw: bytes) -> pd.DataFrame:
+    events = pd.read_csv(io.BytesIO(raw), dtype={"patient_id": str, "trial_id": str, "event_type": str})
+    events["trial_id"] = events["trial_id"].fillna("")
+    events["value"] = pd.to_numeric(events["value"], errors="coerce").fillna(0)
+    events["day"] = to_days(events["event_date"])
+    return events
+
+
+def bootstrap_events(roster: pd.DataFrame) -> pd.DataFrame:
+    """Seed events that reproduce a roster snapshot's counts and contact recency.
+
+    The snapshot carries no visit dates, so completed and missed visits are
+    spread evenly between enrollment and the last contact. The reference date
+    is the latest enrollment date, as in engineer_features.
+    """
+    enrolled = pd.to_datetime(roster["enrollment_date"], errors="coerce")
+    if enrolled.isna().any():
+        raise ValueError("Roster has rows without a parseable enrollment_date.")
+    reference = enrolled.max()
+    enroll_day = to_days(enrolled)
+    contact_day = to_days(pd.Series([reference] * len(roster))) - roster["days_since_last_contact"].fillna(0).astype(int).to_numpy()
+    completed = roster["completed_visits"].fillna(0).astype(int).to_numpy()
+    missed = roster["missed_visits"].fillna(0).astype(int).to_numpy()
+    pids = roster["patient_id"].astype(str).to_numpy()
+    trials = roster["trial_id"].astype(str).to_numpy()
+
+    parts = [
+        pd.DataFrame(
+            {
+                "patient_id": pids,
+                "trial_id": trials,
+                "event_type": "enroll",
+                "day": enroll_day,
+                "value": roster["scheduled_visits"].fillna(0).astype(int).to_numpy(),
+            }
+        )
+    ]
+    n = completed + missed
+    rows = np.repeat(np.arange(len(roster)), n)
+    if len(rows):
+        # Position of each event within its patient, then even spacing up to the last contact.
+        pos = np.arange(len(rows)) - np.repeat(np.cumsum(n) - n, n)
+        start = np.minimum(enroll_day, contact_day)[rows]
+        span_days = (contact_day[rows] - start).astype(float)
+        day = start + np.floor(span_days * (pos + 1) / n[rows]).astype(np.int64)
+        # Misses land on evenly spread positions among the patient's visits.
+        miss_slots = np.floor((pos + 1) * missed[rows] / n[rows]) > np.floor(pos * missed[rows] / n[rows])
+        parts.append(
+            pd.DataFrame(
+                {
+                    "patient_id": pids[rows],
+                    "trial_id": trials[rows],
+                    "event_type": np.where(miss_slots, "miss", "visit"),
+                    "day": day,
+                    "value": 0,
+                }
+            )
+        )
+    parts.append(pd.DataFrame({"patient_id": pids, "trial_id": trials, "event_type": "contact", "day": contact_day, "value": 0}))
+    # Dropouts have no recorded date; their last contact is the closest stand-in.
+    dropped = np.zeros(len(roster), dtype=bool)
+    if "status" in roster:
+        dropped = roster["status"].astype(str).str.lower().eq("dropped_out").to_numpy()
+    parts.append(
+        pd.DataFrame(
+            {"patient_id": pids[dropped], "trial_id": trials[dropped], "event_type": "withdraw", "day": contact_day[dropped], "value": 0}
+        )
+    )
+    events = pd.concat(parts, ignore_index=True).sort_values(["day"], kind="stable")
+    events["event_date"] = from_days(events["day"]).dt.strftime("%Y-%m-%d")
+    return events[LOG_COLUMNS]
+
+
+def live_roster(log: VisitLog, roster: pd.DataFrame, as_of: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Roster rows with their visit counts and dates replaced by the log's live features."""
+    live = log.features(as_of)
+    static = roster.drop(columns=[c for c in FEATURE_COLUMNS if c in roster.columns])
+    static = static.assign(patient_id=static["patient_id"].astype(str))
+    return live.merge(static, on="patient_id", how="left")
+
+
+def score_live(log: VisitLog, roster: pd.DataFrame, model_path: Path, as_of: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Score the live features with a train_model.py bundle."""
+    from train_model import engineer_features, load_bundle, risk_level
+
+    bundle = load_bundle(model_path)
+    feature_cols = bundle["metadata"]["feature_columns"]
+    live = live_roster(log, roster, as_of)
+    missing = sorted(set(feature_cols).difference(live.columns))
+    if missing:
+        raise ValueError(f"Roster is missing model features not kept in the visit log: {missing}")
+    reference = as_of if as_of is not None else log.as_of_date()
+    with span("visits.score") as s:
+        df = engineer_features(live, reference_date=reference)
+        prob = bundle["model"].predict_proba(df[feature_cols])[:, 1]
+        s.add(rows=len(df))
+    return pd.DataFrame(
+        {
+            "patient_id": live["patient_id"],
+            "trial_id": live["trial_id"],
+            "dropout_risk": prob,
+            "risk_level": risk_level(pd.Series(prob)),
+            "misses_30d": live["misses_30d"],
+            "days_since_last_contact": live["days_since_last_contact"],
+            "as_of": pd.Timestamp(reference).strftime("%Y-%m-%d"),
+        }
+    ).sort_values("dropout_risk", ascending=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintain the visit event log and its live patient features.")
+    parser.add_argument("--log", type=Path, default=LOG_PATH, help="Append-only visit event log CSV.")
+    parser.add_argument("--state", type=Path, default=STATE_PATH, help="Checkpoint of per-patient feature state.")
+    parser.add_argument("--bootstrap", type=Path, default=None, help="Seed an empty log from a roster snapshot CSV.")
+    parser.add_argument("--append", type=Path, default=None, help="CSV of new events to append and apply.")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the checkpoint and replay the whole log.")
+    parser.add_argument("--as-of", type=str, default=None, help="Feature date, on or after the latest event (default: latest event date).")
+    parser.add_argument("--roster", type=Path, default=Path("synthetic_patients.csv"), help="Roster with static patient fields.")
+    parser.add_argument("--features-out", type=Path, default=None, help="Write the roster with live features here.")
+    parser.add_argument("--score", action="store_true", help="Score live features with --model.")
+    parser.add_argument("--model", type=Path, default=Path("dropout_model.pkl"), help="train_model.py bundle for --score.")
+    parser.add_argument("--predictions-out", type=Path, default=Path("visit_predictions.csv"), help="Output of --score.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with profiled(args.profile, args.profile_memory, root="visits"):
+        _run(args)
+
+
+def _run(args):
+    log = VisitLog(args.log, args.state)
+    if args.rebuild:
+        log.reset()
+
+    if args.bootstrap is not None:
+        if args.log.exists() and args.log.stat().st_size > 0:
+            raise ValueError(f"{args.log} already has events; --bootstrap only seeds an empty log.")
+        if not args.bootstrap.exists():
+            raise FileNotFoundError(f"Roster not found: {args.bootstrap}")
+        seeded = log.append(bootstrap_events(read_artifact(args.bootstrap, PATIENTS)))
+        print(f"Seeded {seeded} events for {len(log.patients)} patients into {args.log}")
+
+    applied = log.catch_up()
+    if applied:
+        print(f"Applied {applied} events from {args.log}")
+
+    if args.append is not None:
+        if not args.append.exists():
+            raise FileNotFoundError(f"Events file not found: {args.append}")
+        added = log.append(pd.read_csv(args.append, dtype={"patient_id": str, "trial_id": str}))
+        print(f"Appended {added} events from {args.append}")
+    log.save()
+
+    as_of = pd.Timestamp(args.as_of) if args.as_of else None
+    print(f"Log: {log.events} events, {len(log.patients)} patients, latest event {log.as_of_date()}")
+
+    if args.features_out is not None or args.score:
+        if not args.roster.exists():
+            raise FileNotFoundError(f"Roster not found: {args.roster}")
+        roster = read_artifact(args.roster, PATIENTS)
+        if args.features_out is not None:
+            to_csv(live_roster(log, roster, as_of), args.features_out)
+            print(f"Saved live features: {args.features_out}")
+        if args.score:
+            predictions = score_live(log, roster, args.model, as_of)
+            to_csv(predictions, args.predictions_out)
+            print(f"Saved live predictions: {args.predictions_out} ({(predictions['risk_level'] == 'High').sum()} high risk)")
+
+
+if __name__ == "__main__":
+    main()